@@ -1,137 +1,674 @@
-from supabase import create_client
-from config import SUPABASE_URL, SUPABASE_KEY
+from config import (
+    DB_BACKEND, IDENTITY_CACHE_SIZE, IDENTITY_CACHE_TTL,
+    IDENTITY_CACHE_NEGATIVE_TTL, GASTOS_PAGE_SIZE, QUERY_CACHE_SIZE, QUERY_CACHE_TTL,
+    QUERY_CACHE_MAX_BYTES, WRITE_BEHIND_ENABLED, WRITE_BEHIND_BATCH_SIZE,
+    WRITE_BEHIND_FLUSH_INTERVAL, WRITE_BEHIND_SPOOL_FILE
+)
+from app.db.gravacao import FilaGravacao
+from app.db.modelos import COLUNAS_GASTO, RegistroGasto
+from app.utils.dinheiro import centavos_de_valor
+from collections import OrderedDict
+import abc
+from enum import Enum
+import sys
+import threading
+import time
 import logging
 
 logger = logging.getLogger(__name__)
 
-class Database:
-    def __init__(self):
-        try:
-            self.supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
-            logger.info("Conexão com Supabase estabelecida com sucesso")
-            self._criar_tabelas_se_nao_existem()
-        except Exception as e:
-            logger.error(f"Erro ao conectar com Supabase: {e}")
-            raise
+# Marcador para diferenciar "chave ausente" de um valor None armazenado no cache
+_AUSENTE = object()
+
+def estimar_tamanho(valor):
+    """
+    Estima, em bytes, a memória ocupada por um resultado de consulta
+    (listas de registros ou dicionários com valores simples)
+    """
+    tamanho = sys.getsizeof(valor)
+    
+    if isinstance(valor, dict):
+        tamanho += sum(sys.getsizeof(v) for v in valor.values())
+    elif hasattr(valor, '__slots__'):
+        # Membros de enum são compartilhados e não contam para o registro
+        tamanho += sum(sys.getsizeof(getattr(valor, campo)) for campo in valor.__slots__
+                       if hasattr(valor, campo) and not isinstance(getattr(valor, campo), Enum))
+    elif isinstance(valor, (list, tuple)):
+        tamanho += sum(estimar_tamanho(item) for item in valor)
+    
+    return tamanho
+
+class CacheLRU:
+    """
+    Cache em memória com limite de tamanho (LRU) e expiração por entrada (TTL).
+    Seguro para uso pelas várias threads do dispatcher.
+    
+    Entradas podem pertencer a um grupo (ex.: o usuário dono do resultado),
+    permitindo invalidar todas as entradas do grupo de uma vez. Se `bytes_maximo`
+    for informado, o tamanho de cada valor é estimado e também limita o cache.
+    """
+    def __init__(self, tamanho_maximo, ttl=None, bytes_maximo=None):
+        self.tamanho_maximo = tamanho_maximo
+        self.ttl = ttl
+        self.bytes_maximo = bytes_maximo
+        self.bytes_usados = 0
+        self._dados = OrderedDict()
+        self._grupos = {}
+        self._lock = threading.Lock()
+        self.acertos = 0
+        self.falhas = 0
+
+    def obter(self, chave, padrao=_AUSENTE):
+        """
+        Retorna o valor da chave, ou `padrao` se não existir ou tiver expirado
+        """
+        with self._lock:
+            entrada = self._dados.get(chave)
+            
+            if entrada is not None:
+                valor, expira_em = entrada[0], entrada[1]
+                
+                if expira_em is None or expira_em > time.monotonic():
+                    # Marca como usado recentemente
+                    self._dados.move_to_end(chave)
+                    self.acertos += 1
+                    return valor
+                
+                # Entrada expirada
+                self._remover(chave)
+            
+            self.falhas += 1
+            return padrao
 
-    def _criar_tabelas_se_nao_existem(self):
+    def definir(self, chave, valor, ttl=None, grupo=None):
         """
-        Cria as tabelas necessárias no Supabase se elas não existirem.
-        Na implementação real, isso seria feito com migrations do Supabase.
-        Aqui apenas documentamos a estrutura esperada.
+        Armazena um valor; `ttl` sobrescreve o tempo de expiração padrão do cache
         """
-        # Tabela de usuários
-        # id (primary key)
-        # telegram_id (unique)
-        # nome
-        # data_cadastro
+        if self.tamanho_maximo <= 0:
+            return
+        
+        ttl = self.ttl if ttl is None else ttl
+        expira_em = time.monotonic() + ttl if ttl else None
+        tamanho = estimar_tamanho(valor) if self.bytes_maximo else 0
         
-        # Tabela de gastos
-        # id (primary key)
-        # usuario_id (foreign key para users)
-        # valor (decimal)
-        # forma_pagamento (text)
-        # parcelas (integer)
-        # categoria (text)
-        # local (text)
-        # data (date)
-        # criado_em (timestamp)
-        pass
+        with self._lock:
+            self._remover(chave)
+            self._dados[chave] = (valor, expira_em, grupo, tamanho)
+            self.bytes_usados += tamanho
+            
+            if grupo is not None:
+                self._grupos.setdefault(grupo, set()).add(chave)
+            
+            # Remove as entradas menos usadas se passar do limite
+            while self._dados and (
+                len(self._dados) > self.tamanho_maximo
+                or (self.bytes_maximo and self.bytes_usados > self.bytes_maximo)
+            ):
+                self._remover(next(iter(self._dados)))
+
+    def invalidar(self, chave):
+        """Remove uma chave do cache"""
+        with self._lock:
+            self._remover(chave)
+
+    def invalidar_grupo(self, grupo):
+        """Remove todas as entradas de um grupo"""
+        with self._lock:
+            for chave in list(self._grupos.get(grupo, ())):
+                self._remover(chave)
+
+    def limpar(self):
+        """Remove todas as entradas do cache"""
+        with self._lock:
+            self._dados.clear()
+            self._grupos.clear()
+            self.bytes_usados = 0
 
-    def registrar_gasto(self, usuario_id, valor, forma_pagamento, parcelas, categoria, local, data):
+    def _remover(self, chave):
+        """Remove uma entrada mantendo os índices de grupo e o uso de memória (requer o lock)"""
+        entrada = self._dados.pop(chave, None)
+        
+        if entrada is None:
+            return
+        
+        _, _, grupo, tamanho = entrada
+        self.bytes_usados -= tamanho
+        
+        if grupo is not None:
+            chaves = self._grupos.get(grupo)
+            if chaves is not None:
+                chaves.discard(chave)
+                if not chaves:
+                    del self._grupos[grupo]
+
+    def estatisticas(self):
+        """Retorna contadores de uso do cache"""
+        with self._lock:
+            consultas = self.acertos + self.falhas
+            return {
+                "tamanho": len(self._dados),
+                "capacidade": self.tamanho_maximo,
+                "bytes_usados": self.bytes_usados,
+                "bytes_maximo": self.bytes_maximo,
+                "acertos": self.acertos,
+                "falhas": self.falhas,
+                "taxa_acerto": self.acertos / consultas if consultas else 0.0
+            }
+
+class Database(abc.ABC):
+    """
+    Interface de armazenamento do bot.
+    
+    Concentra os caches, a gravação em segundo plano e o tratamento de erros;
+    as subclasses (Supabase, SQLite) implementam apenas o acesso ao banco nos
+    métodos abstratos `_conectar`, `_inserir_gastos`, `_consultar_gastos`,
+    `_consultar_resumo_por_categoria`, `_consultar_resumo_por_forma_pagamento`,
+    `_consultar_impressao`, `_ler_cursor_exportacao`, `_gravar_cursor_exportacao`,
+    `_reconstruir_resumo_mensal` e `_gravar_usuario`. Um backend sem algum deles
+    falha já ao ser instanciado.
+    """
+    def __init__(self, gravacao_em_segundo_plano=WRITE_BEHIND_ENABLED):
+        """
+        Args:
+            gravacao_em_segundo_plano: Enfileira os gastos na FilaGravacao (e recupera o
+                arquivo de pendentes); False para acessos que não registram gastos
+        """
+        # Cache telegram_id -> usuario_id, evita uma consulta em `usuarios` por update
+        self.cache_usuarios = CacheLRU(IDENTITY_CACHE_SIZE, IDENTITY_CACHE_TTL)
+        
+        # Cache de resultados das consultas de visualização, agrupado por usuario_id
+        # e invalidado a cada gasto registrado pelo usuário
+        self.cache_consultas = CacheLRU(QUERY_CACHE_SIZE, QUERY_CACHE_TTL, QUERY_CACHE_MAX_BYTES)
+        
+        self._conectar()
+        
+        # Gravação de gastos em segundo plano (opcional)
+        self.fila_gravacao = None
+        if gravacao_em_segundo_plano:
+            self.fila_gravacao = FilaGravacao(
+                inserir_lote=self._inserir_lote_pendente,
+                tamanho_lote=WRITE_BEHIND_BATCH_SIZE,
+                intervalo=WRITE_BEHIND_FLUSH_INTERVAL,
+                arquivo_pendentes=WRITE_BEHIND_SPOOL_FILE,
+                ao_gravar=self._apos_gravar_gastos
+            )
+            self.fila_gravacao.iniciar()
+
+    def registrar_gasto(self, usuario_id, valor_centavos, forma_pagamento, parcelas, categoria, local, data,
+                        ao_falhar=None):
         """
-        Registra um novo gasto no banco de dados
+        Registra um novo gasto no banco de dados. O valor é um inteiro em centavos.
+        
+        Com a gravação em segundo plano ativa (WRITE_BEHIND_ENABLED), o gasto é apenas
+        enfileirado e retornado imediatamente; se a gravação falhar depois,
+        `ao_falhar(gasto, erro)` é chamado.
         """
+        data_obj = {
+            "usuario_id": usuario_id,
+            "valor_centavos": valor_centavos,
+            "forma_pagamento": forma_pagamento,
+            "parcelas": parcelas if forma_pagamento == "Crédito" else None,
+            "categoria": categoria,
+            "local": local,
+            "data": data
+        }
+        
+        if self.fila_gravacao:
+            self.fila_gravacao.adicionar(data_obj, ao_falhar)
+            return data_obj
+        
         try:
-            data_obj = {
-                "usuario_id": usuario_id,
-                "valor": valor,
-                "forma_pagamento": forma_pagamento,
-                "parcelas": parcelas if forma_pagamento == "Crédito" else None,
-                "categoria": categoria,
-                "local": local,
-                "data": data
-            }
-            
-            result = self.supabase.table('gastos').insert(data_obj).execute()
-            return result.data[0] if result.data else None
+            gravados = self._inserir_gastos([data_obj])
+            self._apos_gravar_gastos(gravados)
+            return gravados[0] if gravados else None
         except Exception as e:
             logger.error(f"Erro ao registrar gasto: {e}")
             return None
 
-    def obter_gastos(self, usuario_id, ano=None, mes=None, forma_pagamento=None, categoria=None):
+    def _inserir_lote_pendente(self, gastos):
+        """
+        Insere um lote da gravação em segundo plano. Linhas salvas no arquivo de
+        pendentes antes da troca para centavos ainda trazem 'valor' em reais.
         """
-        Obtém gastos do usuário, com filtros opcionais por ano, mês, forma de pagamento e categoria
+        for gasto in gastos:
+            if 'valor' in gasto:
+                gasto['valor_centavos'] = centavos_de_valor(gasto.pop('valor'))
+        
+        return self._inserir_gastos(gastos)
+
+    def _apos_gravar_gastos(self, gastos):
+        """Invalida o cache de consultas dos usuários que tiveram gastos gravados"""
+        for usuario_id in {gasto['usuario_id'] for gasto in gastos or []}:
+            self.cache_consultas.invalidar_grupo(usuario_id)
+
+    def encerrar(self):
+        """
+        Finaliza o acesso ao banco, gravando os gastos que ainda estiverem na fila
+        """
+        if self.fila_gravacao:
+            self.fila_gravacao.encerrar()
+
+    def obter_gastos(self, usuario_id, ano=None, mes=None, forma_pagamento=None, categoria=None,
+                     colunas=None):
         """
+        Obtém gastos do usuário, com filtros opcionais por ano, mês, forma de pagamento e categoria.
+        
+        Args:
+            colunas: Colunas a buscar (padrão: todas); as demais ficam ausentes nos registros
+        
+        Returns:
+            list: Registros (RegistroGasto), compartilhados pelo cache de consultas e que
+                não devem ser modificados
+        """
+        colunas = self._projecao(colunas)
+        chave = ('gastos', usuario_id, ano, mes, forma_pagamento, categoria, colunas)
+        gastos = self.cache_consultas.obter(chave)
+        
+        if gastos is not _AUSENTE:
+            return gastos
+        
         try:
-            query = self.supabase.table('gastos').select('*').eq('usuario_id', usuario_id)
-            
-            # Filtragem por ano e mês usando abordagem diferente
-            if ano:
-                # Se temos ano, filtramos com operadores >= e <
-                if mes:
-                    # Filtro por mês específico
-                    mes_str = str(mes).zfill(2)
-                    data_inicio = f"{ano}-{mes_str}-01"
-                    
-                    # Calcula o próximo mês para filtro de fim
-                    proximo_mes = mes + 1
-                    proximo_ano = ano
-                    if proximo_mes > 12:
-                        proximo_mes = 1
-                        proximo_ano += 1
-                    
-                    proximo_mes_str = str(proximo_mes).zfill(2)
-                    data_fim = f"{proximo_ano}-{proximo_mes_str}-01"
-                    
-                    query = query.gte('data', data_inicio).lt('data', data_fim)
-                else:
-                    # Filtro por todo o ano
-                    data_inicio = f"{ano}-01-01"
-                    data_fim = f"{ano+1}-01-01"
-                    query = query.gte('data', data_inicio).lt('data', data_fim)
-            
-            if forma_pagamento:
-                # Filtra por forma de pagamento
-                query = query.eq('forma_pagamento', forma_pagamento)
+            data_inicio, data_fim = self._intervalo_datas(ano, mes)
+            linhas = self._consultar_gastos(
+                usuario_id, data_inicio, data_fim, forma_pagamento, categoria, colunas=colunas
+            )
+            gastos = [RegistroGasto.de_dict(linha) for linha in linhas]
+            self.cache_consultas.definir(chave, gastos, grupo=usuario_id)
+            return gastos
+        except Exception as e:
+            logger.error(f"Erro ao obter gastos: {e}")
+            return []
+
+    def iter_gastos(self, usuario_id, ano=None, mes=None, forma_pagamento=None, categoria=None,
+                    colunas=None, tamanho_pagina=GASTOS_PAGE_SIZE, desde=None, ate=None):
+        """
+        Percorre os gastos do usuário em páginas, sem carregar todo o histórico na memória.
+        Usa paginação por cursor (keyset) em (data, id), na mesma ordem de `obter_gastos`.
+        
+        Args:
+            desde: (criado_em, id) — apenas gastos registrados depois deste
+            ate: (criado_em, id) — apenas gastos registrados até este, inclusive
+        
+        Raises:
+            Exception: Se a consulta de uma página falhar; quem percorre não pode
+                confundir a falha com o fim dos gastos (ex.: exportação truncada)
+        """
+        # O cursor precisa de data e id, mesmo que não tenham sido pedidos
+        colunas = self._projecao(colunas, obrigatorias=('data', 'id'))
+        data_inicio, data_fim = self._intervalo_datas(ano, mes)
+        cursor = None
+        
+        while True:
+            try:
+                pagina = self._consultar_gastos(
+                    usuario_id, data_inicio, data_fim, forma_pagamento, categoria,
+                    cursor=cursor, limite=tamanho_pagina, colunas=colunas, desde=desde, ate=ate
+                )
+            except Exception as e:
+                logger.error(f"Erro ao obter gastos: {e}")
+                raise
             
-            if categoria:
-                # Filtra por categoria
-                query = query.eq('categoria', categoria)
+            for linha in pagina:
+                yield RegistroGasto.de_dict(linha)
             
-            # Ordena por data
-            query = query.order('data', desc=True)
+            if len(pagina) < tamanho_pagina:
+                return
             
-            result = query.execute()
-            return result.data
+            # Continua a partir do último gasto da página anterior
+            ultimo = pagina[-1]
+            cursor = (ultimo['data'], ultimo['id'])
+
+    @staticmethod
+    def _projecao(colunas, obrigatorias=()):
+        """
+        Valida a projeção de colunas pedida e a devolve como tupla (None = todas)
+        """
+        if not colunas:
+            return None
+        
+        desconhecidas = set(colunas) - set(COLUNAS_GASTO)
+        if desconhecidas:
+            raise ValueError(f"Colunas desconhecidas: {', '.join(sorted(desconhecidas))}")
+        
+        return tuple(c for c in COLUNAS_GASTO if c in colunas or c in obrigatorias)
+
+    def resumo_por_categoria(self, usuario_id, ano=None, mes=None, forma_pagamento=None, categoria=None):
+        """
+        Obtém o total e a quantidade de gastos por categoria, agregados no banco
+        a partir da tabela de resumo mensal. Aceita os mesmos filtros de `obter_gastos`.
+        
+        Returns:
+            list: Dicionários com 'categoria', 'total_centavos' e 'quantidade', do maior para o menor total
+        """
+        chave = ('resumo', usuario_id, ano, mes, forma_pagamento, categoria)
+        resumo = self.cache_consultas.obter(chave)
+        
+        if resumo is not _AUSENTE:
+            return resumo
+        
+        try:
+            data_inicio, data_fim = self._intervalo_datas(ano, mes)
+            resumo = self._consultar_resumo_por_categoria(
+                usuario_id, data_inicio, data_fim, forma_pagamento, categoria
+            )
+            self.cache_consultas.definir(chave, resumo, grupo=usuario_id)
+            return resumo
         except Exception as e:
-            logger.error(f"Erro ao obter gastos: {e}")
+            logger.error(f"Erro ao obter resumo por categoria: {e}")
             return []
 
-    def registrar_usuario(self, telegram_id, nome):
+    def resumo_por_forma_pagamento(self, usuario_id, ano=None, mes=None, forma_pagamento=None, categoria=None):
         """
-        Registra um novo usuário ou atualiza se já existir
+        Obtém o total e a quantidade de gastos por forma de pagamento, agregados no banco
+        a partir da tabela de resumo mensal. Aceita os mesmos filtros de `obter_gastos`.
+        
+        Returns:
+            list: Dicionários com 'forma_pagamento', 'total_centavos' e 'quantidade', do maior para o menor total
         """
+        chave = ('resumo_forma_pagamento', usuario_id, ano, mes, forma_pagamento, categoria)
+        resumo = self.cache_consultas.obter(chave)
+        
+        if resumo is not _AUSENTE:
+            return resumo
+        
         try:
-            # Verifica se o usuário já existe
-            result = self.supabase.table('usuarios').select('*').eq('telegram_id', telegram_id).execute()
+            data_inicio, data_fim = self._intervalo_datas(ano, mes)
+            resumo = self._consultar_resumo_por_forma_pagamento(
+                usuario_id, data_inicio, data_fim, forma_pagamento, categoria
+            )
+            self.cache_consultas.definir(chave, resumo, grupo=usuario_id)
+            return resumo
+        except Exception as e:
+            logger.error(f"Erro ao obter resumo por forma de pagamento: {e}")
+            return []
+
+    def impressao_gastos(self, usuario_id, ano=None, mes=None, forma_pagamento=None, categoria=None):
+        """
+        Obtém uma "impressão digital" barata dos gastos filtrados: a quantidade e o
+        gasto registrado mais recentemente. Se ela não mudou, o resultado da consulta
+        também não mudou (permite reaproveitar exportações já enviadas).
+        
+        Returns:
+            tuple: (quantidade, criado_em e id do último gasto registrado), ou None em caso de erro
+        """
+        # Sem cache: a impressão decide se um arquivo já enviado ainda vale e até onde
+        # avança o cursor da exportação, então precisa refletir o banco agora
+        try:
+            data_inicio, data_fim = self._intervalo_datas(ano, mes)
+            return self._consultar_impressao(
+                usuario_id, data_inicio, data_fim, forma_pagamento, categoria
+            )
+        except Exception as e:
+            logger.error(f"Erro ao obter impressão dos gastos: {e}")
+            return None
+
+    def obter_cursor_exportacao(self, usuario_id):
+        """
+        Obtém o cursor da exportação incremental do usuário
+        
+        Returns:
+            dict: 'criado_em' e 'gasto_id' do último gasto exportado, 'file_id' e 'formato'
+                do último arquivo completo enviado (podem ser None); None se o usuário
+                ainda não exportou tudo nenhuma vez ou em caso de erro
+        """
+        try:
+            return self._ler_cursor_exportacao(usuario_id)
+        except Exception as e:
+            logger.error(f"Erro ao obter cursor de exportação: {e}")
+            return None
+
+    def salvar_cursor_exportacao(self, usuario_id, criado_em, gasto_id, file_id=None, formato=None):
+        """
+        Avança o cursor da exportação incremental do usuário
+        
+        Args:
+            criado_em, gasto_id: Último gasto incluído na exportação
+            file_id, formato: Arquivo enviado, se contiver todos os gastos até o cursor
+        
+        Returns:
+            bool: True se o cursor foi gravado
+        """
+        try:
+            self._gravar_cursor_exportacao(usuario_id, criado_em, gasto_id, file_id, formato)
+            return True
+        except Exception as e:
+            logger.error(f"Erro ao salvar cursor de exportação: {e}")
+            return False
+
+    def reconstruir_resumo_mensal(self, usuario_id=None):
+        """
+        Reconstrói a tabela de resumo mensal (gastos_mensal) a partir dos gastos.
+        Usado na carga inicial e para corrigir divergências.
+        
+        Args:
+            usuario_id: Reconstrói apenas para este usuário (None para todos)
+        
+        Returns:
+            int: Número de linhas de resumo geradas, ou None em caso de erro
+        """
+        try:
+            linhas = self._reconstruir_resumo_mensal(usuario_id)
             
-            if result.data:
-                # Se já existe, apenas retorna o ID
-                return result.data[0]['id']
+            # Resumos em cache podem ter sido calculados sobre dados divergentes
+            if usuario_id is None:
+                self.cache_consultas.limpar()
+            else:
+                self.cache_consultas.invalidar_grupo(usuario_id)
             
-            # Se não existe, insere novo usuário
-            data = {
-                "telegram_id": telegram_id,
-                "nome": nome
-            }
+            return linhas
+        except Exception as e:
+            logger.error(f"Erro ao reconstruir resumo mensal: {e}")
+            return None
+
+    @staticmethod
+    def _intervalo_datas(ano=None, mes=None):
+        """
+        Retorna o intervalo [inicio, fim) em formato ISO para o ano/mês informados,
+        ou (None, None) se não houver filtro de período
+        """
+        if not ano:
+            return None, None
+        
+        if mes:
+            # Filtro por mês específico
+            data_inicio = f"{ano}-{str(mes).zfill(2)}-01"
+            
+            # Calcula o próximo mês para filtro de fim
+            proximo_mes = mes + 1
+            proximo_ano = ano
+            if proximo_mes > 12:
+                proximo_mes = 1
+                proximo_ano += 1
+            
+            data_fim = f"{proximo_ano}-{str(proximo_mes).zfill(2)}-01"
+        else:
+            # Filtro por todo o ano
+            data_inicio = f"{ano}-01-01"
+            data_fim = f"{ano+1}-01-01"
+        
+        return data_inicio, data_fim
+
+    def registrar_usuario(self, telegram_id, nome):
+        """
+        Registra um novo usuário ou atualiza o nome se já existir.
+        Usuários já conhecidos são resolvidos pelo cache, sem acesso ao banco.
+        """
+        entrada = self.cache_usuarios.obter(telegram_id)
+        
+        if entrada is not _AUSENTE:
+            if entrada is None:
+                # Falha recente (resultado negativo em cache)
+                return None
             
-            result = self.supabase.table('usuarios').insert(data).execute()
-            return result.data[0]['id'] if result.data else None
+            usuario_id, nome_cache = entrada
+            if nome_cache == nome:
+                return usuario_id
+            # O nome mudou no Telegram: faz o upsert para atualizá-lo
+        
+        usuario_id = self._upsert_usuario(telegram_id, nome)
+        
+        if usuario_id:
+            self.cache_usuarios.definir(telegram_id, (usuario_id, nome))
+        else:
+            # Guarda o resultado negativo por pouco tempo para não sobrecarregar o banco
+            self.cache_usuarios.definir(telegram_id, None, ttl=IDENTITY_CACHE_NEGATIVE_TTL)
+        
+        return usuario_id
+
+    def _upsert_usuario(self, telegram_id, nome):
+        """
+        Insere o usuário ou atualiza seu nome em uma única operação.
+        O conflito em `telegram_id` é resolvido pelo banco, então dois /start
+        simultâneos do mesmo usuário não falham por violação de UNIQUE.
+        """
+        try:
+            return self._gravar_usuario(telegram_id, nome)
         except Exception as e:
             logger.error(f"Erro ao registrar usuário: {e}")
             return None
 
+    def invalidar_usuario(self, telegram_id=None):
+        """
+        Remove um usuário do cache de identidade (ou todos, se telegram_id for None)
+        """
+        if telegram_id is None:
+            self.cache_usuarios.limpar()
+        else:
+            self.cache_usuarios.invalidar(telegram_id)
+
+    def estatisticas_cache_usuarios(self):
+        """Retorna os contadores do cache de identidade"""
+        return self.cache_usuarios.estatisticas()
+
+    def estatisticas_cache_consultas(self):
+        """Retorna taxa de acerto e uso de memória do cache de consultas"""
+        return self.cache_consultas.estatisticas()
+    
+    # Operações implementadas por cada backend
+
+    @abc.abstractmethod
+    def _conectar(self):
+        """Abre a conexão com o banco"""
+
+    @abc.abstractmethod
+    def _inserir_gastos(self, gastos):
+        """Insere uma lista de gastos de uma só vez e retorna as linhas gravadas"""
+
+    @abc.abstractmethod
+    def _consultar_gastos(self, usuario_id, data_inicio=None, data_fim=None, forma_pagamento=None,
+                          categoria=None, cursor=None, limite=None, colunas=None, desde=None, ate=None):
+        """
+        Retorna os gastos filtrados (dicionários), ordenados por (data, id) decrescente.
+        `cursor` é o (data, id) do último gasto já lido, `limite` o tamanho da página
+        e `colunas` a projeção (None = todas). `desde` e `ate` limitam o (criado_em, id)
+        ao intervalo (desde, ate].
+        """
+
+    @abc.abstractmethod
+    def _consultar_resumo_por_categoria(self, usuario_id, data_inicio=None, data_fim=None,
+                                        forma_pagamento=None, categoria=None):
+        """Retorna 'categoria', 'total_centavos' e 'quantidade' por categoria, do maior para o menor total"""
+
+    @abc.abstractmethod
+    def _consultar_resumo_por_forma_pagamento(self, usuario_id, data_inicio=None, data_fim=None,
+                                              forma_pagamento=None, categoria=None):
+        """Retorna 'forma_pagamento', 'total_centavos' e 'quantidade' por forma de pagamento, do maior para o menor total"""
+
+    @abc.abstractmethod
+    def _consultar_impressao(self, usuario_id, data_inicio=None, data_fim=None,
+                             forma_pagamento=None, categoria=None):
+        """Retorna (quantidade, criado_em, id) dos gastos filtrados, com o (criado_em, id) do último gasto registrado"""
+
+    @abc.abstractmethod
+    def _ler_cursor_exportacao(self, usuario_id):
+        """Retorna o cursor de exportação do usuário (dicionário) ou None"""
+
+    @abc.abstractmethod
+    def _gravar_cursor_exportacao(self, usuario_id, criado_em, gasto_id, file_id=None, formato=None):
+        """Faz o upsert do cursor de exportação do usuário"""
+
+    @abc.abstractmethod
+    def _reconstruir_resumo_mensal(self, usuario_id=None):
+        """Recalcula gastos_mensal e retorna o número de linhas geradas"""
+
+    @abc.abstractmethod
+    def _gravar_usuario(self, telegram_id, nome):
+        """Faz o upsert do usuário por telegram_id e retorna seu id"""
+
+
+def criar_database(backend=DB_BACKEND, **opcoes):
+    """
+    Cria a instância de banco de dados conforme o backend configurado (DB_BACKEND);
+    `opcoes` são repassadas ao construtor (ex.: gravacao_em_segundo_plano=False)
+    """
+    if backend == 'sqlite':
+        from app.db.sqlite_backend import SQLiteDatabase
+        return SQLiteDatabase(**opcoes)
+    
+    if backend == 'supabase':
+        from app.db.supabase_backend import SupabaseDatabase
+        return SupabaseDatabase(**opcoes)
+    
+    raise ValueError(f"Backend de banco de dados desconhecido: {backend}")
+
+
+class DatabasePreguicoso:
+    """
+    Acesso ao banco criado apenas no primeiro uso.
+    
+    Importar os handlers não abre conexão nenhuma; a instância real é criada no
+    primeiro acesso a um atributo ou por `aquecer_em_segundo_plano`, chamado
+    depois que o bot já está recebendo updates. Se a criação falhar, o erro fica
+    em `erro` e a próxima chamada tenta de novo.
+    """
+    def __init__(self, fabrica):
+        self._fabrica = fabrica
+        self._instancia = None
+        self._lock = threading.Lock()
+        self.erro = None
+
+    def obter(self):
+        """Retorna a instância real do banco, criando-a se necessário"""
+        instancia = self._instancia
+        
+        if instancia is None:
+            with self._lock:
+                if self._instancia is None:
+                    try:
+                        self._instancia = self._fabrica()
+                        self.erro = None
+                    except Exception as e:
+                        self.erro = e
+                        raise
+                instancia = self._instancia
+        
+        return instancia
+
+    @property
+    def pronto(self):
+        """Indica se a conexão com o banco já foi estabelecida"""
+        return self._instancia is not None
+
+    def aquecer_em_segundo_plano(self):
+        """Cria a conexão em uma thread separada, sem bloquear a inicialização"""
+        def aquecer():
+            try:
+                self.obter()
+            except Exception as e:
+                logger.error(f"Erro ao preparar o banco de dados: {e}")
+        
+        thread = threading.Thread(target=aquecer, name="aquecimento-db", daemon=True)
+        thread.start()
+        return thread
+
+    def encerrar(self):
+        """Encerra a instância real, se ela chegou a ser criada"""
+        if self._instancia is not None:
+            self._instancia.encerrar()
+
+    def __getattr__(self, nome):
+        return getattr(self.obter(), nome)
+
 
-# Instância global do banco de dados
-db = Database() 
\ No newline at end of file
+# Instância global do banco de dados (conectada no primeiro uso)
+db = DatabasePreguicoso(criar_database)
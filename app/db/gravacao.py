@@ -0,0 +1,232 @@
+import json
+import logging
+import os
+import queue
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Sinal para a thread de gravação terminar
+_PARAR = object()
+
+class FilaGravacao:
+    """
+    Fila de gravação em segundo plano (write-behind) para os inserts de gastos.
+    
+    As linhas enfileiradas são agrupadas em INSERTs de várias linhas, enviados
+    quando o lote atinge `tamanho_lote` ou após `intervalo` segundos. Se um lote
+    falhar, cada linha é tentada individualmente e as que falharem de novo são
+    informadas pelo callback `ao_falhar(linha, erro)` registrado com ela.
+    
+    No encerramento, as linhas que não puderam ser gravadas são salvas em
+    `arquivo_pendentes` e reenfileiradas na próxima inicialização.
+    """
+    def __init__(self, inserir_lote, tamanho_lote, intervalo, arquivo_pendentes, ao_gravar=None):
+        """
+        Args:
+            inserir_lote: Função que insere uma lista de linhas e retorna as linhas gravadas
+            tamanho_lote: Número máximo de linhas por INSERT
+            intervalo: Tempo máximo (segundos) que uma linha espera na fila
+            arquivo_pendentes: Arquivo JSON Lines para as linhas não gravadas no encerramento
+            ao_gravar: Função chamada com as linhas gravadas após cada lote
+        """
+        self.inserir_lote = inserir_lote
+        self.tamanho_lote = tamanho_lote
+        self.intervalo = intervalo
+        self.arquivo_pendentes = arquivo_pendentes
+        self.ao_gravar = ao_gravar
+        self._fila = queue.Queue()
+        self._thread = None
+        self._encerrando = False
+        # Protege _nao_gravadas; depois de `_entregue`, a thread salva direto em disco
+        self._lock = threading.Lock()
+        self._entregue = False
+        self._nao_gravadas = []
+
+    def iniciar(self):
+        """Recupera linhas pendentes da execução anterior e inicia a thread de gravação"""
+        for linha in self._carregar_pendentes():
+            self._fila.put((linha, None))
+        
+        self._thread = threading.Thread(target=self._executar, name="gravacao-gastos", daemon=True)
+        self._thread.start()
+
+    def adicionar(self, linha, ao_falhar=None):
+        """Enfileira uma linha para gravação"""
+        self._fila.put((linha, ao_falhar))
+
+    def pendentes(self):
+        """Número aproximado de linhas aguardando gravação"""
+        return self._fila.qsize()
+
+    def encerrar(self, timeout=30):
+        """
+        Grava o que estiver na fila e para a thread. O que não puder ser gravado
+        é salvo em disco para a próxima inicialização.
+        
+        Se a thread não terminar dentro do `timeout`, as linhas ainda na fila são
+        salvas em disco e o que a thread tiver em mãos passa a ser salvo por ela
+        mesma, sem concorrer com este salvamento.
+        """
+        if not self._thread:
+            return
+        
+        self._encerrando = True
+        self._fila.put(_PARAR)
+        self._thread.join(timeout)
+        
+        with self._lock:
+            # Linhas que nem chegaram a ser processadas dentro do timeout
+            while True:
+                try:
+                    item = self._fila.get_nowait()
+                except queue.Empty:
+                    break
+                if item is not _PARAR:
+                    self._nao_gravadas.append(item[0])
+            
+            self._entregue = True
+            self._salvar_pendentes(self._nao_gravadas)
+            self._nao_gravadas = []
+        
+        self._thread = None
+
+    def _executar(self):
+        """Laço da thread: monta lotes por tamanho ou tempo e os grava"""
+        parar = False
+        
+        while not parar:
+            item = self._fila.get()
+            
+            if item is _PARAR:
+                break
+            
+            lote = [item]
+            limite = time.monotonic() + self.intervalo
+            
+            while len(lote) < self.tamanho_lote:
+                restante = limite - time.monotonic()
+                
+                # No encerramento, não espera o intervalo para completar o lote
+                if restante <= 0 and not self._encerrando:
+                    break
+                
+                try:
+                    item = self._fila.get(timeout=max(restante, 0) if not self._encerrando else 0.01)
+                except queue.Empty:
+                    break
+                
+                if item is _PARAR:
+                    parar = True
+                    break
+                
+                lote.append(item)
+            
+            self._gravar(lote)
+        
+        # Esvazia o restante da fila antes de sair
+        restantes = []
+        while True:
+            try:
+                item = self._fila.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _PARAR:
+                restantes.append(item)
+        
+        for inicio in range(0, len(restantes), self.tamanho_lote):
+            self._gravar(restantes[inicio:inicio + self.tamanho_lote])
+
+    def _gravar(self, lote):
+        """Grava um lote com um único INSERT; em caso de erro, tenta linha a linha"""
+        linhas = [linha for linha, _ in lote]
+        
+        if self._entregue:
+            # O encerramento já desistiu de esperar: não começa outro INSERT
+            self._guardar_nao_gravadas(linhas)
+            return
+        
+        try:
+            gravadas = self.inserir_lote(linhas)
+            self._notificar_gravacao(gravadas or linhas)
+            return
+        except Exception as e:
+            logger.warning(f"Erro ao gravar lote de {len(lote)} gastos, tentando individualmente: {e}")
+        
+        gravadas = []
+        
+        for linha, ao_falhar in lote:
+            try:
+                gravadas.extend(self.inserir_lote([linha]) or [linha])
+            except Exception as e:
+                if self._encerrando:
+                    # Provável falha transitória: guarda para a próxima inicialização
+                    self._guardar_nao_gravadas([linha])
+                    continue
+                
+                logger.error(f"Erro ao registrar gasto: {e} - {linha}")
+                
+                if ao_falhar:
+                    try:
+                        ao_falhar(linha, e)
+                    except Exception as erro_callback:
+                        logger.error(f"Erro ao notificar falha de gravação: {erro_callback}")
+        
+        self._notificar_gravacao(gravadas)
+
+    def _guardar_nao_gravadas(self, linhas):
+        """Guarda linhas para o arquivo de pendentes; após o encerramento, salva direto nele"""
+        with self._lock:
+            if self._entregue:
+                self._salvar_pendentes(linhas)
+            else:
+                self._nao_gravadas.extend(linhas)
+
+    def _notificar_gravacao(self, linhas):
+        if linhas and self.ao_gravar:
+            try:
+                self.ao_gravar(linhas)
+            except Exception as e:
+                logger.error(f"Erro após gravação de gastos: {e}")
+
+    def _carregar_pendentes(self):
+        """Lê (e remove) o arquivo de linhas pendentes da execução anterior"""
+        if not self.arquivo_pendentes or not os.path.exists(self.arquivo_pendentes):
+            return []
+        
+        linhas = []
+        
+        try:
+            with open(self.arquivo_pendentes, encoding='utf-8') as arquivo:
+                for registro in arquivo:
+                    if registro.strip():
+                        linhas.append(json.loads(registro))
+            os.remove(self.arquivo_pendentes)
+        except Exception as e:
+            logger.error(f"Erro ao carregar gastos pendentes: {e}")
+            return []
+        
+        if linhas:
+            logger.info(f"{len(linhas)} gastos pendentes recuperados de {self.arquivo_pendentes}")
+        
+        return linhas
+
+    def _salvar_pendentes(self, linhas):
+        """Acrescenta as linhas não gravadas ao arquivo de pendentes"""
+        if not linhas:
+            return
+        
+        if not self.arquivo_pendentes:
+            logger.error(f"{len(linhas)} gastos não gravados foram descartados: {linhas}")
+            return
+        
+        try:
+            with open(self.arquivo_pendentes, 'a', encoding='utf-8') as arquivo:
+                for linha in linhas:
+                    arquivo.write(json.dumps(linha, ensure_ascii=False) + "\n")
+                arquivo.flush()
+                os.fsync(arquivo.fileno())
+            logger.warning(f"{len(linhas)} gastos não gravados salvos em {self.arquivo_pendentes}")
+        except Exception as e:
+            logger.error(f"Erro ao salvar gastos pendentes: {e} - {linhas}")
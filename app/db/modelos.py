@@ -0,0 +1,78 @@
+from enum import Enum
+from config import CATEGORIAS, FORMAS_PAGAMENTO
+
+# Colunas da tabela de gastos, na ordem do esquema (valor_centavos: inteiro em centavos)
+COLUNAS_GASTO = (
+    'id', 'usuario_id', 'valor_centavos', 'forma_pagamento', 'parcelas',
+    'categoria', 'local', 'data', 'criado_em'
+)
+
+class Rotulo(str, Enum):
+    """
+    Enum para os textos fixos do bot (categorias, formas de pagamento).
+    Cada texto vira uma única instância compartilhada, que se comporta como a própria string.
+    """
+    def __str__(self):
+        return self.value
+
+    def __format__(self, formato):
+        return format(self.value, formato)
+
+    @classmethod
+    def de_texto(cls, texto):
+        """Retorna o membro correspondente ao texto, ou o próprio texto se for desconhecido"""
+        return cls._value2member_map_.get(texto, texto)
+
+Categoria = Rotulo('Categoria', [(c, c) for c in CATEGORIAS], module=__name__, qualname='Categoria')
+FormaPagamento = Rotulo('FormaPagamento', [(f, f) for f in FORMAS_PAGAMENTO], module=__name__, qualname='FormaPagamento')
+
+class RegistroGasto:
+    """
+    Linha da tabela de gastos em formato compacto (__slots__, sem dicionário por linha).
+    
+    Colunas fora da projeção consultada ficam ausentes. Para manter compatibilidade
+    com o código que trata os gastos como dicionários, oferece `get`, `[]` e `keys`.
+    """
+    __slots__ = COLUNAS_GASTO
+
+    def __init__(self, **campos):
+        for coluna, valor in campos.items():
+            setattr(self, coluna, valor)
+
+    @classmethod
+    def de_dict(cls, linha):
+        """Cria o registro a partir de uma linha retornada pelo banco"""
+        registro = cls.__new__(cls)
+        
+        for coluna, valor in linha.items():
+            if coluna == 'categoria':
+                valor = Categoria.de_texto(valor)
+            elif coluna == 'forma_pagamento':
+                valor = FormaPagamento.de_texto(valor)
+            setattr(registro, coluna, valor)
+        
+        return registro
+
+    def get(self, coluna, padrao=None):
+        return getattr(self, coluna, padrao)
+
+    def __getitem__(self, coluna):
+        try:
+            return getattr(self, coluna)
+        except AttributeError:
+            raise KeyError(coluna)
+
+    def __contains__(self, coluna):
+        return hasattr(self, coluna)
+
+    def keys(self):
+        """Colunas presentes no registro"""
+        return [coluna for coluna in COLUNAS_GASTO if hasattr(self, coluna)]
+
+    def como_dict(self):
+        """Converte o registro em dicionário, com categoria e forma de pagamento como texto"""
+        return {coluna: str(valor) if isinstance(valor, Rotulo) else valor
+                for coluna in self.keys() for valor in (getattr(self, coluna),)}
+
+    def __repr__(self):
+        return f"RegistroGasto({self.como_dict()!r})"
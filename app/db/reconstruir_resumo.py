@@ -0,0 +1,36 @@
+"""
+Reconstrói a tabela de resumo mensal (gastos_mensal) a partir dos gastos.
+
+Uso:
+    python -m app.db.reconstruir_resumo              # todos os usuários
+    python -m app.db.reconstruir_resumo --usuario 42 # apenas um usuário
+"""
+import argparse
+import logging
+import sys
+
+from app.db.database import db
+
+logger = logging.getLogger(__name__)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Reconstrói o resumo mensal de gastos")
+    parser.add_argument("--usuario", type=int, default=None,
+                        help="ID do usuário (tabela usuarios) a reconstruir; padrão: todos")
+    args = parser.parse_args(argv)
+    
+    linhas = db.reconstruir_resumo_mensal(args.usuario)
+    
+    if linhas is None:
+        logger.error("Falha ao reconstruir o resumo mensal")
+        return 1
+    
+    logger.info(f"Resumo mensal reconstruído: {linhas} linhas")
+    return 0
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        level=logging.INFO
+    )
+    sys.exit(main())
@@ -0,0 +1,260 @@
+import sqlite3
+import threading
+import os
+from config import SQLITE_PATH
+from app.db.database import Database
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Esquema do banco local (mesmas tabelas de criar_tabelas.sql, em dialeto SQLite)
+ARQUIVO_ESQUEMA = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+    'criar_tabelas_sqlite.sql'
+)
+
+# Colunas gravadas em um gasto novo; o id e o criado_em vêm do banco
+COLUNAS_INSERCAO = ("usuario_id", "valor_centavos", "forma_pagamento", "parcelas", "categoria", "local", "data")
+
+# Gastos por INSERT com várias linhas em VALUES; mantém os parâmetros abaixo do limite
+# de 999 variáveis das versões do SQLite anteriores à 3.32
+GASTOS_POR_INSERT = 999 // len(COLUNAS_INSERCAO)
+
+class SQLiteDatabase(Database):
+    """
+    Armazenamento em um arquivo SQLite local, sem acesso à rede.
+    Útil para testes de carga, desenvolvimento e instalações pequenas.
+    """
+    def __init__(self, caminho=SQLITE_PATH, **opcoes):
+        self.caminho = caminho
+        self._local = threading.local()
+        # O SQLite aceita um único escritor por vez
+        self._lock_escrita = threading.Lock()
+        super().__init__(**opcoes)
+
+    def _conectar(self):
+        try:
+            with open(ARQUIVO_ESQUEMA, encoding='utf-8') as arquivo:
+                esquema = arquivo.read()
+            
+            conexao = self._conexao()
+            with self._lock_escrita:
+                migrado = self._migrar_para_centavos(conexao)
+                conexao.executescript(esquema)
+            
+            if migrado:
+                # O esquema recriou gastos_mensal (agora em centavos); recalcula a partir dos gastos
+                self._reconstruir_resumo_mensal()
+            
+            logger.info(f"Banco SQLite aberto em {self.caminho}")
+        except Exception as e:
+            logger.error(f"Erro ao abrir banco SQLite: {e}")
+            raise
+
+    @staticmethod
+    def _migrar_para_centavos(conexao):
+        """
+        Converte bancos criados antes dos valores em centavos: gastos.valor (em reais)
+        vira gastos.valor_centavos, e gastos_mensal e seus triggers são removidos para
+        o esquema recriá-los. Retorna True se houve migração.
+        """
+        colunas = {linha['name'] for linha in conexao.execute("PRAGMA table_info(gastos)")}
+        
+        if 'valor' not in colunas:
+            return False
+        
+        with conexao:
+            for trigger in ('trg_gastos_mensal_insert', 'trg_gastos_mensal_delete', 'trg_gastos_mensal_update'):
+                conexao.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+            conexao.execute("DROP TABLE IF EXISTS gastos_mensal")
+            
+            conexao.execute("ALTER TABLE gastos ADD COLUMN valor_centavos INTEGER NOT NULL DEFAULT 0")
+            conexao.execute("UPDATE gastos SET valor_centavos = CAST(ROUND(valor * 100) AS INTEGER)")
+            conexao.execute("ALTER TABLE gastos DROP COLUMN valor")
+        
+        logger.info("Banco SQLite migrado para valores em centavos")
+        return True
+
+    def _conexao(self):
+        """Retorna a conexão da thread atual (o sqlite3 não compartilha conexões entre threads)"""
+        conexao = getattr(self._local, 'conexao', None)
+        
+        if conexao is None:
+            conexao = sqlite3.connect(self.caminho, timeout=30)
+            conexao.row_factory = sqlite3.Row
+            conexao.execute("PRAGMA journal_mode=WAL")
+            conexao.execute("PRAGMA synchronous=NORMAL")
+            conexao.execute("PRAGMA foreign_keys=ON")
+            self._local.conexao = conexao
+        
+        return conexao
+
+    def _inserir_gastos(self, gastos):
+        conexao = self._conexao()
+        linha = f"({', '.join('?' * len(COLUNAS_INSERCAO))})"
+        ids = []
+        
+        with self._lock_escrita, conexao:
+            for inicio in range(0, len(gastos), GASTOS_POR_INSERT):
+                lote = gastos[inicio:inicio + GASTOS_POR_INSERT]
+                cursor = conexao.execute(
+                    f"INSERT INTO gastos ({', '.join(COLUNAS_INSERCAO)}) VALUES {', '.join([linha] * len(lote))}",
+                    [gasto.get(coluna) for gasto in lote for coluna in COLUNAS_INSERCAO]
+                )
+                # Um único INSERT, com a escrita travada, numera as linhas em sequência:
+                # lastrowid é o id da última e as anteriores vêm logo antes
+                ids.extend(range(cursor.lastrowid - len(lote) + 1, cursor.lastrowid + 1))
+        
+        if not ids:
+            return []
+        
+        # Os ids são contíguos (mesma transação), então um intervalo basta, sem um
+        # parâmetro por gasto
+        linhas = conexao.execute("SELECT * FROM gastos WHERE id BETWEEN ? AND ? ORDER BY id", (ids[0], ids[-1]))
+        return [dict(linha) for linha in linhas]
+
+    def _consultar_gastos(self, usuario_id, data_inicio=None, data_fim=None, forma_pagamento=None,
+                          categoria=None, cursor=None, limite=None, colunas=None, desde=None, ate=None):
+        # As colunas já foram validadas contra COLUNAS_GASTO
+        projecao = ', '.join(colunas) if colunas else '*'
+        filtro, params = self._filtros(usuario_id, data_inicio, data_fim, forma_pagamento, categoria)
+        sql = f"SELECT {projecao} FROM gastos WHERE {filtro}"
+        
+        if cursor:
+            # Continua a partir do último gasto da página anterior
+            data, gasto_id = cursor
+            sql += " AND (data < ? OR (data = ? AND id < ?))"
+            params += [data, data, gasto_id]
+        
+        if desde:
+            # Apenas gastos registrados depois do cursor de exportação
+            criado_em, gasto_id = desde
+            sql += " AND (criado_em > ? OR (criado_em = ? AND id > ?))"
+            params += [criado_em, criado_em, gasto_id]
+        
+        if ate:
+            criado_em, gasto_id = ate
+            sql += " AND (criado_em < ? OR (criado_em = ? AND id <= ?))"
+            params += [criado_em, criado_em, gasto_id]
+        
+        sql += " ORDER BY data DESC, id DESC"
+        
+        if limite:
+            sql += " LIMIT ?"
+            params.append(limite)
+        
+        return [dict(linha) for linha in self._conexao().execute(sql, params)]
+
+    def _consultar_impressao(self, usuario_id, data_inicio=None, data_fim=None,
+                             forma_pagamento=None, categoria=None):
+        filtro, params = self._filtros(usuario_id, data_inicio, data_fim, forma_pagamento, categoria)
+        linha = self._conexao().execute(
+            f"SELECT COUNT(*) OVER (), criado_em, id FROM gastos WHERE {filtro} "
+            "ORDER BY criado_em DESC, id DESC LIMIT 1",
+            params
+        ).fetchone()
+        return tuple(linha) if linha else (0, None, None)
+
+    @staticmethod
+    def _filtros(usuario_id, data_inicio=None, data_fim=None, forma_pagamento=None, categoria=None):
+        """Monta a cláusula WHERE (sem a palavra WHERE) e seus parâmetros"""
+        sql = "usuario_id = ?"
+        params = [usuario_id]
+        
+        if data_inicio:
+            sql += " AND data >= ? AND data < ?"
+            params += [data_inicio, data_fim]
+        
+        if forma_pagamento:
+            sql += " AND forma_pagamento = ?"
+            params.append(forma_pagamento)
+        
+        if categoria:
+            sql += " AND categoria = ?"
+            params.append(categoria)
+        
+        return sql, params
+
+    def _consultar_resumo_mensal(self, coluna, usuario_id, data_inicio, data_fim, forma_pagamento, categoria):
+        """Soma gastos_mensal agrupando por `coluna` ('categoria' ou 'forma_pagamento')"""
+        sql = (
+            f"SELECT {coluna}, SUM(total_centavos) AS total_centavos, SUM(quantidade) AS quantidade "
+            "FROM gastos_mensal WHERE usuario_id = ?"
+        )
+        params = [usuario_id]
+        
+        if data_inicio:
+            sql += " AND mes >= ? AND mes < ?"
+            params += [data_inicio, data_fim]
+        
+        if forma_pagamento:
+            sql += " AND forma_pagamento = ?"
+            params.append(forma_pagamento)
+        
+        if categoria:
+            sql += " AND categoria = ?"
+            params.append(categoria)
+        
+        sql += f" GROUP BY {coluna} ORDER BY total_centavos DESC"
+        
+        return [dict(linha) for linha in self._conexao().execute(sql, params)]
+
+    def _consultar_resumo_por_categoria(self, usuario_id, data_inicio=None, data_fim=None,
+                                        forma_pagamento=None, categoria=None):
+        return self._consultar_resumo_mensal(
+            'categoria', usuario_id, data_inicio, data_fim, forma_pagamento, categoria
+        )
+
+    def _consultar_resumo_por_forma_pagamento(self, usuario_id, data_inicio=None, data_fim=None,
+                                              forma_pagamento=None, categoria=None):
+        return self._consultar_resumo_mensal(
+            'forma_pagamento', usuario_id, data_inicio, data_fim, forma_pagamento, categoria
+        )
+
+    def _ler_cursor_exportacao(self, usuario_id):
+        linha = self._conexao().execute(
+            "SELECT criado_em, gasto_id, file_id, formato FROM cursores_exportacao WHERE usuario_id = ?",
+            [usuario_id]
+        ).fetchone()
+        return dict(linha) if linha else None
+
+    def _gravar_cursor_exportacao(self, usuario_id, criado_em, gasto_id, file_id=None, formato=None):
+        conexao = self._conexao()
+        
+        with self._lock_escrita, conexao:
+            conexao.execute(
+                "INSERT INTO cursores_exportacao (usuario_id, criado_em, gasto_id, file_id, formato) "
+                "VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (usuario_id) DO UPDATE SET criado_em = excluded.criado_em, "
+                "gasto_id = excluded.gasto_id, file_id = excluded.file_id, formato = excluded.formato, "
+                "atualizado_em = strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now')",
+                [usuario_id, criado_em, gasto_id, file_id, formato]
+            )
+
+    def _reconstruir_resumo_mensal(self, usuario_id=None):
+        conexao = self._conexao()
+        filtro = "" if usuario_id is None else " WHERE usuario_id = ?"
+        params = [] if usuario_id is None else [usuario_id]
+        
+        with self._lock_escrita, conexao:
+            conexao.execute(f"DELETE FROM gastos_mensal{filtro}", params)
+            cursor = conexao.execute(
+                "INSERT INTO gastos_mensal (usuario_id, mes, categoria, forma_pagamento, total_centavos, quantidade) "
+                "SELECT usuario_id, substr(data, 1, 7) || '-01', categoria, forma_pagamento, SUM(valor_centavos), COUNT(*) "
+                f"FROM gastos{filtro} GROUP BY 1, 2, 3, 4",
+                params
+            )
+            return cursor.rowcount
+
+    def _gravar_usuario(self, telegram_id, nome):
+        conexao = self._conexao()
+        
+        with self._lock_escrita, conexao:
+            conexao.execute(
+                "INSERT INTO usuarios (telegram_id, nome) VALUES (?, ?) "
+                "ON CONFLICT (telegram_id) DO UPDATE SET nome = excluded.nome",
+                (telegram_id, nome)
+            )
+            linha = conexao.execute("SELECT id FROM usuarios WHERE telegram_id = ?", (telegram_id,)).fetchone()
+        
+        return linha['id'] if linha else None
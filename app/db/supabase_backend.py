@@ -0,0 +1,172 @@
+from supabase import create_client
+from config import SUPABASE_URL, SUPABASE_KEY
+from app.db.database import Database
+from datetime import datetime, timezone
+import logging
+
+logger = logging.getLogger(__name__)
+
+class SupabaseDatabase(Database):
+    """
+    Armazenamento no Supabase (Postgres acessado via PostgREST)
+    """
+    def _conectar(self):
+        try:
+            self.supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+            logger.info("Conexão com Supabase estabelecida com sucesso")
+            self._criar_tabelas_se_nao_existem()
+        except Exception as e:
+            logger.error(f"Erro ao conectar com Supabase: {e}")
+            raise
+
+    def _criar_tabelas_se_nao_existem(self):
+        """
+        Cria as tabelas necessárias no Supabase se elas não existirem.
+        Na implementação real, isso seria feito com migrations do Supabase
+        (ver criar_tabelas.sql). Aqui apenas documentamos a estrutura esperada.
+        """
+        # Tabela de usuários
+        # id (primary key)
+        # telegram_id (unique)
+        # nome
+        # data_cadastro
+        
+        # Tabela de gastos
+        # id (primary key)
+        # usuario_id (foreign key para users)
+        # valor_centavos (bigint, valor em centavos)
+        # forma_pagamento (text)
+        # parcelas (integer)
+        # categoria (text)
+        # local (text)
+        # data (date)
+        # criado_em (timestamp)
+        pass
+
+    def _inserir_gastos(self, gastos):
+        result = self.supabase.table('gastos').insert(gastos).execute()
+        return result.data
+
+    def _consultar_gastos(self, usuario_id, data_inicio=None, data_fim=None, forma_pagamento=None,
+                          categoria=None, cursor=None, limite=None, colunas=None, desde=None, ate=None):
+        projecao = ','.join(colunas) if colunas else '*'
+        query = self._filtrar(
+            self.supabase.table('gastos').select(projecao),
+            usuario_id, data_inicio, data_fim, forma_pagamento, categoria
+        )
+        
+        # Condições compostas, combinadas em um único parâmetro `and`
+        # (esta versão do postgrest-py não expõe `or_`, então o parâmetro é montado diretamente)
+        condicoes = []
+        
+        if cursor:
+            # Continua a partir do último gasto da página anterior
+            data, gasto_id = cursor
+            condicoes.append(f"or(data.lt.{data},and(data.eq.{data},id.lt.{gasto_id}))")
+        
+        if desde:
+            # Apenas gastos registrados depois do cursor de exportação
+            criado_em, gasto_id = desde
+            condicoes.append(f'or(criado_em.gt."{criado_em}",and(criado_em.eq."{criado_em}",id.gt.{gasto_id}))')
+        
+        if ate:
+            criado_em, gasto_id = ate
+            condicoes.append(f'or(criado_em.lt."{criado_em}",and(criado_em.eq."{criado_em}",id.lte.{gasto_id}))')
+        
+        if condicoes:
+            query.params = query.params.add('and', f"({','.join(condicoes)})")
+        
+        # Ordena por data e id (um único parâmetro `order`, pois o PostgREST não combina repetidos)
+        query.params = query.params.add('order', 'data.desc,id.desc')
+        
+        if limite:
+            query = query.limit(limite)
+        
+        return query.execute().data
+
+    def _consultar_impressao(self, usuario_id, data_inicio=None, data_fim=None,
+                             forma_pagamento=None, categoria=None):
+        # Uma única requisição: a contagem vem no cabeçalho e a linha é a do último gasto registrado
+        query = self._filtrar(
+            self.supabase.table('gastos').select('id', 'criado_em', count='exact'),
+            usuario_id, data_inicio, data_fim, forma_pagamento, categoria
+        )
+        query.params = query.params.add('order', 'criado_em.desc,id.desc')
+        result = query.limit(1).execute()
+        
+        if not result.data:
+            return (result.count or 0, None, None)
+        
+        return (result.count, result.data[0]['criado_em'], result.data[0]['id'])
+
+    def _ler_cursor_exportacao(self, usuario_id):
+        colunas = 'criado_em,gasto_id,file_id,formato'
+        result = self.supabase.table('cursores_exportacao').select(colunas).eq('usuario_id', usuario_id).execute()
+        return result.data[0] if result.data else None
+
+    def _gravar_cursor_exportacao(self, usuario_id, criado_em, gasto_id, file_id=None, formato=None):
+        data = {
+            "usuario_id": usuario_id,
+            "criado_em": criado_em,
+            "gasto_id": gasto_id,
+            "file_id": file_id,
+            "formato": formato,
+            "atualizado_em": datetime.now(timezone.utc).isoformat()
+        }
+        
+        self.supabase.table('cursores_exportacao').upsert(data, on_conflict='usuario_id').execute()
+
+    @staticmethod
+    def _filtrar(query, usuario_id, data_inicio=None, data_fim=None, forma_pagamento=None, categoria=None):
+        """Aplica os filtros de usuário, período, forma de pagamento e categoria"""
+        query = query.eq('usuario_id', usuario_id)
+        
+        if data_inicio:
+            query = query.gte('data', data_inicio).lt('data', data_fim)
+        
+        if forma_pagamento:
+            # Filtra por forma de pagamento
+            query = query.eq('forma_pagamento', forma_pagamento)
+        
+        if categoria:
+            # Filtra por categoria
+            query = query.eq('categoria', categoria)
+        
+        return query
+
+    def _consultar_resumo_rpc(self, funcao, usuario_id, data_inicio, data_fim, forma_pagamento, categoria):
+        params = {
+            "p_usuario_id": usuario_id,
+            "p_data_inicio": data_inicio,
+            "p_data_fim": data_fim,
+            "p_forma_pagamento": forma_pagamento,
+            "p_categoria": categoria
+        }
+        
+        result = self.supabase.rpc(funcao, params).execute()
+        return result.data or []
+
+    def _consultar_resumo_por_categoria(self, usuario_id, data_inicio=None, data_fim=None,
+                                        forma_pagamento=None, categoria=None):
+        return self._consultar_resumo_rpc(
+            'resumo_gastos_por_categoria', usuario_id, data_inicio, data_fim, forma_pagamento, categoria
+        )
+
+    def _consultar_resumo_por_forma_pagamento(self, usuario_id, data_inicio=None, data_fim=None,
+                                              forma_pagamento=None, categoria=None):
+        return self._consultar_resumo_rpc(
+            'resumo_gastos_por_forma_pagamento', usuario_id, data_inicio, data_fim, forma_pagamento, categoria
+        )
+
+    def _reconstruir_resumo_mensal(self, usuario_id=None):
+        result = self.supabase.rpc('reconstruir_gastos_mensal', {"p_usuario_id": usuario_id}).execute()
+        return result.data
+
+    def _gravar_usuario(self, telegram_id, nome):
+        data = {
+            "telegram_id": telegram_id,
+            "nome": nome
+        }
+        
+        result = self.supabase.table('usuarios').upsert(data, on_conflict='telegram_id').execute()
+        return result.data[0]['id'] if result.data else None
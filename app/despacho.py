@@ -0,0 +1,241 @@
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+from queue import Queue
+from telegram import Update
+from telegram.ext import Dispatcher, ConversationHandler, JobQueue, Updater, ExtBot
+from telegram.utils.request import Request
+from config import HANDLER_WORKERS
+
+logger = logging.getLogger(__name__)
+
+class ExecutorSerializado:
+    """
+    Pool de threads que executa as tarefas de uma mesma chave uma de cada vez,
+    na ordem em que foram submetidas; tarefas de chaves diferentes rodam em paralelo.
+    
+    Cada chave com tarefas pendentes ocupa no máximo uma thread: ao terminar uma
+    tarefa, a próxima da mesma chave volta para o fim da fila do pool, dando a
+    vez às outras chaves.
+    """
+    def __init__(self, trabalhadores, nome='handler'):
+        self._executor = ThreadPoolExecutor(max_workers=trabalhadores, thread_name_prefix=nome)
+        self._condicao = threading.Condition()
+        self._filas = {}
+
+    def submeter(self, chave, funcao, *args):
+        """Enfileira funcao(*args) atrás das tarefas pendentes da chave"""
+        with self._condicao:
+            fila = self._filas.setdefault(chave, deque())
+            fila.append((funcao, args))
+            ociosa = len(fila) == 1
+        
+        if ociosa:
+            self._executor.submit(self._executar, chave)
+
+    def _executar(self, chave):
+        with self._condicao:
+            funcao, args = self._filas[chave][0]
+        
+        try:
+            funcao(*args)
+        except Exception as e:
+            logger.error(f"Erro em tarefa da chave {chave}: {e}")
+        
+        with self._condicao:
+            fila = self._filas[chave]
+            fila.popleft()
+            
+            if fila:
+                self._executor.submit(self._executar, chave)
+            else:
+                del self._filas[chave]
+                self._condicao.notify_all()
+
+    def estatisticas(self):
+        """Chaves com tarefas e total de tarefas pendentes (incluindo as em execução)"""
+        with self._condicao:
+            return {
+                "chaves_ativas": len(self._filas),
+                "tarefas_pendentes": sum(len(fila) for fila in self._filas.values())
+            }
+
+    def encerrar(self, tempo_limite=60):
+        """Aguarda as tarefas pendentes e libera as threads"""
+        with self._condicao:
+            self._condicao.wait_for(lambda: not self._filas, timeout=tempo_limite)
+        self._executor.shutdown(wait=True)
+
+class FilaUpdates(Queue):
+    """
+    Fila de updates que guarda o instante de chegada de cada um; depois de cada
+    get(), `recebido_em` tem o instante do update retirado (o dispatcher é o
+    único consumidor)
+    """
+    recebido_em = None
+
+    def _put(self, item):
+        self.queue.append((time.perf_counter(), item))
+
+    def _get(self):
+        self.recebido_em, item = self.queue.popleft()
+        return item
+
+class MetricasHandlers:
+    """
+    Tempo de espera na fila (do recebimento do update até o início do handler) e
+    tempo de execução de cada handler, para o endpoint /metricas
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._handlers = {}
+        self._local = threading.local()
+        self.executor = None
+
+    def iniciar_update(self, espera):
+        """Registra, na thread que vai processar o update, quanto ele esperou na fila"""
+        self._local.espera = espera
+
+    def medir(self, callback):
+        """Envolve o callback de um handler para medir a espera e a execução de cada chamada"""
+        nome = f"{callback.__module__.rsplit('.', 1)[-1]}.{callback.__name__}"
+
+        @wraps(callback)
+        def medido(update, context):
+            # A espera conta só para o primeiro handler que atende o update
+            espera = getattr(self._local, 'espera', 0.0)
+            self._local.espera = 0.0
+            inicio = time.perf_counter()
+            try:
+                return callback(update, context)
+            finally:
+                self._registrar(nome, espera, time.perf_counter() - inicio)
+        
+        medido.medido = True
+        return medido
+
+    def _registrar(self, nome, espera, execucao):
+        with self._lock:
+            metricas = self._handlers.get(nome)
+            if metricas is None:
+                metricas = self._handlers[nome] = {
+                    'chamadas': 0, 'espera_total': 0.0, 'espera_max': 0.0,
+                    'execucao_total': 0.0, 'execucao_max': 0.0
+                }
+            
+            metricas['chamadas'] += 1
+            metricas['espera_total'] += espera
+            metricas['espera_max'] = max(metricas['espera_max'], espera)
+            metricas['execucao_total'] += execucao
+            metricas['execucao_max'] = max(metricas['execucao_max'], execucao)
+
+    def estatisticas(self):
+        """Médias e máximos (em ms) por handler e o estado da fila do executor"""
+        with self._lock:
+            handlers = {
+                nome: {
+                    'chamadas': m['chamadas'],
+                    'espera_media_ms': round(m['espera_total'] / m['chamadas'] * 1000, 2),
+                    'espera_max_ms': round(m['espera_max'] * 1000, 2),
+                    'execucao_media_ms': round(m['execucao_total'] / m['chamadas'] * 1000, 2),
+                    'execucao_max_ms': round(m['execucao_max'] * 1000, 2)
+                }
+                for nome, m in self._handlers.items()
+            }
+        
+        estatisticas = {"handlers": handlers}
+        if self.executor:
+            estatisticas["fila"] = self.executor.estatisticas()
+        return estatisticas
+
+class DispatcherConcorrente(Dispatcher):
+    """
+    Dispatcher que processa updates de usuários diferentes em paralelo, em um
+    pool de `trabalhadores` threads, mantendo estritamente em ordem os updates
+    de um mesmo usuário (e, portanto, as etapas de cada ConversationHandler).
+    Os handlers fazem chamadas bloqueantes ao banco e à API do Telegram; assim,
+    uma chamada lenta atrasa só o usuário que a fez.
+    
+    Com `trabalhadores` = 0, processa um update de cada vez, como o Dispatcher
+    padrão. Em ambos os casos, mede a espera e a execução de cada handler.
+    """
+    def __init__(self, *args, trabalhadores=HANDLER_WORKERS, metricas=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metricas = metricas or metricas_handlers
+        self.executor = ExecutorSerializado(trabalhadores) if trabalhadores > 0 else None
+        self.metricas.executor = self.executor
+
+    def add_handler(self, handler, group=0):
+        self._instrumentar(handler)
+        super().add_handler(handler, group)
+
+    def _instrumentar(self, handler):
+        """Troca os callbacks do handler (e dos handlers internos das conversas) pelas versões medidas"""
+        if isinstance(handler, ConversationHandler):
+            internos = list(handler.entry_points) + list(handler.fallbacks)
+            for handlers_estado in handler.states.values():
+                internos.extend(handlers_estado)
+            
+            for interno in internos:
+                self._instrumentar(interno)
+            return
+        
+        callback = getattr(handler, 'callback', None)
+        if callback and not getattr(callback, 'medido', False):
+            handler.callback = self.metricas.medir(callback)
+
+    def process_update(self, update):
+        chave = self._chave(update)
+        recebido_em = getattr(self.update_queue, 'recebido_em', None) or time.perf_counter()
+        
+        if self.executor is None or chave is None:
+            self._processar(update, recebido_em)
+            return
+        
+        # Volta logo para a fila de updates; o update roda no pool, atrás dos anteriores do usuário
+        self.executor.submeter(chave, self._processar, update, recebido_em)
+
+    def _processar(self, update, recebido_em):
+        self.metricas.iniciar_update(time.perf_counter() - recebido_em)
+        super().process_update(update)
+
+    @staticmethod
+    def _chave(update):
+        """Usuário do update (ou o chat, se não houver usuário); None para erros e outros objetos"""
+        if not isinstance(update, Update):
+            return None
+        
+        if update.effective_user:
+            return update.effective_user.id
+        
+        return update.effective_chat.id if update.effective_chat else None
+
+    def stop(self):
+        super().stop()
+        if self.executor:
+            # Conclui os updates já distribuídos antes de encerrar
+            self.executor.encerrar()
+
+def criar_updater(token, base_url=None, trabalhadores=HANDLER_WORKERS):
+    """
+    Cria o Updater com um DispatcherConcorrente e um pool de conexões com a API
+    do Telegram grande o bastante para todas as threads de handlers
+    """
+    # Uma conexão por thread de handler, mais as que o Updater reserva
+    # (workers do run_async, dispatcher, polling, job queue e thread principal)
+    trabalhadores_async = 4
+    request = Request(con_pool_size=trabalhadores + trabalhadores_async + 4)
+    bot = ExtBot(token, base_url, request=request)
+    job_queue = JobQueue()
+    dispatcher = DispatcherConcorrente(
+        bot, FilaUpdates(), workers=trabalhadores_async, job_queue=job_queue, trabalhadores=trabalhadores
+    )
+    job_queue.set_dispatcher(dispatcher)
+    # workers=None: o padrão (4) é recusado junto com um dispatcher pronto
+    return Updater(dispatcher=dispatcher, workers=None)
+
+# Métricas globais dos handlers (expostas em /metricas)
+metricas_handlers = MetricasHandlers()
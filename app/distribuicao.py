@@ -0,0 +1,253 @@
+import bisect
+import hashlib
+import http.client
+import json
+import logging
+import os
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+# Raiz do projeto, onde fica o main.py executado pelos workers locais
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def chave_roteamento(dados):
+    """
+    Chave usada para escolher o worker de um update (dicionário da Bot API):
+    o id do usuário que o enviou, ou o do chat para updates sem usuário (ex.:
+    posts de canal). É a mesma chave do DispatcherConcorrente e dos caches por
+    usuário (identidade, consultas, listas exibidas); como os ConversationHandler
+    guardam o estado por chat e usuário, cada conversa também fica em um só worker,
+    mesmo que o usuário alterne entre chats.
+    
+    Returns:
+        int: Chave do update, ou 0 se ele não tiver usuário nem chat
+    """
+    for campo, conteudo in dados.items():
+        if campo == 'update_id' or not isinstance(conteudo, dict):
+            continue
+        
+        # message, callback_query, inline_query... têm o usuário em 'from'; chat_join_request, em 'user'
+        usuario = conteudo.get('from') or conteudo.get('user')
+        if usuario:
+            return usuario['id']
+        
+        # channel_post e afins só têm o chat (direto ou na mensagem)
+        chat = conteudo.get('chat') or (conteudo.get('message') or {}).get('chat')
+        if chat:
+            return chat['id']
+    
+    return 0
+
+def _hash(texto):
+    """Hash estável entre processos (o hash() do Python muda a cada execução)"""
+    return int.from_bytes(hashlib.blake2b(texto.encode('utf-8'), digest_size=8).digest(), 'big')
+
+class AnelHash:
+    """
+    Hash consistente: cada nó ocupa `replicas` pontos em um anel e a chave vai
+    para o primeiro ponto depois do seu hash. Ao incluir ou retirar um worker,
+    só as chaves do trecho dele mudam de dono; as demais conversas continuam
+    no mesmo worker.
+    """
+    def __init__(self, nos, replicas=100):
+        if not nos:
+            raise ValueError("O anel precisa de pelo menos um nó")
+        
+        pontos = sorted((_hash(f"{no}#{i}"), no) for no in nos for i in range(replicas))
+        self._hashes = [h for h, _ in pontos]
+        self._nos = [no for _, no in pontos]
+        self.nos = list(nos)
+
+    def no(self, chave):
+        """Nó responsável pela chave"""
+        indice = bisect.bisect(self._hashes, _hash(str(chave)))
+        return self._nos[indice % len(self._nos)]
+
+class Encaminhador:
+    """
+    Ingresso do webhook: repassa cada update, sem decodificá-lo por inteiro, ao
+    worker escolhido por hash consistente do usuário (ver chave_roteamento).
+    
+    Os updates de um mesmo usuário são repassados um de cada vez (travas por faixa
+    de chave), na ordem em que chegaram; como cada worker enfileira os updates
+    na ordem de recebimento, eles são processados em ordem. Usuários diferentes
+    são repassados em paralelo, por conexões persistentes de cada thread.
+    """
+    def __init__(self, workers, segredo, caminho, travas=64, tempo_limite=10):
+        self.anel = AnelHash(workers)
+        self.segredo = segredo
+        self.caminho = caminho
+        self.tempo_limite = tempo_limite
+        self._travas = [threading.Lock() for _ in range(travas)]
+        self._local = threading.local()
+        self._lock_estatisticas = threading.Lock()
+        self._estatisticas = {worker: {'encaminhados': 0, 'falhas': 0} for worker in workers}
+
+    def encaminhar(self, corpo):
+        """
+        Repassa o corpo JSON de um update ao worker do seu usuário.
+        
+        Returns:
+            bool: True se o worker aceitou o update
+        """
+        try:
+            chave = chave_roteamento(json.loads(corpo))
+        except (ValueError, AttributeError, KeyError, TypeError) as e:
+            logger.warning(f"Update sem chave de roteamento válida: {e}")
+            chave = 0
+        
+        worker = self.anel.no(chave)
+        
+        with self._travas[chave % len(self._travas)]:
+            aceito = self._postar(worker, corpo)
+        
+        with self._lock_estatisticas:
+            self._estatisticas[worker]['encaminhados' if aceito else 'falhas'] += 1
+        
+        return aceito
+
+    def encaminhar_update(self, update, tentativas=3):
+        """
+        Repassa um telegram.Update (recebido por long polling) ao worker do seu usuário,
+        tentando de novo em caso de falha, já que o Telegram não reenviará o update
+        """
+        corpo = update.to_json().encode('utf-8')
+        
+        for tentativa in range(tentativas):
+            if self.encaminhar(corpo):
+                return True
+            time.sleep(0.5 * (tentativa + 1))
+        
+        logger.error(f"Update {update.update_id} descartado: nenhum worker o aceitou")
+        return False
+
+    def _postar(self, worker, corpo):
+        """POST do update no worker; refaz a conexão uma vez se a persistente tiver caído"""
+        for tentativa in range(2):
+            conexao = self._conexao(worker)
+            try:
+                conexao.request('POST', self.caminho, corpo, {
+                    'Content-Type': 'application/json',
+                    'X-Telegram-Bot-Api-Secret-Token': self.segredo
+                })
+                resposta = conexao.getresponse()
+                resposta.read()
+                
+                if resposta.status != 200:
+                    logger.error(f"Worker {worker} recusou o update: HTTP {resposta.status}")
+                return resposta.status == 200
+            except (OSError, http.client.HTTPException) as e:
+                conexao.close()
+                self._local.conexoes.pop(worker, None)
+                if tentativa:
+                    logger.error(f"Erro ao encaminhar update para o worker {worker}: {e}")
+        
+        return False
+
+    def _conexao(self, worker):
+        """Conexão persistente da thread atual com o worker"""
+        conexoes = getattr(self._local, 'conexoes', None)
+        if conexoes is None:
+            conexoes = self._local.conexoes = {}
+        
+        if worker not in conexoes:
+            endereco = urlsplit(worker)
+            classe = http.client.HTTPSConnection if endereco.scheme == 'https' else http.client.HTTPConnection
+            conexoes[worker] = classe(endereco.hostname, endereco.port, timeout=self.tempo_limite)
+        
+        return conexoes[worker]
+
+    def pronto(self, tempo_limite=2):
+        """
+        Indica se todos os workers estão prontos (respondem 200 em /pronto), para
+        a prontidão do ingresso
+        """
+        for worker in self.anel.nos:
+            endereco = urlsplit(worker)
+            classe = http.client.HTTPSConnection if endereco.scheme == 'https' else http.client.HTTPConnection
+            conexao = classe(endereco.hostname, endereco.port, timeout=tempo_limite)
+            
+            try:
+                conexao.request('GET', '/pronto')
+                resposta = conexao.getresponse()
+                resposta.read()
+                if resposta.status != 200:
+                    return False
+            except (OSError, http.client.HTTPException):
+                return False
+            finally:
+                conexao.close()
+        
+        return True
+
+    def estatisticas(self):
+        """Updates repassados e falhas por worker, para o endpoint /metricas"""
+        with self._lock_estatisticas:
+            return {worker: dict(contagem) for worker, contagem in self._estatisticas.items()}
+
+class WorkersLocais:
+    """
+    Processos worker na mesma máquina (um por núcleo, por exemplo): cada um roda
+    o main.py em modo worker, na porta `porta_inicial + i`, com seu próprio
+    dispatcher, caches e arquivo de gastos pendentes. Um worker que terminar
+    inesperadamente é reiniciado na mesma porta, mantendo sua fatia do anel.
+    """
+    def __init__(self, quantidade, porta_inicial, segredo, intervalo_supervisao=5):
+        self.quantidade = quantidade
+        self.porta_inicial = porta_inicial
+        self.segredo = segredo
+        self.intervalo_supervisao = intervalo_supervisao
+        self._processos = {}
+        self._encerrando = threading.Event()
+
+    @property
+    def urls(self):
+        return [f"http://127.0.0.1:{self.porta_inicial + i}" for i in range(self.quantidade)]
+
+    def iniciar(self):
+        """Inicia os workers e a supervisão; retorna as URLs para o anel"""
+        for indice in range(self.quantidade):
+            self._iniciar_worker(indice)
+        
+        threading.Thread(target=self._supervisionar, name="supervisao-workers", daemon=True).start()
+        return self.urls
+
+    def _iniciar_worker(self, indice):
+        ambiente = dict(
+            os.environ,
+            PORT=str(self.porta_inicial + indice),
+            WEBHOOK_WORKER='true',
+            WEBHOOK_SECRET=self.segredo,
+            WEBHOOK_WORKERS='',
+            WEBHOOK_WORKERS_LOCAIS='0',
+            # Cada processo grava os próprios gastos pendentes
+            WRITE_BEHIND_SPOOL_FILE=f"{os.getenv('WRITE_BEHIND_SPOOL_FILE', 'gastos_pendentes.jsonl')}.{indice}"
+        )
+        self._processos[indice] = subprocess.Popen([sys.executable, 'main.py'], cwd=RAIZ, env=ambiente)
+        logger.info(f"Worker {indice} iniciado na porta {self.porta_inicial + indice}")
+
+    def _supervisionar(self):
+        while not self._encerrando.wait(self.intervalo_supervisao):
+            for indice, processo in list(self._processos.items()):
+                if processo.poll() is not None and not self._encerrando.is_set():
+                    logger.error(f"Worker {indice} terminou (código {processo.returncode}); reiniciando")
+                    self._iniciar_worker(indice)
+
+    def encerrar(self, tempo_limite=30):
+        """Pede o encerramento dos workers (que gravam as pendências) e aguarda"""
+        self._encerrando.set()
+        
+        for processo in self._processos.values():
+            processo.terminate()
+        
+        for indice, processo in self._processos.items():
+            try:
+                processo.wait(timeout=tempo_limite)
+            except subprocess.TimeoutExpired:
+                logger.error(f"Worker {indice} não encerrou em {tempo_limite}s")
+                processo.kill()
@@ -0,0 +1,144 @@
+from array import array
+import numpy as np
+import pandas as pd
+from app.utils.dinheiro import reais
+
+# Quantidade de estabelecimentos na aba de maiores gastos
+TOP_ESTABELECIMENTOS = 50
+
+class AnaliseGastos:
+    """
+    Acumula os gastos em colunas compactas durante a única passada do exportador
+    e, no final, calcula todas as abas analíticas com agregações vetorizadas
+    (pandas/numpy) sobre esse mesmo conjunto, sem reler os gastos por aba.
+    Os valores são acumulados em centavos (inteiros) e só viram reais nas linhas das abas.
+    """
+    def __init__(self):
+        self.valores = array('q')  # centavos
+        self.meses = array('l')  # ano * 12 + mês - 1
+        self.parcelas = array('l')
+        self.categorias = []
+        self.formas_pagamento = []
+        self.locais = []
+
+    def adicionar(self, valor_centavos, forma_pagamento, parcelas, categoria, local, data):
+        """
+        Registra um gasto: o valor em centavos, como gravado, e os demais campos já
+        convertidos para a planilha (data em DD/MM/AAAA).
+        Gastos sem valor ou com data fora do formato não entram nas análises.
+        """
+        if valor_centavos is None:
+            return
+        
+        try:
+            mes = int(data[6:10]) * 12 + int(data[3:5]) - 1
+        except (TypeError, ValueError):
+            return
+        
+        self.valores.append(valor_centavos)
+        self.meses.append(mes)
+        self.parcelas.append(parcelas or 1)
+        self.categorias.append(categoria)
+        self.formas_pagamento.append(forma_pagamento)
+        self.locais.append((local or '').strip())
+
+    def planilhas(self):
+        """
+        Calcula as abas analíticas
+        
+        Returns:
+            list: Tuplas (nome da aba, cabeçalho, linhas)
+        """
+        if not self.valores:
+            return []
+        
+        dados = pd.DataFrame({
+            'valor': np.frombuffer(self.valores, dtype=np.int64),
+            'mes': np.frombuffer(self.meses, dtype=self.meses.typecode),
+            'parcelas': np.frombuffer(self.parcelas, dtype=self.parcelas.typecode),
+            # Poucos valores distintos: categóricos agrupam por código inteiro
+            'categoria': pd.Categorical(self.categorias),
+            'forma_pagamento': pd.Categorical(self.formas_pagamento),
+            'local': self.locais
+        })
+        
+        return [
+            self._cruzamento(dados, 'categoria', 'Mês x Categoria'),
+            self._cruzamento(dados, 'forma_pagamento', 'Mês x Pagamento'),
+            self._top_estabelecimentos(dados),
+            self._parcelas(dados)
+        ]
+
+    @staticmethod
+    def _cruzamento(dados, coluna, nome_aba):
+        """Total por mês (linhas) e pelos valores de `coluna` (colunas, do maior para o menor total)"""
+        tabela = dados.groupby(['mes', coluna], observed=True)['valor'].sum().unstack(fill_value=0)
+        tabela = tabela[tabela.sum().sort_values(ascending=False).index]
+        tabela['Total'] = tabela.sum(axis=1)
+        tabela = tabela.sort_index() / 100
+        
+        cabecalho = ['Mês'] + [str(c) for c in tabela.columns]
+        linhas = [
+            [_nome_mes(mes)] + valores
+            for mes, valores in zip(tabela.index.tolist(), tabela.values.tolist())
+        ]
+        
+        return nome_aba, cabecalho, linhas
+
+    @staticmethod
+    def _top_estabelecimentos(dados):
+        """Estabelecimentos com maior total gasto"""
+        grupos = dados.groupby('local', sort=False)['valor'].agg(['sum', 'count'])
+        grupos = grupos.nlargest(TOP_ESTABELECIMENTOS, 'sum')
+        grupos['media'] = grupos['sum'] / grupos['count']
+        
+        cabecalho = ['Local/Estabelecimento', 'Total (R$)', 'Compras', 'Ticket médio (R$)']
+        linhas = [
+            [local or '(sem local)', reais(total), int(quantidade), round(reais(media), 2)]
+            for local, total, quantidade, media in zip(
+                grupos.index.tolist(), grupos['sum'].tolist(),
+                grupos['count'].tolist(), grupos['media'].tolist()
+            )
+        ]
+        
+        return 'Top Estabelecimentos', cabecalho, linhas
+
+    @staticmethod
+    def _parcelas(dados):
+        """
+        Valor das parcelas que vencem em cada mês, considerando a primeira
+        parcela no mês da compra e o valor dividido igualmente; os centavos que
+        sobram da divisão vão para a primeira parcela, e a soma das parcelas é o valor da compra
+        """
+        parceladas = dados[dados['parcelas'] > 1]
+        
+        cabecalho = ['Mês', 'Total das parcelas (R$)', 'Parcelas no mês']
+        
+        if parceladas.empty:
+            return 'Parcelas', cabecalho, []
+        
+        quantidades = parceladas['parcelas'].to_numpy()
+        
+        # Uma linha por parcela: repete cada compra e soma o deslocamento (0, 1, 2...) ao mês
+        inicios = np.repeat(np.cumsum(quantidades) - quantidades, quantidades)
+        deslocamentos = np.arange(quantidades.sum()) - inicios
+        meses = np.repeat(parceladas['mes'].to_numpy(), quantidades) + deslocamentos
+        base, resto = np.divmod(parceladas['valor'].to_numpy(), quantidades)
+        valores = np.repeat(base, quantidades)
+        valores[np.cumsum(quantidades) - quantidades] += resto
+        
+        grupos = pd.DataFrame({'mes': meses, 'valor': valores}).groupby('mes')['valor'].agg(['sum', 'count'])
+        
+        linhas = [
+            [_nome_mes(mes), reais(total), int(quantidade)]
+            for mes, total, quantidade in zip(
+                grupos.index.tolist(), grupos['sum'].tolist(), grupos['count'].tolist()
+            )
+        ]
+        
+        return 'Parcelas', cabecalho, linhas
+
+def _nome_mes(mes):
+    """Converte ano * 12 + mês - 1 em MM/AAAA"""
+    ano, indice = divmod(int(mes), 12)
+    return f"{indice + 1:02d}/{ano}"
@@ -0,0 +1,18 @@
+def converter_campo(campo, valor, conversores):
+    """
+    Converte o valor de um campo do gasto para o arquivo exportado.
+    
+    Args:
+        campo: Nome do campo (ex.: 'valor_centavos', 'data')
+        valor: Valor lido do gasto
+        conversores: Dicionário campo -> função de conversão do formato
+    
+    Returns:
+        None se o valor for None; o resultado do conversor do campo, se houver;
+        senão, o texto do valor (categorias e formas de pagamento chegam como enums)
+    """
+    if valor is None:
+        return None
+    
+    conversor = conversores.get(campo)
+    return conversor(valor) if conversor else str(valor)
@@ -0,0 +1,95 @@
+from app.exports.conversao import converter_campo
+from app.exports.excel_exporter import COLUNAS_PLANILHA
+from app.utils.dinheiro import texto_decimal
+from config import EXPORT_SPOOL_MAX_BYTES
+import csv
+import gzip
+import io
+import tempfile
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Campos gravados no CSV e o cabeçalho: os próprios nomes dos campos, mais práticos para
+# quem lê o arquivo em scripts; o valor vai em reais (texto decimal exato) na coluna 'valor'
+CAMPOS_CSV = [campo for campo, _ in COLUNAS_PLANILHA]
+COLUNAS_CSV = ['valor' if campo == 'valor_centavos' else campo for campo in CAMPOS_CSV]
+
+# Conversão dos campos para o texto gravado (o csv grava None como vazio)
+CONVERSORES_CSV = {
+    'valor_centavos': texto_decimal,
+    # Mantém o formato ISO (AAAA-MM-DD), que qualquer ferramenta interpreta
+    'data': lambda valor: str(valor)[:10]
+}
+
+class EscritorCSV:
+    """
+    Gera um arquivo CSV (UTF-8, separado por vírgulas), escrito linha a linha
+    à medida que os gastos chegam; com `compactar=True`, um .csv.gz
+    """
+    def __init__(self, compactar=False):
+        self.compactar = compactar
+        self.extensao = 'csv.gz' if compactar else 'csv'
+        self.linhas = 0
+        self.arquivo = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_MAX_BYTES)
+        self._binario = None
+        self._texto = None
+        self._escritor = None
+        self._cabecalho = True
+
+    def anexar(self, conteudo):
+        """
+        Copia um arquivo exportado antes no mesmo formato, sem descompactá-lo; arquivos
+        gzip concatenados formam um gzip válido. Deve ser chamado antes de `adicionar`.
+        """
+        self.arquivo.write(conteudo)
+        if not self.compactar and not conteudo.endswith(b'\n'):
+            self.arquivo.write(b'\r\n')
+        self._cabecalho = False
+
+    def adicionar(self, gasto):
+        """Converte um gasto (RegistroGasto ou dicionário) e o escreve no arquivo"""
+        if self._escritor is None:
+            self._abrir()
+        
+        self._escritor.writerow([converter_campo(campo, gasto.get(campo), CONVERSORES_CSV) for campo in CAMPOS_CSV])
+        self.linhas += 1
+
+    def tamanho_estimado(self):
+        """Bytes já escritos no arquivo (o que está em buffer é desprezível)"""
+        return self.arquivo.tell()
+
+    def finalizar(self):
+        """Conclui o arquivo e o retorna posicionado no início; quem chamou deve fechá-lo"""
+        if self._escritor is None:
+            self._abrir()
+        
+        # Descarrega o texto sem fechar o arquivo temporário
+        self._texto.flush()
+        self._texto.detach()
+        
+        if self.compactar:
+            # Grava o rodapé do gzip (não fecha o arquivo de destino)
+            self._binario.close()
+        
+        arquivo, self.arquivo = self.arquivo, None
+        arquivo.seek(0)
+        return arquivo
+
+    def fechar(self):
+        """Descarta o arquivo, se ainda não foi entregue por `finalizar`"""
+        if self.arquivo is not None:
+            self.arquivo.close()
+            self.arquivo = None
+
+    def _abrir(self):
+        if self.compactar:
+            self._binario = gzip.GzipFile(fileobj=self.arquivo, mode='wb', compresslevel=6)
+        else:
+            self._binario = self.arquivo
+        
+        self._texto = io.TextIOWrapper(self._binario, encoding='utf-8', newline='')
+        self._escritor = csv.writer(self._texto)
+        
+        if self._cabecalho:
+            self._escritor.writerow(COLUNAS_CSV)
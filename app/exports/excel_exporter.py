@@ -1,86 +1,178 @@
-import pandas as pd
-import os
+from openpyxl import Workbook, load_workbook
+from openpyxl.utils import get_column_letter
+from app.exports.analises import AnaliseGastos
+from app.exports.conversao import converter_campo
+from app.utils.dinheiro import centavos_de_valor, reais
+from config import EXPORT_SPOOL_MAX_BYTES
+import io
+import marshal
+from operator import itemgetter
+import tempfile
 from datetime import datetime
 import logging
 
 logger = logging.getLogger(__name__)
 
-def exportar_gastos_para_excel(gastos, nome_usuario):
+# Colunas da planilha: (campo do gasto, título em português)
+COLUNAS_PLANILHA = [
+    ('valor_centavos', 'Valor (R$)'),
+    ('forma_pagamento', 'Forma de Pagamento'),
+    ('parcelas', 'Parcelas'),
+    ('categoria', 'Categoria'),
+    ('local', 'Local/Estabelecimento'),
+    ('data', 'Data'),
+    ('criado_em', 'Registrado em')
+]
+
+def _data_planilha(valor):
+    try:
+        return datetime.strptime(str(valor)[:10], '%Y-%m-%d').strftime('%d/%m/%Y')
+    except ValueError:
+        return str(valor)
+
+# Conversão dos campos para o formato exibido na planilha
+CONVERSORES_PLANILHA = {
+    # A planilha mostra o valor em reais (célula numérica)
+    'valor_centavos': reais,
+    'data': _data_planilha,
+    'parcelas': int
+}
+
+# Posição de cada campo na linha convertida
+INDICE_COLUNA = {campo: i for i, (campo, _) in enumerate(COLUNAS_PLANILHA)}
+
+# Campos da linha repassados a AnaliseGastos.adicionar depois do valor em centavos,
+# na ordem dos parâmetros
+CAMPOS_ANALISE = itemgetter(*(INDICE_COLUNA[campo] for campo in (
+    'forma_pagamento', 'parcelas', 'categoria', 'local', 'data'
+)))
+
+class EscritorExcel:
     """
-    Exporta os gastos fornecidos para um arquivo Excel
+    Gera uma planilha Excel a partir de gastos recebidos um a um, com memória constante.
     
-    Args:
-        gastos: Lista de dicionários contendo os gastos
-        nome_usuario: Nome do usuário para incluir no nome do arquivo
-        
-    Returns:
-        str: Caminho para o arquivo Excel gerado
+    O openpyxl em modo write-only exige as larguras das colunas antes da primeira
+    linha. Por isso, cada linha convertida é guardada em um arquivo temporário
+    enquanto as larguras são calculadas na mesma passada; em `salvar` (ou `finalizar`),
+    a planilha é escrita em streaming a partir desse arquivo.
+    
+    Com `analises=True`, as abas analíticas (mês x categoria, mês x forma de pagamento,
+    maiores estabelecimentos e parcelas) são calculadas na mesma passada e
+    acrescentadas depois da aba de gastos.
     """
-    try:
-        if not gastos:
-            return None
+    extensao = 'xlsx'
+    
+    # Tamanho do .xlsx em relação às linhas guardadas no arquivo temporário
+    # (medido entre 0,38 e 0,47; o valor maior deixa a estimativa do lado seguro)
+    FATOR_TAMANHO = 0.75
+
+    def __init__(self, nome_aba='Gastos', analises=False):
+        self.nome_aba = nome_aba
+        self.linhas = 0
+        self.larguras = [len(titulo) for _, titulo in COLUNAS_PLANILHA]
+        self.analise = AnaliseGastos() if analises else None
+        self._temporario = tempfile.TemporaryFile()
+
+    def adicionar(self, gasto):
+        """Converte um gasto (RegistroGasto ou dicionário) e o acrescenta à planilha"""
+        linha = tuple(
+            converter_campo(campo, gasto.get(campo), CONVERSORES_PLANILHA) for campo, _ in COLUNAS_PLANILHA
+        )
+        self.adicionar_linha(linha, gasto.get('valor_centavos'))
+
+    def adicionar_linha(self, linha, valor_centavos):
+        """
+        Acrescenta uma linha já convertida (ex.: lida de uma planilha gerada antes)
+        
+        Args:
+            linha: Valores na ordem de COLUNAS_PLANILHA, com o valor em reais
+            valor_centavos: O mesmo valor em centavos, repassado às análises sem reconversão
+        """
+        for i, valor in enumerate(linha):
+            if valor is not None:
+                tamanho = len(str(valor))
+                if tamanho > self.larguras[i]:
+                    self.larguras[i] = tamanho
+        
+        if self.analise:
+            self.analise.adicionar(valor_centavos, *CAMPOS_ANALISE(linha))
         
-        # Criar diretório para arquivos se não existir
-        diretorio = 'exports'
-        if not os.path.exists(diretorio):
-            os.makedirs(diretorio)
+        marshal.dump(linha, self._temporario)
+        self.linhas += 1
+
+    def anexar(self, conteudo):
+        """Acrescenta as linhas de uma planilha gerada antes por este exportador (bytes do .xlsx)"""
+        workbook = load_workbook(io.BytesIO(conteudo), read_only=True)
         
-        # Formatar data para nome do arquivo
-        data_atual = datetime.now().strftime('%Y%m%d_%H%M%S')
-        nome_arquivo = f"{diretorio}/gastos_{nome_usuario.replace(' ', '_')}_{data_atual}.xlsx"
+        try:
+            worksheet = workbook[self.nome_aba] if self.nome_aba in workbook.sheetnames else workbook.active
+            
+            # Pula o cabeçalho; a planilha só guarda o valor em reais, convertido de volta
+            # com Decimal para não herdar o erro de representação do float
+            for linha in worksheet.iter_rows(min_row=2, values_only=True):
+                linha = tuple(linha[:len(COLUNAS_PLANILHA)])
+                self.adicionar_linha(linha, centavos_de_valor(linha[INDICE_COLUNA['valor_centavos']]))
+        finally:
+            workbook.close()
+
+    def tamanho_estimado(self):
+        """Estimativa do tamanho em bytes da planilha com as linhas adicionadas até agora"""
+        return int(self._temporario.tell() * self.FATOR_TAMANHO)
+
+    def finalizar(self):
+        """
+        Escreve a planilha em um arquivo temporário (em memória até EXPORT_SPOOL_MAX_BYTES,
+        depois em disco) e o retorna posicionado no início; quem chamou deve fechá-lo
+        """
+        arquivo = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_MAX_BYTES)
         
-        # Converter para DataFrame
-        df = pd.DataFrame(gastos)
+        try:
+            self.salvar(arquivo)
+        except Exception:
+            arquivo.close()
+            raise
         
-        # Renomear colunas para português
-        colunas = {
-            'valor': 'Valor (R$)',
-            'forma_pagamento': 'Forma de Pagamento',
-            'parcelas': 'Parcelas',
-            'categoria': 'Categoria',
-            'local': 'Local/Estabelecimento',
-            'data': 'Data',
-            'criado_em': 'Registrado em'
-        }
+        arquivo.seek(0)
+        return arquivo
+
+    def salvar(self, destino):
+        """Escreve a planilha em `destino` (caminho ou arquivo binário aberto)"""
+        workbook = Workbook(write_only=True)
+        worksheet = workbook.create_sheet(self.nome_aba)
         
-        # Renomear apenas as colunas que existem no DataFrame
-        colunas_existentes = {k: v for k, v in colunas.items() if k in df.columns}
-        df = df.rename(columns=colunas_existentes)
+        # Autoajustar largura das colunas
+        for i, largura in enumerate(self.larguras, start=1):
+            worksheet.column_dimensions[get_column_letter(i)].width = largura + 2
         
-        # Ordenar por data
-        if 'Data' in df.columns:
-            df['Data'] = pd.to_datetime(df['Data'], errors='coerce')
-            df = df.sort_values(by='Data', ascending=False)
-            df['Data'] = df['Data'].dt.strftime('%d/%m/%Y')
+        worksheet.append([titulo for _, titulo in COLUNAS_PLANILHA])
         
-        # Formatação opcional
-        if 'Valor (R$)' in df.columns:
-            df['Valor (R$)'] = df['Valor (R$)'].astype(float)
+        self._temporario.seek(0)
+        for _ in range(self.linhas):
+            worksheet.append(marshal.load(self._temporario))
         
-        # Remover colunas técnicas que não interessam ao usuário
-        colunas_a_remover = ['id', 'usuario_id']
-        for col in colunas_a_remover:
-            if col in df.columns:
-                df = df.drop(columns=[col])
+        if self.analise:
+            for nome_aba, cabecalho, linhas in self.analise.planilhas():
+                self._escrever_aba(workbook, nome_aba, cabecalho, linhas)
         
-        # Salvar como Excel
-        writer = pd.ExcelWriter(nome_arquivo, engine='openpyxl')
-        df.to_excel(writer, sheet_name='Gastos', index=False)
+        workbook.save(destino)
+
+    @staticmethod
+    def _escrever_aba(workbook, nome_aba, cabecalho, linhas):
+        """Escreve uma aba pequena (já agregada), com largura das colunas ajustada"""
+        worksheet = workbook.create_sheet(nome_aba)
         
-        # Autoajustar largura das colunas
-        worksheet = writer.sheets['Gastos']
-        for i, col in enumerate(df.columns):
-            max_length = max(
-                df[col].astype(str).map(len).max(),
-                len(col)
-            ) + 2
-            worksheet.column_dimensions[chr(65 + i)].width = max_length
+        larguras = [len(str(titulo)) for titulo in cabecalho]
+        for linha in linhas:
+            for i, valor in enumerate(linha):
+                larguras[i] = max(larguras[i], len(str(valor)))
         
-        writer.close()
+        for i, largura in enumerate(larguras, start=1):
+            worksheet.column_dimensions[get_column_letter(i)].width = largura + 2
         
-        logger.info(f"Arquivo Excel exportado com sucesso: {nome_arquivo}")
-        return nome_arquivo
-    
-    except Exception as e:
-        logger.error(f"Erro ao exportar para Excel: {e}")
-        return None 
\ No newline at end of file
+        worksheet.append(cabecalho)
+        for linha in linhas:
+            worksheet.append(linha)
+
+    def fechar(self):
+        """Remove o arquivo temporário"""
+        self._temporario.close()
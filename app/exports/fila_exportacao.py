@@ -0,0 +1,307 @@
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from itertools import chain
+from app.exports.formatos import FORMATOS_EXPORTACAO, FORMATO_PADRAO
+from app.exports.partes import exportar_em_partes
+from app.db.database import CacheLRU
+from config import (
+    EXPORT_WORKERS, EXPORT_PROCESSES, EXPORT_MAX_POR_USUARIO,
+    EXPORT_DEDUP_CACHE_SIZE, EXPORT_DEDUP_CACHE_TTL
+)
+import multiprocessing
+import os
+import queue
+import shutil
+import tempfile
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+class FilaExportacao:
+    """
+    Pool dedicado para as exportações, separado das threads do dispatcher.
+    
+    Cada exportação roda em uma das `threads` do pool; a geração do arquivo
+    pode ainda ser delegada a um pool de `processos` (0 = gera na própria thread).
+    Cada usuário tem no máximo `max_por_usuario` exportações ao mesmo tempo.
+    
+    Também guarda o file_id dos arquivos já enviados ao Telegram, para reenviar
+    uma exportação idêntica sem gerá-la nem transferi-la de novo.
+    """
+    def __init__(self, threads=EXPORT_WORKERS, processos=EXPORT_PROCESSES,
+                 max_por_usuario=EXPORT_MAX_POR_USUARIO):
+        self.processos = processos
+        self.max_por_usuario = max_por_usuario
+        self._executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="exportacao")
+        self._pool_processos = None
+        self._gerenciador = None
+        self._lock = threading.Lock()
+        self._por_usuario = {}
+        self._enviados = CacheLRU(EXPORT_DEDUP_CACHE_SIZE, ttl=EXPORT_DEDUP_CACHE_TTL)
+        self.na_fila = 0
+        self.em_execucao = 0
+        self.concluidas = 0
+        self.recusadas = 0
+        self.reaproveitadas = 0
+
+    def submeter(self, usuario, funcao, *args, **kwargs):
+        """
+        Agenda uma exportação do usuário.
+        
+        Returns:
+            int: Número de exportações na fila à frente desta, ou None se o usuário
+                já atingiu o limite de exportações simultâneas
+        """
+        with self._lock:
+            if self._por_usuario.get(usuario, 0) >= self.max_por_usuario:
+                self.recusadas += 1
+                return None
+            
+            self._por_usuario[usuario] = self._por_usuario.get(usuario, 0) + 1
+            posicao = self.na_fila
+            self.na_fila += 1
+        
+        self._executor.submit(self._executar, usuario, funcao, args, kwargs)
+        return posicao
+
+    def _executar(self, usuario, funcao, args, kwargs):
+        with self._lock:
+            self.na_fila -= 1
+            self.em_execucao += 1
+        
+        try:
+            funcao(*args, **kwargs)
+        except Exception as e:
+            logger.error(f"Erro na exportação do usuário {usuario}: {e}")
+        finally:
+            with self._lock:
+                self.em_execucao -= 1
+                self.concluidas += 1
+                restantes = self._por_usuario.get(usuario, 1) - 1
+                if restantes > 0:
+                    self._por_usuario[usuario] = restantes
+                else:
+                    self._por_usuario.pop(usuario, None)
+
+    def gerar(self, usuario_id, filtros, nome_usuario, colunas, formato=FORMATO_PADRAO, progresso=None,
+              anterior=None):
+        """
+        Busca os gastos e gera o arquivo no formato pedido, em um processo separado se configurado.
+        `filtros` são repassados a Database.iter_gastos; `anterior` é o conteúdo de um arquivo
+        do mesmo formato ao qual os gastos são anexados.
+        
+        Returns:
+            list: Partes (arquivo, nome_arquivo, anos) na ordem de envio, como em
+                exportar_em_partes, ou None se não houver gastos
+        """
+        if not self.processos:
+            return gerar_arquivo(usuario_id, filtros, nome_usuario, colunas, formato, progresso, anterior)
+        
+        pool, gerenciador = self._obter_pool_processos()
+        # O processo informa as linhas processadas por esta fila
+        linhas = gerenciador.Queue() if progresso else None
+        
+        futuro = pool.submit(
+            _gerar_arquivo_em_processo, usuario_id, filtros, nome_usuario, colunas, formato,
+            anterior, linhas
+        )
+        
+        while linhas is not None and not futuro.done():
+            try:
+                progresso(linhas.get(timeout=0.5))
+            except queue.Empty:
+                pass
+        
+        resultado = futuro.result()
+        
+        if resultado is None:
+            return None
+        
+        return [(_abrir_parte(caminho), nome_arquivo, anos) for caminho, nome_arquivo, anos in resultado]
+
+    def _obter_pool_processos(self):
+        """Pool de processos e o gerenciador das filas de progresso, criados no primeiro uso"""
+        with self._lock:
+            if self._pool_processos is None:
+                # "spawn" evita herdar conexões e threads do processo do bot
+                contexto = multiprocessing.get_context("spawn")
+                self._pool_processos = ProcessPoolExecutor(max_workers=self.processos, mp_context=contexto)
+                self._gerenciador = contexto.Manager()
+            return self._pool_processos, self._gerenciador
+
+    def arquivo_enviado(self, usuario_id, filtros, formato, impressao):
+        """
+        Retorna os file_ids (um por parte, na ordem de envio) de uma exportação já enviada
+        com os mesmos filtros e formato, se os gastos não mudaram desde então
+        (mesma `impressao`), ou None
+        """
+        enviado = self._enviados.obter(self._chave_envio(usuario_id, filtros, formato), None)
+        
+        if enviado is None or enviado[0] != impressao:
+            return None
+        
+        with self._lock:
+            self.reaproveitadas += 1
+        
+        return enviado[1]
+
+    def registrar_envio(self, usuario_id, filtros, formato, impressao, file_ids):
+        """Guarda os file_ids das partes enviadas para os filtros, formato e impressão dados"""
+        self._enviados.definir(self._chave_envio(usuario_id, filtros, formato), (impressao, tuple(file_ids)))
+
+    def descartar_envio(self, usuario_id, filtros, formato):
+        """Esquece o arquivo enviado (ex.: o Telegram recusou o file_id)"""
+        self._enviados.invalidar(self._chave_envio(usuario_id, filtros, formato))
+
+    @staticmethod
+    def _chave_envio(usuario_id, filtros, formato):
+        return (usuario_id, formato, tuple(sorted(filtros.items())))
+
+    def estatisticas(self):
+        """Profundidade da fila e contadores das exportações"""
+        with self._lock:
+            return {
+                "na_fila": self.na_fila,
+                "em_execucao": self.em_execucao,
+                "concluidas": self.concluidas,
+                "recusadas": self.recusadas,
+                "reaproveitadas": self.reaproveitadas,
+                "usuarios_ativos": len(self._por_usuario),
+                "arquivos_enviados": self._enviados.estatisticas()
+            }
+
+    def encerrar(self):
+        """Aguarda as exportações em andamento e libera os pools"""
+        self._executor.shutdown(wait=True)
+        if self._pool_processos:
+            self._pool_processos.shutdown(wait=True)
+            self._gerenciador.shutdown()
+
+class ProgressoExportacao:
+    """
+    Edita a mensagem "Preparando exportação..." com o andamento, respeitando
+    um intervalo mínimo entre edições para não esbarrar nos limites do Telegram
+    """
+    def __init__(self, bot, chat_id, message_id, intervalo=2.0):
+        self.bot = bot
+        self.chat_id = chat_id
+        self.message_id = message_id
+        self.intervalo = intervalo
+        self._ultima = 0
+
+    def atualizar(self, texto, forcar=False, reply_markup=None):
+        agora = time.monotonic()
+        
+        if not forcar and agora - self._ultima < self.intervalo:
+            return
+        
+        self._ultima = agora
+        
+        try:
+            self.bot.edit_message_text(
+                text=texto,
+                chat_id=self.chat_id,
+                message_id=self.message_id,
+                reply_markup=reply_markup
+            )
+        except Exception as e:
+            # Ex.: "message is not modified"; o progresso não deve interromper a exportação
+            logger.debug(f"Não foi possível atualizar o progresso da exportação: {e}")
+
+def gerar_arquivo(usuario_id, filtros, nome_usuario, colunas, formato=FORMATO_PADRAO, progresso=None,
+                  anterior=None, banco=None):
+    """
+    Busca os gastos do usuário em páginas e gera o arquivo no formato pedido
+    (um dos códigos de FORMATOS_EXPORTACAO), dividido em partes se passar do
+    limite de upload do Telegram. `banco` é o Database a consultar (padrão: o global).
+    
+    Returns:
+        list: Partes (arquivo, nome_arquivo, anos) na ordem de envio, ou None se não houver gastos
+    
+    Raises:
+        RuntimeError: Se o arquivo não puder ser gerado
+    """
+    if banco is None:
+        from app.db.database import db as banco
+    
+    _, criar_escritor = FORMATOS_EXPORTACAO[formato]
+    
+    gastos = banco.iter_gastos(usuario_id=usuario_id, colunas=colunas, **filtros)
+    
+    # Lê o primeiro gasto para saber se há algo a exportar
+    primeiro = next(gastos, None)
+    
+    if primeiro is None:
+        return None
+    
+    partes = exportar_em_partes(chain([primeiro], gastos), criar_escritor, nome_usuario, progresso, anterior)
+    
+    if not partes:
+        raise RuntimeError(f"Erro ao gerar o arquivo {formato}")
+    
+    return partes
+
+# Banco do processo de exportação, criado na primeira exportação que ele recebe
+_banco_processo = None
+
+def _obter_banco_processo():
+    """
+    Banco usado pelos processos de exportação: só consulta gastos, então não tem
+    gravação em segundo plano (que leria e apagaria o arquivo de pendentes do bot)
+    """
+    global _banco_processo
+    
+    if _banco_processo is None:
+        from app.db.database import criar_database
+        _banco_processo = criar_database(gravacao_em_segundo_plano=False)
+    
+    return _banco_processo
+
+def _gerar_arquivo_em_processo(usuario_id, filtros, nome_usuario, colunas, formato, anterior=None,
+                               linhas=None):
+    """
+    Versão de `gerar_arquivo` executada no pool de processos. Cada parte é gravada
+    em um arquivo temporário, cujo caminho é devolvido no lugar do conteúdo; as
+    linhas processadas são enviadas pela fila `linhas`, se informada.
+    
+    Returns:
+        list: Partes (caminho, nome_arquivo, anos), ou None se não houver gastos
+    """
+    progresso = linhas.put if linhas is not None else None
+    partes = gerar_arquivo(usuario_id, filtros, nome_usuario, colunas, formato, progresso, anterior,
+                           banco=_obter_banco_processo())
+    
+    if partes is None:
+        return None
+    
+    caminhos = []
+    
+    try:
+        for arquivo, nome_arquivo, anos in partes:
+            with tempfile.NamedTemporaryFile(prefix='exportacao_', delete=False) as destino:
+                caminhos.append((destino.name, nome_arquivo, anos))
+                shutil.copyfileobj(arquivo, destino)
+        return caminhos
+    except Exception:
+        for caminho, _, _ in caminhos:
+            _remover(caminho)
+        raise
+    finally:
+        for arquivo, _, _ in partes:
+            arquivo.close()
+
+def _abrir_parte(caminho):
+    """Abre a parte gerada por outro processo; o arquivo some do disco assim que é fechado"""
+    arquivo = open(caminho, 'rb')
+    _remover(caminho)
+    return arquivo
+
+def _remover(caminho):
+    try:
+        os.remove(caminho)
+    except OSError as e:
+        logger.warning(f"Não foi possível remover o arquivo temporário {caminho}: {e}")
+
+# Instância global da fila de exportação
+fila_exportacao = FilaExportacao()
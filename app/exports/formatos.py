@@ -0,0 +1,19 @@
+from functools import partial
+from app.exports.excel_exporter import EscritorExcel
+from app.exports.csv_exporter import EscritorCSV
+from app.exports.parquet_exporter import EscritorParquet, PARQUET_DISPONIVEL
+
+# Formatos de exportação: código -> (rótulo do botão, fábrica de escritores)
+# Os escritores são usados por exportar_em_partes (app.exports.partes), que divide
+# o arquivo em partes quando ele passaria do limite de upload do Telegram
+FORMATOS_EXPORTACAO = {
+    'xlsx': ("📊 Excel (.xlsx)", EscritorExcel),
+    'xlsxanalise': ("📈 Excel com análises (.xlsx)", partial(EscritorExcel, analises=True)),
+    'csv': ("📄 CSV (.csv)", EscritorCSV),
+    'csvgz': ("🗜️ CSV compactado (.csv.gz)", partial(EscritorCSV, compactar=True))
+}
+
+if PARQUET_DISPONIVEL:
+    FORMATOS_EXPORTACAO['parquet'] = ("🧱 Parquet (.parquet)", EscritorParquet)
+
+FORMATO_PADRAO = 'xlsx'
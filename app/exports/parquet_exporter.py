@@ -0,0 +1,127 @@
+from app.exports.conversao import converter_campo
+from config import EXPORT_SPOOL_MAX_BYTES
+from datetime import date, datetime, timezone
+import io
+import tempfile
+import logging
+
+# O pyarrow é opcional: sem ele, a opção Parquet não é oferecida
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pc = pq = None
+
+logger = logging.getLogger(__name__)
+
+PARQUET_DISPONIVEL = pq is not None
+
+# Linhas por row group; cada grupo é gravado assim que fica completo
+TAMANHO_GRUPO_PARQUET = 10000
+
+# Estimativa de bytes por linha antes do primeiro row group (depois, usa a média real)
+BYTES_POR_LINHA_INICIAL = 64
+
+# Campo do gasto lido para cada coluna do esquema, na mesma ordem
+# (o valor é gravado em centavos inteiros, exato, como no banco)
+CAMPOS_PARQUET = ('valor_centavos', 'forma_pagamento', 'parcelas', 'categoria', 'local', 'data', 'criado_em')
+
+def _esquema():
+    return pa.schema([
+        ('valor_centavos', pa.int64()),
+        ('forma_pagamento', pa.string()),
+        ('parcelas', pa.int32()),
+        ('categoria', pa.string()),
+        ('local', pa.string()),
+        ('data', pa.date32()),
+        ('criado_em', pa.timestamp('us', tz='UTC'))
+    ])
+
+def _data(valor):
+    return valor if isinstance(valor, date) else date.fromisoformat(str(valor)[:10])
+
+def _instante(valor):
+    if not isinstance(valor, datetime):
+        valor = datetime.fromisoformat(str(valor))
+    # O SQLite grava CURRENT_TIMESTAMP sem fuso, em UTC
+    return valor if valor.tzinfo else valor.replace(tzinfo=timezone.utc)
+
+def _migrar_valor(tabela):
+    """Converte a coluna 'valor' (float64, em reais) de arquivos exportados antes em 'valor_centavos'"""
+    if 'valor' not in tabela.column_names:
+        return tabela
+    
+    indice = tabela.column_names.index('valor')
+    centavos = pc.round(pc.multiply(tabela.column(indice), 100)).cast(pa.int64())
+    return tabela.set_column(indice, 'valor_centavos', centavos)
+
+# Conversão dos campos para o tipo da coluna Parquet
+CONVERSORES_PARQUET = {
+    'valor_centavos': int,
+    'parcelas': int,
+    'data': _data,
+    'criado_em': _instante
+}
+
+class EscritorParquet:
+    """
+    Gera um arquivo Parquet (compressão zstd), gravando um row group
+    a cada TAMANHO_GRUPO_PARQUET gastos
+    """
+    extensao = 'parquet'
+
+    def __init__(self):
+        if not PARQUET_DISPONIVEL:
+            raise RuntimeError("Exportação para Parquet indisponível: instale o pacote pyarrow")
+        
+        self.esquema = _esquema()
+        self.linhas = 0
+        self.arquivo = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_MAX_BYTES)
+        self._colunas = [[] for _ in self.esquema.names]
+        self._gravadas = 0
+        self._escritor = pq.ParquetWriter(self.arquivo, self.esquema, compression='zstd')
+
+    def anexar(self, conteudo):
+        """Copia as linhas de um arquivo Parquet exportado antes"""
+        tabela = _migrar_valor(pq.read_table(io.BytesIO(conteudo))).cast(self.esquema)
+        self._escritor.write_table(tabela)
+        self._gravadas += tabela.num_rows
+
+    def adicionar(self, gasto):
+        """Converte um gasto (RegistroGasto ou dicionário) e o acumula no row group atual"""
+        for coluna, campo in zip(self._colunas, CAMPOS_PARQUET):
+            coluna.append(converter_campo(campo, gasto.get(campo), CONVERSORES_PARQUET))
+        self.linhas += 1
+        
+        if len(self._colunas[0]) >= TAMANHO_GRUPO_PARQUET:
+            self._gravar_grupo()
+
+    def tamanho_estimado(self):
+        """Bytes já gravados mais as linhas pendentes, pela média de bytes por linha"""
+        gravado = self.arquivo.tell()
+        por_linha = gravado / self._gravadas if self._gravadas else BYTES_POR_LINHA_INICIAL
+        return int(gravado + len(self._colunas[0]) * por_linha)
+
+    def finalizar(self):
+        """Conclui o arquivo e o retorna posicionado no início; quem chamou deve fechá-lo"""
+        if self._colunas[0]:
+            self._gravar_grupo()
+        
+        self._escritor.close()
+        
+        arquivo, self.arquivo = self.arquivo, None
+        arquivo.seek(0)
+        return arquivo
+
+    def fechar(self):
+        """Descarta o arquivo, se ainda não foi entregue por `finalizar`"""
+        if self.arquivo is not None:
+            self.arquivo.close()
+            self.arquivo = None
+
+    def _gravar_grupo(self):
+        self._escritor.write_batch(pa.record_batch(self._colunas, schema=self.esquema))
+        self._gravadas += len(self._colunas[0])
+        for coluna in self._colunas:
+            coluna.clear()
@@ -0,0 +1,118 @@
+from config import EXPORT_MAX_UPLOAD_BYTES
+from datetime import datetime
+import logging
+
+logger = logging.getLogger(__name__)
+
+# A cada quantas linhas o progresso da exportação é informado
+INTERVALO_PROGRESSO = 1000
+
+# A cada quantas linhas o tamanho estimado da parte atual é conferido
+INTERVALO_TAMANHO = 500
+
+# Passada esta fração do limite, a próxima virada de ano abre uma nova parte,
+# para que cada ano fique inteiro em um só arquivo sempre que possível
+FRACAO_VIRADA_ANO = 0.5
+
+# Passada esta fração do limite, a parte é fechada mesmo no meio de um ano
+# (a margem cobre o erro da estimativa e o que ainda está em buffer)
+FRACAO_MAXIMA = 0.9
+
+def nome_arquivo_exportacao(nome_usuario, extensao, sufixo=''):
+    """Nome do arquivo exportado: gastos_<usuário>_<data e hora><sufixo>.<extensão>"""
+    data_atual = datetime.now().strftime('%Y%m%d_%H%M%S')
+    return f"gastos_{nome_usuario.replace(' ', '_')}_{data_atual}{sufixo}.{extensao}"
+
+def exportar_em_partes(gastos, criar_escritor, nome_usuario, progresso=None, anterior=None,
+                       limite=EXPORT_MAX_UPLOAD_BYTES):
+    """
+    Exporta os gastos com os escritores criados por `criar_escritor`, dividindo o
+    resultado em partes que caibam no limite de upload do Telegram.
+    
+    O tamanho de cada parte é estimado durante a escrita. Como os gastos chegam
+    ordenados por data decrescente, uma nova parte é aberta na virada de ano assim
+    que a parte atual passa de FRACAO_VIRADA_ANO do limite, ou imediatamente ao
+    passar de FRACAO_MAXIMA.
+    
+    Args:
+        gastos: Iterável de gastos, ordenado por data decrescente
+        criar_escritor: Função sem argumentos que cria um escritor (EscritorExcel,
+            EscritorCSV, EscritorParquet)
+        nome_usuario: Nome do usuário para incluir no nome dos arquivos
+        progresso: Função opcional chamada com o número de linhas já processadas
+        anterior: Conteúdo de um arquivo do mesmo formato, anexado no início da primeira parte
+        limite: Tamanho máximo de cada parte em bytes (None = sem divisão)
+    
+    Returns:
+        list: Tuplas (arquivo, nome_arquivo, anos) na ordem de envio, onde `arquivo` é um
+            arquivo binário temporário posicionado no início, que deve ser fechado por quem
+            chamou, e `anos` é o (primeiro, último) ano dos gastos da parte, ou None se a parte
+            começa com o arquivo anterior; lista vazia se não houver gastos; None em caso de erro
+    """
+    partes = []
+    escritor = None
+    anos = None
+    ano_atual = None
+    linhas = 0
+    
+    try:
+        for gasto in gastos:
+            ano = str(gasto.get('data'))[:4]
+            
+            if escritor is not None and limite:
+                tamanho = None
+                
+                if ano != ano_atual or escritor.linhas % INTERVALO_TAMANHO == 0:
+                    tamanho = escritor.tamanho_estimado()
+                
+                virada = ano != ano_atual and tamanho >= limite * FRACAO_VIRADA_ANO
+                cheia = tamanho is not None and tamanho >= limite * FRACAO_MAXIMA
+                
+                if virada or cheia:
+                    partes.append((escritor.finalizar(), escritor.extensao, anos))
+                    escritor.fechar()
+                    escritor = None
+            
+            if escritor is None:
+                escritor = criar_escritor()
+                anos = [ano, ano]
+                
+                if anterior and not partes:
+                    escritor.anexar(anterior)
+                    anos = None
+            
+            escritor.adicionar(gasto)
+            ano_atual = ano
+            if anos:
+                anos[1] = ano
+            linhas += 1
+            
+            if progresso and linhas % INTERVALO_PROGRESSO == 0:
+                progresso(linhas)
+        
+        if escritor is not None:
+            partes.append((escritor.finalizar(), escritor.extensao, anos))
+            escritor.fechar()
+            escritor = None
+    
+    except Exception as e:
+        logger.error(f"Erro ao exportar gastos: {e}")
+        
+        for arquivo, _, _ in partes:
+            arquivo.close()
+        if escritor is not None:
+            escritor.fechar()
+        
+        return None
+    
+    resultado = []
+    
+    for i, (arquivo, extensao, anos_parte) in enumerate(partes, start=1):
+        sufixo = f"_parte{i}de{len(partes)}" if len(partes) > 1 else ''
+        nome_arquivo = nome_arquivo_exportacao(nome_usuario, extensao, sufixo)
+        resultado.append((arquivo, nome_arquivo, tuple(anos_parte) if anos_parte else None))
+    
+    if len(resultado) > 1:
+        logger.info(f"Exportação de {linhas} gastos dividida em {len(resultado)} partes")
+    
+    return resultado
@@ -1,17 +1,20 @@
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import CallbackContext, ConversationHandler
 from app.db.database import db
-from app.exports.excel_exporter import exportar_gastos_para_excel
+from app.exports.fila_exportacao import fila_exportacao, ProgressoExportacao
+from app.exports.formatos import FORMATOS_EXPORTACAO
 from app.utils.formatters import obter_nome_mes
 from config import CATEGORIAS
 import logging
 from datetime import datetime
-import os
 
 logger = logging.getLogger(__name__)
 
 # Estados da conversa
-ESCOLHER_ANO, ESCOLHER_MES, ESCOLHER_CATEGORIA = range(3)
+ESCOLHER_ANO, ESCOLHER_MES, ESCOLHER_CATEGORIA, ESCOLHER_FORMATO = range(4)
+
+# Colunas exportadas para a planilha
+COLUNAS_EXPORTACAO = ('valor_centavos', 'forma_pagamento', 'parcelas', 'categoria', 'local', 'data', 'criado_em')
 
 def exportar_command(update: Update, context: CallbackContext):
     """
@@ -28,7 +31,7 @@ def exportar_callback(update: Update, context: CallbackContext):
     
     # Edita a mensagem original para iniciar a exportação
     query.edit_message_text(
-        "Vamos exportar seus gastos para uma planilha Excel! 📊\n\n"
+        "Vamos exportar seus gastos! 📊\n\n"
         "Primeiro, vamos definir o período."
     )
     
@@ -41,7 +44,7 @@ def iniciar_exportacao(update: Update, context: CallbackContext):
     """
     # Mensagem inicial
     update.message.reply_text(
-        "Vamos exportar seus gastos para uma planilha Excel! 📊\n\n"
+        "Vamos exportar seus gastos! 📊\n\n"
         "Primeiro, vamos definir o período."
     )
     
@@ -66,6 +69,9 @@ def perguntar_ano(message, context: CallbackContext):
     # Opção para todos os anos
     keyboard.append([InlineKeyboardButton("Todos os anos", callback_data="exp_ano_todos")])
     
+    # Exportação incremental
+    keyboard.append([InlineKeyboardButton("🆕 Novos desde a última exportação", callback_data="exp_ano_novos")])
+    
     reply_markup = InlineKeyboardMarkup(keyboard)
     
     message.reply_text(
@@ -88,13 +94,14 @@ def ano_handler(update: Update, context: CallbackContext):
         # Usuário escolheu todos os anos
         context.user_data['exp_ano'] = None
         
-        # Exportar todos os gastos
-        query.edit_message_text(
-            "Preparando exportação de todos os gastos...\n"
-            "Isso pode levar alguns segundos."
-        )
+        # Exportar todos os gastos; falta apenas o formato
+        return perguntar_formato(update, context)
+    elif ano_str == "novos":
+        # Apenas os gastos registrados depois da última exportação completa
+        context.user_data['exp_ano'] = None
+        context.user_data['exp_novos'] = True
         
-        return exportar_gastos(update, context)
+        return perguntar_formato(update, context)
     else:
         # Ano específico
         context.user_data['exp_ano'] = int(ano_str)
@@ -190,7 +197,7 @@ def categoria_handler(update: Update, context: CallbackContext):
 
 def categoria_callback(update: Update, context: CallbackContext):
     """
-    Recebe a categoria escolhida e exporta os gastos
+    Recebe a categoria escolhida e pergunta o formato do arquivo
     """
     query = update.callback_query
     query.answer()
@@ -204,6 +211,67 @@ def categoria_callback(update: Update, context: CallbackContext):
         # Categoria específica
         context.user_data['exp_categoria'] = categoria_str
     
+    # Pergunta o formato
+    return perguntar_formato(update, context)
+
+def perguntar_formato(update: Update, context: CallbackContext):
+    """
+    Pergunta o formato do arquivo exportado
+    """
+    query = update.callback_query
+    
+    # Um botão por formato disponível
+    keyboard = []
+    
+    for formato, (rotulo, _) in FORMATOS_EXPORTACAO.items():
+        keyboard.append([InlineKeyboardButton(rotulo, callback_data=f"exp_fmt_{formato}")])
+    
+    texto = (
+        "Em qual formato você quer o arquivo?\n\n"
+        "CSV e Parquet são bem menores e mais rápidos de gerar, ideais para scripts e planilhas grandes."
+    )
+    
+    if context.user_data.get('exp_novos'):
+        usuario_id = db.registrar_usuario(update.effective_user.id, update.effective_user.first_name)
+        cursor = db.obter_cursor_exportacao(usuario_id) if usuario_id else None
+        
+        if not cursor:
+            texto += "\n\nComo é sua primeira exportação incremental, o arquivo terá todos os seus gastos."
+        elif cursor.get('file_id') and cursor.get('formato') in FORMATOS_EXPORTACAO:
+            # Permite anexar os gastos novos ao último arquivo completo enviado
+            formato_anterior = cursor['formato']
+            context.user_data['exp_formato_anterior'] = formato_anterior
+            rotulo = FORMATOS_EXPORTACAO[formato_anterior][0]
+            keyboard.insert(0, [InlineKeyboardButton(
+                f"➕ Anexar ao último arquivo ({rotulo})", callback_data="exp_fmt_anexar"
+            )])
+    
+    reply_markup = InlineKeyboardMarkup(keyboard)
+    
+    query.edit_message_text(texto, reply_markup=reply_markup)
+    
+    return ESCOLHER_FORMATO
+
+def formato_callback(update: Update, context: CallbackContext):
+    """
+    Recebe o formato escolhido e exporta os gastos
+    """
+    query = update.callback_query
+    query.answer()
+    
+    formato = query.data.replace("exp_fmt_", "")
+    
+    if formato == "anexar" and context.user_data.get('exp_formato_anterior'):
+        # Mesmo formato do arquivo ao qual os gastos serão anexados
+        formato = context.user_data['exp_formato_anterior']
+        context.user_data['exp_anexar'] = True
+    
+    if formato not in FORMATOS_EXPORTACAO:
+        # Botão antigo de um formato que não está mais disponível
+        return perguntar_formato(update, context)
+    
+    context.user_data['exp_formato'] = formato
+    
     # Mensagem de preparação
     query.edit_message_text(
         "Preparando exportação...\n"
@@ -215,7 +283,8 @@ def categoria_callback(update: Update, context: CallbackContext):
 
 def exportar_gastos(update: Update, context: CallbackContext):
     """
-    Exporta os gastos para um arquivo Excel
+    Agenda a exportação dos gastos no formato escolhido no pool de exportação.
+    A mensagem "Preparando exportação..." é atualizada com o andamento.
     """
     query = update.callback_query
     
@@ -230,54 +299,66 @@ def exportar_gastos(update: Update, context: CallbackContext):
         return ConversationHandler.END
     
     # Obter filtros
-    filtros = context.user_data
-    ano = filtros.get('exp_ano')
-    mes = filtros.get('exp_mes')
-    categoria = filtros.get('exp_categoria')
-    
-    # Buscar gastos
-    gastos = db.obter_gastos(
-        usuario_id=usuario_id,
-        ano=ano,
-        mes=mes,
-        categoria=categoria
+    filtros = {
+        'ano': context.user_data.get('exp_ano'),
+        'mes': context.user_data.get('exp_mes'),
+        'categoria': context.user_data.get('exp_categoria')
+    }
+    formato = context.user_data.get('exp_formato', 'xlsx')
+    novos = context.user_data.get('exp_novos', False)
+    anexar = context.user_data.get('exp_anexar', False)
+    
+    # Limpa os dados da consulta
+    context.user_data.clear()
+    
+    progresso = ProgressoExportacao(context.bot, query.message.chat_id, query.message.message_id)
+    
+    posicao = fila_exportacao.submeter(
+        usuario_id, executar_exportacao, progresso, usuario_id, nome_usuario, filtros, formato,
+        novos=novos, anexar=anexar
     )
     
-    if not gastos:
-        # Sem gastos para exportar
+    if posicao is None:
         keyboard = [[InlineKeyboardButton("🔙 Voltar ao Menu", callback_data="start")]]
         reply_markup = InlineKeyboardMarkup(keyboard)
         
         query.edit_message_text(
-            "Não há gastos para exportar no período selecionado.",
+            "Você já tem uma exportação em andamento.\n"
+            "Aguarde ela terminar para pedir outra.",
             reply_markup=reply_markup
         )
-        
-        # Limpa os dados da consulta
-        context.user_data.clear()
-        
-        return ConversationHandler.END
-    
-    # Exportar para Excel
-    arquivo_excel = exportar_gastos_para_excel(gastos, nome_usuario)
-    
-    if not arquivo_excel or not os.path.exists(arquivo_excel):
-        # Falha na exportação
-        keyboard = [[InlineKeyboardButton("🔙 Voltar ao Menu", callback_data="start")]]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        
+    elif posicao > 0:
         query.edit_message_text(
-            "Houve um erro ao exportar os gastos. Por favor, tente novamente.",
-            reply_markup=reply_markup
+            f"Preparando exportação...\n"
+            f"⏳ Na fila: {posicao} exportação(ões) à frente."
         )
-        
-        # Limpa os dados da consulta
-        context.user_data.clear()
-        
-        return ConversationHandler.END
+    
+    return ConversationHandler.END
+
+def executar_exportacao(progresso, usuario_id, nome_usuario, filtros, formato, novos=False, anexar=False):
+    """
+    Gera e envia o arquivo (executado no pool de exportação).
+    Se uma exportação idêntica já foi enviada e os gastos não mudaram, reenvia
+    o mesmo arquivo pelo file_id do Telegram, sem gerá-lo de novo.
+    
+    Args:
+        novos: Exporta apenas os gastos registrados depois do cursor de exportação do usuário
+        anexar: Com `novos`, anexa os gastos ao último arquivo completo enviado
+    """
+    bot = progresso.bot
+    chat_id = progresso.chat_id
+    
+    keyboard = [[InlineKeyboardButton("🔙 Voltar ao Menu", callback_data="start")]]
+    voltar_markup = InlineKeyboardMarkup(keyboard)
+    
+    ano = filtros.get('ano')
+    mes = filtros.get('mes')
+    categoria = filtros.get('categoria')
     
     # Preparar texto do período para exibição
-    if ano and mes:
+    if novos:
+        periodo = "Novos gastos desde a última exportação"
+    elif ano and mes:
         periodo = f"{obter_nome_mes(mes)} de {ano}"
     elif ano:
         periodo = f"Ano de {ano}"
@@ -288,49 +369,196 @@ def exportar_gastos(update: Update, context: CallbackContext):
     if categoria:
         periodo += f" - Categoria: {categoria}"
     
-    # Enviar o arquivo
-    try:
-        with open(arquivo_excel, 'rb') as arquivo:
-            query.message.reply_document(
-                document=arquivo,
-                filename=os.path.basename(arquivo_excel),
-                caption=f"📊 Gastos exportados - {periodo}"
+    legenda = f"📊 Gastos exportados - {periodo}"
+    
+    keyboard = [
+        [InlineKeyboardButton("📊 Nova exportação", callback_data="exportar_excel")],
+        [InlineKeyboardButton("🔙 Voltar ao Menu", callback_data="start")]
+    ]
+    concluido_markup = InlineKeyboardMarkup(keyboard)
+    concluido_texto = (
+        f"✅ Exportação concluída para o período: {periodo}\n\n"
+        "O arquivo foi enviado como um documento."
+    )
+    
+    # Quantidade e último gasto registrado: se não mudaram, o arquivo seria o mesmo
+    impressao = db.impressao_gastos(usuario_id, **filtros)
+    
+    if impressao and impressao[0] == 0:
+        # Sem gastos para exportar
+        progresso.atualizar(
+            "Não há gastos para exportar no período selecionado.",
+            forcar=True,
+            reply_markup=voltar_markup
+        )
+        return
+    
+    consulta = dict(filtros)
+    
+    # Exportações sem filtro avançam o cursor da exportação incremental. O arquivo vai
+    # só até o último gasto registrado agora, para não pular os que chegarem durante a geração.
+    ultimo = impressao[1:] if impressao and not any(filtros.values()) else None
+    
+    if ultimo:
+        consulta['ate'] = ultimo
+    
+    cursor = db.obter_cursor_exportacao(usuario_id) if novos else None
+    anterior = None
+    
+    if cursor:
+        desde = (cursor['criado_em'], cursor['gasto_id'])
+        
+        if ultimo == desde:
+            progresso.atualizar(
+                "Nenhum gasto novo desde a última exportação. 👍",
+                forcar=True,
+                reply_markup=voltar_markup
             )
+            return
         
-        # Atualiza a mensagem original
-        keyboard = [
-            [InlineKeyboardButton("📊 Nova exportação", callback_data="exportar_excel")],
-            [InlineKeyboardButton("🔙 Voltar ao Menu", callback_data="start")]
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
+        consulta['desde'] = desde
         
-        query.edit_message_text(
-            f"✅ Exportação concluída para o período: {periodo}\n\n"
-            "A planilha foi enviada como um documento.",
-            reply_markup=reply_markup
+        if anexar and cursor.get('file_id'):
+            progresso.atualizar("Preparando exportação...\n📥 Baixando o arquivo anterior.", forcar=True)
+            
+            try:
+                anterior = bytes(bot.get_file(cursor['file_id']).download_as_bytearray())
+            except Exception as e:
+                logger.error(f"Erro ao baixar o arquivo anterior: {e}")
+                
+                progresso.atualizar(
+                    "Não foi possível obter o arquivo anterior. "
+                    "Tente exportar só os gastos novos, sem anexar.",
+                    forcar=True,
+                    reply_markup=voltar_markup
+                )
+                return
+    
+    # O arquivo tem todos os gastos até `ultimo`, a menos que sejam só os novos sem anexar
+    arquivo_completo = 'desde' not in consulta or anterior is not None
+    chave_envio = dict(consulta, anexar=anterior is not None)
+    
+    file_ids = impressao and fila_exportacao.arquivo_enviado(usuario_id, chave_envio, formato, impressao)
+    
+    if file_ids:
+        try:
+            for i, file_id in enumerate(file_ids, start=1):
+                bot.send_document(chat_id=chat_id, document=file_id,
+                                  caption=legenda_parte(legenda, i, len(file_ids)))
+            
+            salvar_cursor(usuario_id, ultimo, base_anexo(file_ids, arquivo_completo), formato)
+            progresso.atualizar(concluido_texto, forcar=True, reply_markup=concluido_markup)
+            return
+        except Exception as e:
+            # O file_id pode ter deixado de ser válido; gera o arquivo novamente
+            logger.warning(f"Não foi possível reenviar a exportação anterior: {e}")
+            fila_exportacao.descartar_envio(usuario_id, chave_envio, formato)
+    
+    progresso.atualizar("Preparando exportação...\n🔎 Buscando seus gastos.", forcar=True)
+
+    def linhas_processadas(linhas):
+        progresso.atualizar(f"Preparando exportação...\n📊 {linhas} gastos processados.")
+    
+    try:
+        partes = fila_exportacao.gerar(
+            usuario_id, consulta, nome_usuario, COLUNAS_EXPORTACAO, formato,
+            progresso=linhas_processadas, anterior=anterior
         )
+    except Exception as e:
+        logger.error(f"Erro ao exportar gastos: {e}")
         
-        # Remover o arquivo após enviar
-        try:
-            os.remove(arquivo_excel)
-        except:
-            pass
+        # Falha na exportação
+        progresso.atualizar(
+            "Houve um erro ao exportar os gastos. Por favor, tente novamente.",
+            forcar=True,
+            reply_markup=voltar_markup
+        )
+        return
+    
+    if partes is None:
+        # Sem gastos para exportar
+        progresso.atualizar(
+            "Nenhum gasto novo desde a última exportação. 👍" if novos
+            else "Não há gastos para exportar no período selecionado.",
+            forcar=True,
+            reply_markup=voltar_markup
+        )
+        return
+    
+    # Enviar os arquivos, na ordem das partes
+    try:
+        file_ids = []
         
-    except Exception as e:
-        logger.error(f"Erro ao enviar arquivo Excel: {e}")
+        for i, (arquivo, nome_arquivo, anos) in enumerate(partes, start=1):
+            if len(partes) > 1:
+                progresso.atualizar(f"Preparando exportação...\n📤 Enviando parte {i} de {len(partes)}.", forcar=True)
+            else:
+                progresso.atualizar("Preparando exportação...\n📤 Enviando o arquivo.", forcar=True)
+            
+            mensagem = bot.send_document(
+                chat_id=chat_id,
+                document=arquivo,
+                filename=nome_arquivo,
+                caption=legenda_parte(legenda, i, len(partes), anos)
+            )
+            file_ids.append(mensagem.document.file_id if mensagem.document else None)
         
-        keyboard = [[InlineKeyboardButton("🔙 Voltar ao Menu", callback_data="start")]]
-        reply_markup = InlineKeyboardMarkup(keyboard)
+        # Guarda os file_ids para reaproveitar em uma exportação idêntica
+        if impressao and all(file_ids):
+            fila_exportacao.registrar_envio(usuario_id, chave_envio, formato, impressao, file_ids)
         
-        query.edit_message_text(
+        salvar_cursor(usuario_id, ultimo, base_anexo(file_ids, arquivo_completo), formato)
+        
+        # Atualiza a mensagem original
+        progresso.atualizar(concluido_texto, forcar=True, reply_markup=concluido_markup)
+    
+    except Exception as e:
+        logger.error(f"Erro ao enviar arquivo exportado: {e}")
+        
+        progresso.atualizar(
             "Houve um erro ao enviar o arquivo. Por favor, tente novamente.",
-            reply_markup=reply_markup
+            forcar=True,
+            reply_markup=voltar_markup
         )
     
-    # Limpa os dados da consulta
-    context.user_data.clear()
+    finally:
+        for arquivo, _, _ in partes:
+            arquivo.close()
+
+def legenda_parte(legenda, parte, total, anos=None):
+    """Legenda do documento; exportações divididas indicam a parte e os anos que ela cobre"""
+    if total == 1:
+        return legenda
     
-    return ConversationHandler.END
+    legenda = f"{legenda} (parte {parte} de {total})"
+    
+    if anos:
+        # Os gastos vêm do mais recente para o mais antigo
+        recente, antigo = anos
+        legenda += f" - {antigo}" if antigo == recente else f" - {antigo} a {recente}"
+    
+    return legenda
+
+def base_anexo(file_ids, arquivo_completo):
+    """
+    file_id ao qual a próxima exportação incremental pode anexar os gastos novos:
+    só um arquivo único com todos os gastos serve de base
+    """
+    if arquivo_completo and len(file_ids) == 1:
+        return file_ids[0]
+    
+    return None
+
+def salvar_cursor(usuario_id, ultimo, file_id, formato):
+    """
+    Avança o cursor da exportação incremental até `ultimo` (criado_em, id), se a
+    exportação enviada cobriu todos os gastos; `file_id` é o arquivo completo enviado, se houver
+    """
+    if not ultimo:
+        return
+    
+    criado_em, gasto_id = ultimo
+    db.salvar_cursor_exportacao(usuario_id, criado_em, gasto_id, file_id, formato if file_id else None)
 
 # Definir o conversation handler para exportação de gastos
 exportar_conv_handler = ConversationHandler(
@@ -348,6 +576,9 @@ exportar_conv_handler = ConversationHandler(
         ESCOLHER_CATEGORIA: [
             # Handler para a categoria escolhida
         ],
+        ESCOLHER_FORMATO: [
+            # Handler para o formato escolhido
+        ],
     },
     fallbacks=[
         # Comandos para cancelar
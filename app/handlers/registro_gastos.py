@@ -1,6 +1,8 @@
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, ReplyKeyboardMarkup, ReplyKeyboardRemove
 from telegram.ext import CallbackContext, ConversationHandler
 from app.db.database import db
+from app.utils.dinheiro import centavos_de_texto
+from app.utils.formatters import formatar_valor, formatar_data
 from config import CATEGORIAS, FORMAS_PAGAMENTO
 import logging
 from datetime import datetime
@@ -75,17 +77,21 @@ def valor_handler(update: Update, context: CallbackContext):
     
     # Verifica se é um valor válido
     try:
-        valor = user_input.replace(',', '.')
-        valor = float(valor)
+        # Valor em centavos, lido direto do texto (sem passar por float)
+        valor_centavos = centavos_de_texto(user_input)
         
-        if valor <= 0:
+        if valor_centavos is None:
+            raise ValueError(f"Valor inválido: {user_input}")
+        
+        # Zero e valores negativos ("-5") chegam aqui, com mensagem própria
+        if valor_centavos <= 0:
             update.message.reply_text(
                 "O valor deve ser maior que zero. Por favor, digite novamente:"
             )
             return VALOR
-            
+        
         # Salva na conversa
-        context.user_data['valor'] = valor
+        context.user_data['valor_centavos'] = valor_centavos
         
         # Pede a data
         today = datetime.now().strftime('%d/%m/%Y')
@@ -103,7 +109,7 @@ def valor_handler(update: Update, context: CallbackContext):
         )
         
         return DATA
-        
+    
     except ValueError:
         update.message.reply_text(
             "Valor inválido! Por favor, digite apenas números.\n"
@@ -160,7 +166,7 @@ def data_handler(update: Update, context: CallbackContext):
         )
         
         return FORMA_PAGAMENTO
-        
+    
     except ValueError:
         message.reply_text(
             "Formato de data inválido! Por favor, use o formato DD/MM/AAAA.\n"
@@ -299,7 +305,7 @@ def local_handler(update: Update, context: CallbackContext):
     
     resumo = (
         "*📝 RESUMO DO GASTO*\n\n"
-        f"*Valor:* R$ {dados['valor']:.2f}\n"
+        f"*Valor:* {formatar_valor(dados['valor_centavos'])}\n"
         f"*Data:* {dados['data_display']}\n"
         f"*Forma de pagamento:* {dados['forma_pagamento']}{info_parcelas}\n"
         f"*Categoria:* {dados['categoria']}\n"
@@ -355,12 +361,13 @@ def confirmar_handler(update: Update, context: CallbackContext):
     # Registra o gasto
     resultado = db.registrar_gasto(
         usuario_id=usuario_id,
-        valor=dados['valor'],
+        valor_centavos=dados['valor_centavos'],
         forma_pagamento=dados['forma_pagamento'],
         parcelas=dados.get('parcelas'),
         categoria=dados['categoria'],
         local=dados['local'],
-        data=dados['data']
+        data=dados['data'],
+        ao_falhar=notificar_falha_gravacao(context, query.message.chat_id)
     )
     
     if resultado:
@@ -380,6 +387,23 @@ def confirmar_handler(update: Update, context: CallbackContext):
     
     return ConversationHandler.END
 
+def notificar_falha_gravacao(context: CallbackContext, chat_id):
+    """
+    Cria o callback que avisa o usuário quando um gasto confirmado não pôde ser
+    gravado (usado quando a gravação ocorre em segundo plano)
+    """
+    def ao_falhar(gasto, erro):
+        context.bot.send_message(
+            chat_id=chat_id,
+            text=(
+                "❌ Não foi possível salvar o gasto de "
+                f"{formatar_valor(gasto['valor_centavos'])} em {gasto['local']} ({formatar_data(gasto['data'])}).\n\n"
+                "Por favor, use /registrar para registrá-lo novamente."
+            )
+        )
+    
+    return ao_falhar
+
 def cancel_handler(update: Update, context: CallbackContext):
     """
     Cancela o registro em andamento
@@ -1,8 +1,15 @@
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import CallbackContext, ConversationHandler
-from app.db.database import db
-from app.utils.formatters import formatar_lista_gastos, obter_nome_mes, resumo_gastos_por_categoria
-from config import FORMAS_PAGAMENTO, CATEGORIAS
+from app.db.database import db, CacheLRU
+from app.utils.formatters import (
+    formatar_item_gasto, formatar_pagina_gastos, paginar_gastos, obter_nome_mes, formatar_resumo,
+    LIMITE_MENSAGEM
+)
+from app.utils.resumo import calcular_resumo
+from config import (
+    FORMAS_PAGAMENTO, CATEGORIAS,
+    LISTA_GASTOS_PAGE_SIZE, LISTA_GASTOS_CACHE_SIZE, LISTA_GASTOS_CACHE_TTL
+)
 import logging
 from datetime import datetime
 
@@ -11,6 +18,13 @@ logger = logging.getLogger(__name__)
 # Estados da conversa
 ESCOLHER_ANO, ESCOLHER_MES, ESCOLHER_FORMA_PAGAMENTO, ESCOLHER_CATEGORIA = range(4)
 
+# Colunas usadas pelos formatadores da lista de gastos
+COLUNAS_EXIBICAO = ('valor_centavos', 'data', 'categoria', 'local', 'forma_pagamento', 'parcelas')
+
+# Listas já exibidas, por mensagem: (chat_id, message_id) -> (usuário do Telegram, período,
+# gastos formatados, total, páginas). As trocas de página usam este resultado, sem consultar o banco.
+listas_gastos = CacheLRU(LISTA_GASTOS_CACHE_SIZE, ttl=LISTA_GASTOS_CACHE_TTL)
+
 def visualizar_command(update: Update, context: CallbackContext):
     """
     Comando para iniciar a visualização de gastos
@@ -284,13 +298,14 @@ def mostrar_gastos(update: Update, context: CallbackContext):
     forma_pagamento = filtros.get('forma_pagamento')
     categoria = filtros.get('categoria')
     
-    # Buscar gastos
+    # Buscar gastos (apenas as colunas exibidas)
     gastos = db.obter_gastos(
         usuario_id=usuario_id,
         ano=ano,
         mes=mes,
         forma_pagamento=forma_pagamento,
-        categoria=categoria
+        categoria=categoria,
+        colunas=COLUNAS_EXIBICAO
     )
     
     # Preparar texto do período para exibição
@@ -313,11 +328,20 @@ def mostrar_gastos(update: Update, context: CallbackContext):
     if filtros_texto:
         periodo += f" ({', '.join(filtros_texto)})"
     
-    # Formatar os gastos
-    texto_gastos = formatar_lista_gastos(gastos)
-    
-    # Texto resumo por categoria
-    texto_categorias = resumo_gastos_por_categoria(gastos)
+    # Totais por categoria e por forma de pagamento agregados no banco a partir de
+    # gastos_mensal: um payload pequeno, qualquer que seja o histórico; os demais números
+    # saem de uma passada pelos gastos já buscados para a lista
+    por_categoria = db.resumo_por_categoria(usuario_id, ano, mes, forma_pagamento, categoria)
+    por_forma_pagamento = db.resumo_por_forma_pagamento(usuario_id, ano, mes, forma_pagamento, categoria)
+    resumo = calcular_resumo(gastos)
+    total = resumo['total_centavos']
+    texto_categorias = formatar_resumo(por_categoria, por_forma_pagamento, resumo['por_mes'])
+    
+    # Formatar cada gasto uma única vez; as páginas são fatias desta lista
+    itens = tuple(formatar_item_gasto(gasto) for gasto in gastos)
+    paginas = paginar_gastos(
+        itens, total, LISTA_GASTOS_PAGE_SIZE, LIMITE_MENSAGEM - len(titulo_detalhamento(periodo))
+    )
     
     # Botões para navegar
     keyboard = [
@@ -337,12 +361,20 @@ def mostrar_gastos(update: Update, context: CallbackContext):
             parse_mode='Markdown'
         )
         
-        # Depois envia a lista completa de gastos
-        query.message.reply_text(
-            f"*📋 DETALHAMENTO: {periodo}*\n\n"
-            f"{texto_gastos}",
+        # Depois envia a primeira página da lista de gastos
+        mensagem = query.message.reply_text(
+            texto_pagina_gastos(periodo, itens, total, paginas, 0),
+            reply_markup=botoes_pagina_gastos(len(paginas), 0),
             parse_mode='Markdown'
         )
+        
+        # Guarda a lista para as trocas de página
+        if len(paginas) > 1:
+            listas_gastos.definir(
+                (mensagem.chat_id, mensagem.message_id),
+                (update.effective_user.id, periodo, itens, total, paginas),
+                grupo=update.effective_user.id
+            )
     except Exception as e:
         logger.error(f"Erro ao exibir gastos: {e}")
         query.edit_message_text(
@@ -354,6 +386,59 @@ def mostrar_gastos(update: Update, context: CallbackContext):
     
     return ConversationHandler.END
 
+def titulo_detalhamento(periodo):
+    """Título das páginas do detalhamento, antes da lista"""
+    return f"*📋 DETALHAMENTO: {periodo}*\n\n"
+
+def texto_pagina_gastos(periodo, itens, total, paginas, pagina):
+    """Texto de uma página do detalhamento dos gastos"""
+    return titulo_detalhamento(periodo) + formatar_pagina_gastos(itens, total, paginas, pagina)
+
+def botoes_pagina_gastos(total_paginas, pagina):
+    """Botões ◀/▶ para navegar entre as páginas, ou None se a lista cabe em uma página"""
+    if total_paginas <= 1:
+        return None
+    
+    botoes = []
+    
+    if pagina > 0:
+        botoes.append(InlineKeyboardButton("◀️ Anterior", callback_data=f"gastos_pag_{pagina - 1}"))
+    
+    botoes.append(InlineKeyboardButton(f"{pagina + 1}/{total_paginas}", callback_data=f"gastos_pag_{pagina}"))
+    
+    if pagina < total_paginas - 1:
+        botoes.append(InlineKeyboardButton("Próxima ▶️", callback_data=f"gastos_pag_{pagina + 1}"))
+    
+    return InlineKeyboardMarkup([botoes])
+
+def pagina_gastos_callback(update: Update, context: CallbackContext):
+    """
+    Callback dos botões ◀/▶: mostra outra página da lista de gastos, a partir
+    da lista guardada quando a consulta foi feita
+    """
+    query = update.callback_query
+    
+    lista = listas_gastos.obter((query.message.chat_id, query.message.message_id), None)
+    
+    if lista is None or lista[0] != update.effective_user.id:
+        query.answer("Esta lista expirou. Faça uma nova consulta para ver os gastos.", show_alert=True)
+        return
+    
+    _, periodo, itens, total, paginas = lista
+    pagina = min(max(int(query.data.replace("gastos_pag_", "")), 0), len(paginas) - 1)
+    
+    query.answer()
+    
+    try:
+        query.edit_message_text(
+            texto_pagina_gastos(periodo, itens, total, paginas, pagina),
+            reply_markup=botoes_pagina_gastos(len(paginas), pagina),
+            parse_mode='Markdown'
+        )
+    except Exception as e:
+        # Ex.: "message is not modified" ao tocar no número da página atual
+        logger.debug(f"Não foi possível trocar a página da lista de gastos: {e}")
+
 def visualizar_novo_callback(update: Update, context: CallbackContext):
     """
     Callback para iniciar uma nova consulta
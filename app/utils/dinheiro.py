@@ -0,0 +1,75 @@
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+import re
+
+# Os valores em dinheiro circulam como inteiros em centavos: da leitura do que o
+# usuário digitou, passando pelo banco, somas e exportações, até a exibição. Somas
+# de inteiros são exatas e baratas; a conversão para reais só acontece na saída.
+
+# Valor digitado, opcionalmente com sinal de menos e "R$": a parte inteira sem separadores ou em grupos
+# de três dígitos separados sempre pelo mesmo caractere ('.' ou ','), seguida ou não de
+# um separador decimal com um ou dois dígitos
+_VALOR_DIGITADO = re.compile(r"""
+    ^(?P<sinal>-)?\s*(?:R\$)?\s*
+    (?P<inteiro>\d+|[1-9]\d{0,2}(?P<milhar>[.,])\d{3}(?:(?P=milhar)\d{3})*)
+    (?:(?P<separador>[.,])(?P<decimal>\d{1,2}))?$
+""", re.IGNORECASE | re.VERBOSE)
+
+def centavos_de_texto(texto):
+    """
+    Converte um valor digitado pelo usuário em centavos.
+    
+    Aceita "12", "12,5", "12.50", "1.234", "1.234,56", "1,234.56" e "R$ 10". Um
+    separador seguido de três dígitos agrupa milhares; o decimal tem até dois
+    dígitos e é diferente do separador de milhares. Textos fora desse formato
+    ("10.5.3", "1,2,3", "1..5", "0,001") são recusados. Um sinal de menos no início
+    ("-5", "-R$ 5") é aceito e resulta em centavos negativos, para que quem chamou
+    diferencie um valor negativo de um texto inválido.
+    
+    Returns:
+        int: Valor em centavos (negativo se o texto começar com '-'), ou None se o
+            texto não for um valor válido
+    """
+    encontrado = _VALOR_DIGITADO.match(texto.strip())
+    
+    if not encontrado:
+        return None
+    
+    milhar = encontrado.group('milhar')
+    
+    if milhar and encontrado.group('separador') == milhar:
+        return None
+    
+    inteiro = encontrado.group('inteiro').replace(milhar, '') if milhar else encontrado.group('inteiro')
+    decimal = encontrado.group('decimal') or ''
+    
+    centavos = int(inteiro) * 100 + int(decimal.ljust(2, '0'))
+    
+    return -centavos if encontrado.group('sinal') else centavos
+
+def centavos_de_valor(valor):
+    """
+    Converte um valor em reais (número, Decimal ou texto como "12.50") em centavos,
+    arredondando meio centavo para cima. Usado para dados gravados em reais.
+    
+    Returns:
+        int: Valor em centavos, ou None se o valor for inválido
+    """
+    if valor is None:
+        return None
+    
+    try:
+        reais = Decimal(str(valor))
+    except InvalidOperation:
+        return None
+    
+    return int((reais * 100).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+def reais(centavos):
+    """Converte centavos em reais (float), para saídas numéricas como planilhas"""
+    return centavos / 100
+
+def texto_decimal(centavos):
+    """Valor em reais como texto decimal exato, com ponto (ex.: 1234.56)"""
+    sinal = '-' if centavos < 0 else ''
+    inteiro, resto = divmod(abs(centavos), 100)
+    return f"{sinal}{inteiro}.{resto:02d}"
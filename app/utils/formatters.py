@@ -1,59 +1,134 @@
-import locale
-from datetime import datetime
+from datetime import date
+import re
 
-# Configurar locale para formatação de moeda em português brasileiro
-try:
-    locale.setlocale(locale.LC_ALL, 'pt_BR.UTF-8')
-except:
-    try:
-        locale.setlocale(locale.LC_ALL, 'Portuguese_Brazil.1252')
-    except:
-        pass  # Se não conseguir configurar, usa o padrão
+# Formatação pt-BR sem depender do locale do sistema: locale.setlocale altera um estado
+# global do processo, compartilhado pelas threads do dispatcher, e sem o pt_BR instalado
+# a saída mudava de formato silenciosamente. As funções abaixo são puras e thread-safe.
+# Os valores chegam em centavos (ver app/utils/dinheiro.py) e só aqui viram reais.
 
-def formatar_valor(valor):
-    """Formata um valor monetário"""
-    try:
-        return locale.currency(float(valor), grouping=True)
-    except:
-        return f"R$ {valor:.2f}".replace('.', ',')
+# Data ISO (AAAA-MM-DD), com ou sem hora depois
+_DATA_ISO = re.compile(r'(\d{4})-(\d{2})-(\d{2})')
+
+# Meses exibidos no resumo (os mais recentes), para a mensagem não passar do limite do Telegram
+MESES_NO_RESUMO = 12
+
+# Tamanho máximo de uma mensagem (o Telegram aceita 4096 caracteres; o resto é margem)
+LIMITE_MENSAGEM = 4000
+
+# Caracteres do local exibidos em cada gasto da lista (o texto é livre)
+TAMANHO_MAXIMO_LOCAL = 100
+
+def formatar_valor(centavos):
+    """Formata um valor em centavos no padrão brasileiro (R$ 1.234,56)"""
+    if not isinstance(centavos, int):
+        try:
+            # Médias e outros resultados não inteiros: arredonda para o centavo
+            centavos = round(float(centavos))
+        except (TypeError, ValueError):
+            return f"R$ {centavos}"
+    
+    inteiro, resto = divmod(abs(centavos), 100)
+    texto = f"R$ {inteiro:,}".replace(',', '.') + f",{resto:02d}"
+    return f"-{texto}" if centavos < 0 else texto
 
 def formatar_data(data, formato='%d/%m/%Y'):
-    """Formata uma data"""
+    """Formata uma data (objeto date/datetime ou texto ISO AAAA-MM-DD)"""
     if isinstance(data, str):
+        iso = _DATA_ISO.match(data)
+        
+        if not iso:
+            return data
+        
+        ano, mes, dia = iso.groups()
+        
+        # Formato padrão: só reordena o texto, sem converter para data
+        if formato == '%d/%m/%Y':
+            return f"{dia}/{mes}/{ano}"
+        
         try:
-            data = datetime.strptime(data, '%Y-%m-%d')
-        except:
+            data = date(int(ano), int(mes), int(dia))
+        except ValueError:
             return data
     
     return data.strftime(formato)
 
-def formatar_lista_gastos(gastos):
-    """Formata uma lista de gastos para exibição"""
-    if not gastos:
+def formatar_item_gasto(gasto):
+    """Formata um gasto como um item da lista de gastos"""
+    data = formatar_data(gasto.get('data', ''))
+    categoria = gasto.get('categoria', 'Não especificada')
+    local = gasto.get('local', 'Não especificado')
+    forma = gasto.get('forma_pagamento', 'Não especificada')
+    
+    if local and len(local) > TAMANHO_MAXIMO_LOCAL:
+        local = local[:TAMANHO_MAXIMO_LOCAL - 1] + "…"
+    
+    parcelas = gasto.get('parcelas')
+    info_parcelas = f" ({parcelas}x)" if parcelas and forma == "Crédito" else ""
+    
+    return (f"*{data}*: {formatar_valor(gasto.get('valor_centavos') or 0)}{info_parcelas}\n"
+            f"📍 {local}\n"
+            f"🏷️ {categoria}\n"
+            f"💳 {forma}\n\n")
+
+def _cabecalho_pagina(pagina, total_paginas):
+    return f"📊 *LISTA DE GASTOS* 📊 (página {pagina + 1} de {total_paginas})\n\n"
+
+def _rodape_pagina(quantidade, total):
+    return f"\n*TOTAL ({quantidade} gastos): {formatar_valor(total)}*"
+
+def paginar_gastos(itens, total, por_pagina, limite=LIMITE_MENSAGEM):
+    """
+    Divide a lista de gastos em páginas de até `por_pagina` gastos cujo texto,
+    com cabeçalho e total, não passe de `limite` caracteres
+    
+    Args:
+        itens: Gastos já formatados por formatar_item_gasto
+        total: Soma dos valores de todos os gastos da lista, em centavos
+        por_pagina: Quantidade máxima de gastos por página
+        limite: Caracteres disponíveis para o texto da página
+    
+    Returns:
+        list: Intervalos (início, fim) dos itens de cada página
+    """
+    # Cabeçalho e total no maior tamanho possível (no máximo uma página por gasto)
+    disponivel = limite - len(_cabecalho_pagina(len(itens), len(itens))) - len(_rodape_pagina(len(itens), total))
+    
+    paginas = []
+    inicio = 0
+    tamanho = 0
+    
+    for i, item in enumerate(itens):
+        if i > inicio and (i - inicio >= por_pagina or tamanho + len(item) > disponivel):
+            paginas.append((inicio, i))
+            inicio = i
+            tamanho = 0
+        tamanho += len(item)
+    
+    if itens:
+        paginas.append((inicio, len(itens)))
+    
+    return paginas
+
+def formatar_pagina_gastos(itens, total, paginas, pagina):
+    """
+    Formata uma página da lista de gastos
+    
+    Args:
+        itens: Gastos já formatados por formatar_item_gasto
+        total: Soma dos valores de todos os gastos da lista, em centavos
+        paginas: Intervalos das páginas, calculados por paginar_gastos
+        pagina: Número da página (a partir de 0)
+    """
+    if not itens:
         return "Nenhum gasto encontrado."
     
-    resultado = "📊 *LISTA DE GASTOS* 📊\n\n"
-    total = 0
+    inicio, fim = paginas[pagina]
     
-    for gasto in gastos:
-        valor = float(gasto.get('valor', 0))
-        total += valor
-        
-        data = formatar_data(gasto.get('data', ''))
-        categoria = gasto.get('categoria', 'Não especificada')
-        local = gasto.get('local', 'Não especificado')
-        forma = gasto.get('forma_pagamento', 'Não especificada')
-        
-        parcelas = gasto.get('parcelas')
-        info_parcelas = f" ({parcelas}x)" if parcelas and forma == "Crédito" else ""
-        
-        resultado += (f"*{data}*: {formatar_valor(valor)}{info_parcelas}\n"
-                    f"📍 {local}\n"
-                    f"🏷️ {categoria}\n"
-                    f"💳 {forma}\n\n")
+    partes = [_cabecalho_pagina(pagina, len(paginas))]
+    partes.extend(itens[inicio:fim])
+    partes.append(_rodape_pagina(len(itens), total))
     
-    resultado += f"\n*TOTAL: {formatar_valor(total)}*"
-    return resultado
+    return ''.join(partes)
 
 def obter_nome_mes(numero_mes):
     """Retorna o nome do mês a partir do número (1-12)"""
@@ -64,30 +139,48 @@ def obter_nome_mes(numero_mes):
     }
     return meses.get(int(numero_mes), str(numero_mes))
 
-def resumo_gastos_por_categoria(gastos):
-    """Cria um resumo dos gastos agrupados por categoria"""
-    if not gastos:
+def _linhas_grupo(itens, nome, total):
+    """Uma linha por grupo: total e porcentagem do total geral"""
+    for item in itens:
+        valor = int(item['total_centavos'])
+        porcentagem = valor / total * 100 if total > 0 else 0.0
+        yield f"*{item[nome]}*: {formatar_valor(valor)} ({porcentagem:.1f}%)\n"
+
+def formatar_resumo(por_categoria, por_forma_pagamento, por_mes=()):
+    """
+    Formata o resumo da visualização: totais por categoria, por forma de pagamento
+    e, se houver mais de um mês, pelos últimos MESES_NO_RESUMO meses
+    
+    Args:
+        por_categoria: Dicionários com 'categoria', 'total_centavos' e 'quantidade', do maior
+            para o menor total (ver Database.resumo_por_categoria); o total geral, a
+            quantidade e a média saem da soma destes grupos
+        por_forma_pagamento: Dicionários com 'forma_pagamento' e 'total_centavos', do maior
+            para o menor total
+        por_mes: Dicionários com 'mes' (AAAA-MM), 'total_centavos' e 'quantidade', em ordem
+            cronológica (ver calcular_resumo)
+    """
+    total = sum(int(item['total_centavos']) for item in por_categoria)
+    quantidade = sum(int(item['quantidade']) for item in por_categoria)
+    
+    if not quantidade:
         return "Nenhum gasto encontrado para gerar o resumo."
     
-    categorias = {}
-    total = 0
+    partes = ["📊 *RESUMO POR CATEGORIA* 📊\n\n"]
+    partes.extend(_linhas_grupo(por_categoria, 'categoria', total))
     
-    for gasto in gastos:
-        valor = float(gasto.get('valor', 0))
-        categoria = gasto.get('categoria', 'Não especificada')
-        
-        if categoria not in categorias:
-            categorias[categoria] = 0
-        
-        categorias[categoria] += valor
-        total += valor
+    partes.append("\n💳 *POR FORMA DE PAGAMENTO*\n")
+    partes.extend(_linhas_grupo(por_forma_pagamento, 'forma_pagamento', total))
     
-    resultado = "📊 *RESUMO POR CATEGORIA* 📊\n\n"
+    if len(por_mes) > 1:
+        partes.append("\n📅 *POR MÊS*\n")
+        partes.extend(
+            f"{item['mes'][5:7]}/{item['mes'][:4]}: {formatar_valor(item['total_centavos'])} "
+            f"({item['quantidade']} gastos)\n"
+            for item in por_mes[-MESES_NO_RESUMO:]
+        )
     
-    # Ordenar categorias por valor gasto (maior para menor)
-    for categoria, valor in sorted(categorias.items(), key=lambda x: x[1], reverse=True):
-        porcentagem = (valor / total) * 100 if total > 0 else 0
-        resultado += f"*{categoria}*: {formatar_valor(valor)} ({porcentagem:.1f}%)\n"
+    partes.append(f"\n🧾 {quantidade} gastos, média de {formatar_valor(total / quantidade)}\n")
+    partes.append(f"*TOTAL: {formatar_valor(total)}*")
     
-    resultado += f"\n*TOTAL: {formatar_valor(total)}*"
-    return resultado 
\ No newline at end of file
+    return ''.join(partes)
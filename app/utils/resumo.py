@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+
+def calcular_resumo(gastos):
+    """
+    Calcula em uma única passada vetorizada os números da tela de visualização que
+    dependem dos gastos já buscados para a lista: o total geral e a quebra por mês.
+    
+    Os totais por categoria e por forma de pagamento não passam por aqui: vêm
+    agregados do banco (Database.resumo_por_categoria e resumo_por_forma_pagamento),
+    sem trazer todo o histórico.
+    
+    As datas distintas viram códigos inteiros com pd.factorize (por hash) e os
+    totais e contagens de cada mês saem de np.bincount sobre esses códigos, sem
+    laços por linha. Os valores são inteiros em centavos, então as somas são exatas.
+    
+    Args:
+        gastos: Lista de gastos (RegistroGasto ou dicionários) com ao menos
+            'valor_centavos' e 'data' (AAAA-MM-DD)
+    
+    Returns:
+        dict: 'total_centavos', 'quantidade' e 'media_centavos' de todos os gastos, e
+            'por_mes' (em ordem cronológica, mês como AAAA-MM): lista de dicionários com
+            'mes', 'total_centavos', 'quantidade', 'media_centavos' e 'porcentagem' do total geral
+    """
+    if not gastos:
+        return {'total_centavos': 0, 'quantidade': 0, 'media_centavos': 0.0, 'por_mes': []}
+    
+    # Colunas; compreensões de lista por coluna são bem mais rápidas que transpor tuplas
+    valores = np.fromiter((gasto.get('valor_centavos') or 0 for gasto in gastos), dtype=np.int64, count=len(gastos))
+    datas = _codificar([gasto.get('data') or '' for gasto in gastos])
+    
+    # Mês de cada data distinta (há bem menos datas distintas que gastos) e, por
+    # indexação, o código do mês de cada gasto
+    codigos_datas, rotulos_datas = datas
+    codigos_meses, rotulos_meses = pd.factorize(
+        np.array([str(data)[:7] for data in rotulos_datas], dtype=object), sort=True
+    )
+    meses = (codigos_meses[codigos_datas], rotulos_meses)
+    
+    total = int(valores.sum())
+    
+    return {
+        'total_centavos': total,
+        'quantidade': len(valores),
+        'media_centavos': total / len(valores),
+        'por_mes': _agrupar(valores, meses, 'mes', total)
+    }
+
+def _codificar(coluna):
+    """Códigos inteiros (por hash) e rótulos distintos de uma coluna de texto"""
+    return pd.factorize(np.array(coluna, dtype=object))
+
+def _agrupar(valores, codificada, nome, total):
+    """Soma e conta os valores por código, na ordem dos rótulos (já ordenados)"""
+    codigos, rotulos = codificada
+    
+    # bincount soma os pesos em float64, exato para inteiros até 2**53 centavos
+    totais = np.rint(np.bincount(codigos, weights=valores, minlength=len(rotulos))).astype(np.int64)
+    quantidades = np.bincount(codigos, minlength=len(rotulos))
+    
+    return [
+        {
+            nome: str(rotulos[i]),
+            'total_centavos': int(totais[i]),
+            'quantidade': int(quantidades[i]),
+            'media_centavos': float(totais[i] / quantidades[i]),
+            'porcentagem': float(totais[i] / total * 100) if total > 0 else 0.0
+        }
+        for i in range(len(rotulos))
+    ]
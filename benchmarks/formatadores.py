@@ -0,0 +1,92 @@
+"""
+Benchmark dos formatadores de valor e data (app/utils/formatters.py)
+
+Compara os formatadores atuais, sem locale, com a implementação anterior
+(locale.currency e strptime a cada linha) e mede a lista de gastos completa.
+A implementação anterior usa o locale pt_BR se estiver instalado; sem ele,
+locale.currency falha e cai no formato alternativo, como acontecia no bot.
+
+Uso:
+    python benchmarks/formatadores.py [repetições]
+"""
+import locale
+import os
+import random
+import sys
+import timeit
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.formatters import formatar_valor, formatar_data, formatar_item_gasto
+
+REPETICOES_PADRAO = 100000
+
+try:
+    locale.setlocale(locale.LC_ALL, 'pt_BR.UTF-8')
+    LOCALE_PT_BR = True
+except locale.Error:
+    LOCALE_PT_BR = False
+
+def formatar_valor_locale(valor):
+    """Implementação anterior de formatar_valor"""
+    try:
+        return locale.currency(float(valor), grouping=True)
+    except:
+        return f"R$ {valor:.2f}".replace('.', ',')
+
+def formatar_data_strptime(data, formato='%d/%m/%Y'):
+    """Implementação anterior de formatar_data"""
+    if isinstance(data, str):
+        try:
+            data = datetime.strptime(data, '%Y-%m-%d')
+        except:
+            return data
+    
+    return data.strftime(formato)
+
+def medir(funcao, argumentos, repeticoes):
+    """Tempo médio por chamada, em microssegundos"""
+    quantidade = len(argumentos)
+
+    def executar():
+        for argumento in argumentos:
+            funcao(argumento)
+    
+    vezes = max(1, repeticoes // quantidade)
+    return timeit.timeit(executar, number=vezes) / (vezes * quantidade) * 1e6
+
+def main():
+    repeticoes = int(sys.argv[1]) if len(sys.argv) > 1 else REPETICOES_PADRAO
+    aleatorio = random.Random(42)
+    
+    centavos = [aleatorio.randint(0, 2000000) for _ in range(1000)]
+    # A implementação anterior recebia o valor em reais
+    valores = [c / 100 for c in centavos]
+    datas = [(date(2019, 1, 1) + timedelta(days=aleatorio.randrange(2500))).isoformat() for _ in range(1000)]
+    gastos = [
+        {'valor_centavos': valor, 'data': data, 'categoria': 'Lazer', 'local': 'Mercado',
+         'forma_pagamento': 'Crédito', 'parcelas': 3}
+        for valor, data in zip(centavos, datas)
+    ]
+    
+    print(f"locale pt_BR disponível: {'sim' if LOCALE_PT_BR else 'não (formato alternativo)'}")
+    print(f"exemplo anterior: {formatar_valor_locale(1234.5)!r}  atual: {formatar_valor(123450)!r}")
+    print()
+    print(f"{'função':<16} | {'anterior µs':>11} | {'atual µs':>9} | {'ganho':>6}")
+    
+    casos = [
+        ('formatar_valor', formatar_valor_locale, valores, formatar_valor, centavos),
+        ('formatar_data', formatar_data_strptime, datas, formatar_data, datas),
+    ]
+    
+    for nome, anterior, argumentos_anteriores, atual, argumentos in casos:
+        tempo_anterior = medir(anterior, argumentos_anteriores, repeticoes)
+        tempo_atual = medir(atual, argumentos, repeticoes)
+        print(f"{nome:<16} | {tempo_anterior:>11.3f} | {tempo_atual:>9.3f} | {tempo_anterior / tempo_atual:>5.1f}x")
+    
+    tempo_item = medir(formatar_item_gasto, gastos, repeticoes)
+    print(f"{'item da lista':<16} | {'':>11} | {tempo_item:>9.3f} |")
+
+if __name__ == '__main__':
+    main()
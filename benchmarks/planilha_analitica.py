@@ -0,0 +1,100 @@
+"""
+Benchmark da planilha analítica (EscritorExcel com analises=True)
+
+Mede, para volumes crescentes de gastos sintéticos, o tempo das abas analíticas
+isoladas (acúmulo + agregação) e da planilha completa, com e sem análises.
+O tempo por gasto deve ficar estável: o custo cresce de forma linear.
+
+Uso:
+    python benchmarks/planilha_analitica.py [quantidades...]
+"""
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from functools import partial
+from app.exports.analises import AnaliseGastos
+from app.exports.conversao import converter_campo
+from app.exports.excel_exporter import CONVERSORES_PLANILHA, EscritorExcel
+from app.exports.partes import exportar_em_partes
+from config import CATEGORIAS, FORMAS_PAGAMENTO
+
+QUANTIDADES_PADRAO = [10000, 25000, 50000, 100000]
+
+def gerar_gastos(quantidade, semente=42):
+    """Gastos sintéticos com a mesma forma dos registros lidos do banco"""
+    aleatorio = random.Random(semente)
+    locais = [f"Estabelecimento {i}" for i in range(2000)]
+    inicio = date(2019, 1, 1)
+    
+    gastos = []
+    for i in range(quantidade):
+        forma = aleatorio.choice(FORMAS_PAGAMENTO)
+        gastos.append({
+            'valor_centavos': aleatorio.randint(100, 50000),
+            'forma_pagamento': forma,
+            'parcelas': aleatorio.randint(1, 12) if forma == 'Crédito' else None,
+            'categoria': aleatorio.choice(CATEGORIAS),
+            'local': aleatorio.choice(locais),
+            'data': (inicio + timedelta(days=aleatorio.randrange(2000))).isoformat(),
+            'criado_em': '2024-01-01T12:00:00+00:00'
+        })
+    
+    return gastos
+
+def medir(funcao):
+    inicio = time.perf_counter()
+    funcao()
+    return time.perf_counter() - inicio
+
+def medir_analises(gastos):
+    """Acúmulo na passada + cálculo das quatro abas, sem escrever a planilha"""
+    linhas = [
+        (gasto['valor_centavos'],) + tuple(converter_campo(campo, gasto.get(campo), CONVERSORES_PLANILHA) for campo in (
+            'forma_pagamento', 'parcelas', 'categoria', 'local', 'data'
+        ))
+        for gasto in gastos
+    ]
+
+    def executar():
+        analise = AnaliseGastos()
+        for linha in linhas:
+            analise.adicionar(*linha)
+        analise.planilhas()
+    
+    return medir(executar)
+
+def medir_planilha(gastos, analises):
+    def executar():
+        # Um único arquivo, sem divisão por tamanho
+        partes = exportar_em_partes(
+            iter(gastos), partial(EscritorExcel, analises=analises), 'benchmark', limite=None
+        )
+        for arquivo, _, _ in partes:
+            arquivo.close()
+    
+    return medir(executar)
+
+def main():
+    quantidades = [int(q) for q in sys.argv[1:]] or QUANTIDADES_PADRAO
+    
+    print(f"{'gastos':>8} | {'análises':>10} {'µs/gasto':>9} | {'xlsx':>8} {'µs/gasto':>9} | "
+          f"{'xlsx+análises':>13} {'µs/gasto':>9}")
+    
+    for quantidade in quantidades:
+        gastos = gerar_gastos(quantidade)
+        
+        analises = medir_analises(gastos)
+        simples = medir_planilha(gastos, analises=False)
+        completa = medir_planilha(gastos, analises=True)
+        
+        print(f"{quantidade:>8} | {analises:>9.3f}s {analises / quantidade * 1e6:>9.2f} | "
+              f"{simples:>7.2f}s {simples / quantidade * 1e6:>9.1f} | "
+              f"{completa:>12.2f}s {completa / quantidade * 1e6:>9.1f}")
+
+if __name__ == '__main__':
+    main()
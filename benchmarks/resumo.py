@@ -0,0 +1,71 @@
+"""
+Benchmark do resumo da tela de visualização (app/utils/resumo.py)
+
+Compara calcular_resumo, que calcula o total da lista e a quebra por mês em
+uma passada vetorizada, com o mesmo cálculo feito por laços em Python sobre
+cada linha. Os totais por categoria e por forma de pagamento vêm agregados do
+banco e ficam fora da medição.
+
+Uso:
+    python benchmarks/resumo.py [quantidades...]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from planilha_analitica import gerar_gastos
+from app.utils.resumo import calcular_resumo
+
+QUANTIDADES_PADRAO = [10000, 100000]
+REPETICOES = 5
+
+def resumo_por_lacos(gastos):
+    """Cálculo por laços: o total e uma passada em Python agrupando por mês"""
+    total = 0
+    for gasto in gastos:
+        total += gasto.get('valor_centavos', 0)
+    
+    meses = {}
+    for gasto in gastos:
+        chave = gasto.get('data', '')[:7]
+        
+        if chave not in meses:
+            meses[chave] = {'total': 0, 'quantidade': 0}
+        
+        meses[chave]['total'] += gasto.get('valor_centavos', 0)
+        meses[chave]['quantidade'] += 1
+    
+    return total, meses
+
+def medir(funcao, gastos):
+    """Melhor tempo entre REPETICOES execuções"""
+    melhor = None
+    for _ in range(REPETICOES):
+        inicio = time.perf_counter()
+        funcao(gastos)
+        duracao = time.perf_counter() - inicio
+        melhor = duracao if melhor is None else min(melhor, duracao)
+    return melhor
+
+def main():
+    quantidades = [int(q) for q in sys.argv[1:]] or QUANTIDADES_PADRAO
+    
+    print(f"{'gastos':>8} | {'laços':>9} {'µs/gasto':>9} | {'vetorizado':>10} {'µs/gasto':>9} | {'ganho':>6}")
+    
+    for quantidade in quantidades:
+        gastos = gerar_gastos(quantidade)
+        
+        # Os dois cálculos devem chegar ao mesmo total
+        total, _ = resumo_por_lacos(gastos)
+        assert total == calcular_resumo(gastos)['total_centavos']
+        
+        lacos = medir(resumo_por_lacos, gastos)
+        vetorizado = medir(calcular_resumo, gastos)
+        
+        print(f"{quantidade:>8} | {lacos:>8.3f}s {lacos / quantidade * 1e6:>9.2f} | "
+              f"{vetorizado:>9.3f}s {vetorizado / quantidade * 1e6:>9.2f} | {lacos / vetorizado:>5.1f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,318 @@
+"""
+Harness local do modo webhook, sem rede: uma Bot API falsa + o bot real (main.py)
+
+Sobe uma Bot API falsa em 127.0.0.1 (getMe, setWebhook, getUpdates, sendMessage...),
+inicia `python main.py` apontando para ela (TELEGRAM_API_URL) e, em vários chats,
+começa um registro de gasto (/registrar e depois o valor), medindo o tempo até o bot
+pedir a data. O pedido só chega se os dois updates do chat forem processados em ordem
+e pelo mesmo processo, que guarda o estado da conversa.
+
+Modos:
+    webhook  - WEBHOOK_URL configurado: os updates são enviados por POST ao bot,
+               com o segredo no cabeçalho (e uma entrega com segredo errado deve ser recusada)
+    fallback - WEBHOOK_URL configurado, mas a Bot API recusa o setWebhook: o bot deve
+               cair no long polling
+    polling  - sem WEBHOOK_URL: os updates são entregues por getUpdates
+    workers  - como webhook, mas o bot é o ingresso e repassa os updates a
+               processos worker locais (WEBHOOK_WORKERS_LOCAIS)
+
+Uso:
+    python benchmarks/webhook.py [modo] [chats] [conexões] [workers]
+
+A variável LATENCIA_API_MS (padrão 0) atrasa cada resposta da Bot API falsa,
+simulando a ida e volta até os servidores do Telegram; HANDLER_WORKERS é repassada
+ao bot (0 = um update de cada vez). No modo webhook, mostra ao final a espera na
+fila e a execução de cada handler, lidas de /metricas.
+"""
+import http.client
+import json
+import os
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+TOKEN = '123456:TOKEN-DE-TESTE'
+SEGREDO = 'segredo-de-teste'
+CAMINHO_WEBHOOK = '/telegram'
+TEMPO_LIMITE = 60  # segundos para o bot iniciar e para todas as respostas chegarem
+LATENCIA_API = float(os.getenv('LATENCIA_API_MS', '0')) / 1000
+
+# Resposta do bot ao valor do gasto, o segundo update de cada chat
+PEDIDO_DATA = 'Qual a data do gasto?'
+
+class TelegramFalso:
+    """Estado da Bot API falsa: updates pendentes (polling), webhook registrado e respostas do bot"""
+    def __init__(self, falhar_webhook=False):
+        self.falhar_webhook = falhar_webhook
+        self.webhook = None
+        self.polling = threading.Event()
+        self._condicao = threading.Condition()
+        self._updates = []
+        self._respostas = {}  # chat_id -> instante da mensagem com o texto esperado
+        self.esperado = PEDIDO_DATA
+        self._mensagens = 0
+
+    def enfileirar(self, update):
+        """Update a ser entregue no próximo getUpdates"""
+        with self._condicao:
+            self._updates.append(update)
+            self._condicao.notify_all()
+
+    def aguardar_respostas(self, chats, tempo_limite):
+        """Instantes das respostas esperadas de cada chat (None para os que não as receberam a tempo)"""
+        fim = time.monotonic() + tempo_limite
+        with self._condicao:
+            while not all(chat in self._respostas for chat in chats):
+                restante = fim - time.monotonic()
+                if restante <= 0:
+                    break
+                self._condicao.wait(restante)
+            return [self._respostas.get(chat) for chat in chats]
+
+    def responder(self, metodo, dados):
+        """Resultado de uma chamada à Bot API; levanta ValueError para responder com erro"""
+        if metodo == 'getMe':
+            return {'id': 123456, 'is_bot': True, 'first_name': 'Nuxo', 'username': 'nuxo_teste_bot'}
+        
+        if metodo == 'setWebhook':
+            if self.falhar_webhook:
+                raise ValueError('Bad Request: bad webhook: failed to resolve host')
+            self.webhook = dados
+            return True
+        
+        if metodo == 'getUpdates':
+            return self._get_updates(int(dados.get('offset') or 0), float(dados.get('timeout') or 0))
+        
+        if metodo in ('sendMessage', 'editMessageText'):
+            chat_id = int(dados['chat_id'])
+            with self._condicao:
+                self._mensagens += 1
+                if self.esperado in dados.get('text', ''):
+                    self._respostas.setdefault(chat_id, time.perf_counter())
+                self._condicao.notify_all()
+                message_id = self._mensagens
+            return {
+                'message_id': message_id, 'date': int(time.time()),
+                'chat': {'id': chat_id, 'type': 'private'}, 'text': dados.get('text', '')
+            }
+        
+        return True
+
+    def _get_updates(self, offset, tempo_limite):
+        """Long polling: espera até haver updates a partir de `offset`"""
+        self.polling.set()
+        fim = time.monotonic() + tempo_limite
+        with self._condicao:
+            while True:
+                self._updates = [u for u in self._updates if u['update_id'] >= offset]
+                restante = fim - time.monotonic()
+                if self._updates or restante <= 0:
+                    return list(self._updates)
+                self._condicao.wait(restante)
+
+class BotAPIHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        metodo = self.path.rsplit('/', 1)[-1]
+        corpo = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        tipo = self.headers.get('Content-Type', '')
+        dados = json.loads(corpo) if corpo and 'json' in tipo else {}
+        
+        if LATENCIA_API:
+            time.sleep(LATENCIA_API)
+        
+        try:
+            resposta = {'ok': True, 'result': self.server.telegram.responder(metodo, dados)}
+        except ValueError as e:
+            resposta = {'ok': False, 'error_code': 400, 'description': str(e)}
+        
+        corpo = json.dumps(resposta).encode('utf-8')
+        self.send_response(200 if resposta['ok'] else 400)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def log_message(self, formato, *args):
+        pass
+
+def porta_livre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def criar_update(update_id, chat_id, texto):
+    mensagem = {
+        'message_id': update_id, 'date': int(time.time()),
+        'chat': {'id': chat_id, 'type': 'private'},
+        'from': {'id': chat_id, 'is_bot': False, 'first_name': 'Teste'},
+        'text': texto
+    }
+    if texto.startswith('/'):
+        mensagem['entities'] = [{'type': 'bot_command', 'offset': 0, 'length': len(texto)}]
+    
+    return {'update_id': update_id, 'message': mensagem}
+
+def conversa(chat_id):
+    """Os dois updates de cada chat: o comando e o valor do gasto"""
+    return [criar_update(chat_id * 2, chat_id, '/registrar'), criar_update(chat_id * 2 + 1, chat_id, '12,50')]
+
+def aceitando_conexoes(porta):
+    with socket.socket() as s:
+        return s.connect_ex(('127.0.0.1', porta)) == 0
+
+def pronto(porta):
+    """O bot responde 200 em /pronto (no ingresso, quando todos os workers estão prontos)"""
+    conexao = http.client.HTTPConnection('127.0.0.1', porta, timeout=5)
+    try:
+        conexao.request('GET', '/pronto')
+        resposta = conexao.getresponse()
+        resposta.read()
+        return resposta.status == 200
+    except OSError:
+        return False
+    finally:
+        conexao.close()
+
+def postar(conexao, update, segredo=SEGREDO):
+    """Entrega um update ao bot como o Telegram faz; retorna o status HTTP"""
+    corpo = json.dumps(update).encode('utf-8')
+    conexao.request('POST', CAMINHO_WEBHOOK, corpo, {
+        'Content-Type': 'application/json',
+        'X-Telegram-Bot-Api-Secret-Token': segredo
+    })
+    resposta = conexao.getresponse()
+    resposta.read()
+    return resposta.status
+
+def aguardar(condicao, descricao):
+    fim = time.monotonic() + TEMPO_LIMITE
+    while not condicao():
+        if time.monotonic() > fim:
+            raise SystemExit(f"Tempo esgotado esperando {descricao}")
+        time.sleep(0.05)
+
+def percentil(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p))]
+
+def main():
+    modo = sys.argv[1] if len(sys.argv) > 1 else 'webhook'
+    quantidade = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    conexoes = int(sys.argv[3]) if len(sys.argv) > 3 else 8
+    workers = int(sys.argv[4]) if len(sys.argv) > 4 else 4 if modo == 'workers' else 0
+    
+    telegram = TelegramFalso(falhar_webhook=(modo == 'fallback'))
+    api = ThreadingHTTPServer(('127.0.0.1', porta_livre()), BotAPIHandler)
+    api.telegram = telegram
+    threading.Thread(target=api.serve_forever, daemon=True).start()
+    
+    porta_bot = porta_livre()
+    porta_workers = porta_livre()
+    pasta = tempfile.mkdtemp()
+    ambiente = dict(
+        os.environ,
+        TELEGRAM_BOT_TOKEN=TOKEN,
+        TELEGRAM_API_URL=f"http://127.0.0.1:{api.server_address[1]}/bot",
+        PORT=str(porta_bot),
+        WEBHOOK_URL=f"http://127.0.0.1:{porta_bot}" if modo != 'polling' else '',
+        WEBHOOK_PATH=CAMINHO_WEBHOOK,
+        WEBHOOK_SECRET=SEGREDO,
+        WEBHOOK_WORKERS_LOCAIS=str(workers),
+        WEBHOOK_WORKERS_PORTA=str(porta_workers),
+        DB_BACKEND='sqlite',
+        SQLITE_PATH=os.path.join(pasta, 'nuxo.db'),
+        WRITE_BEHIND_SPOOL_FILE=os.path.join(pasta, 'pendentes.jsonl')
+    )
+    bot = subprocess.Popen([sys.executable, 'main.py'], cwd=RAIZ, env=ambiente)
+    
+    try:
+        if modo in ('webhook', 'workers'):
+            aguardar(lambda: telegram.webhook is not None, "o registro do webhook")
+            print(f"webhook registrado: {telegram.webhook['url']}")
+            
+            # Espera o servidor HTTP do bot aceitar conexões e, no ingresso, os workers ficarem prontos
+            aguardar(lambda: aceitando_conexoes(porta_bot), "o servidor HTTP")
+            if workers:
+                aguardar(lambda: pronto(porta_bot), "os workers")
+                print(f"{workers} workers prontos")
+            
+            conexao = http.client.HTTPConnection('127.0.0.1', porta_bot)
+            status = postar(conexao, criar_update(1, 1, '/ajuda'), segredo='errado')
+            print(f"entrega com segredo errado: HTTP {status} (esperado 403)")
+            assert status == 403
+        else:
+            aguardar(telegram.polling.is_set, "o long polling")
+            print(f"long polling ativo ({'setWebhook recusado' if modo == 'fallback' else 'sem WEBHOOK_URL'})")
+        
+        chats = list(range(1000, 1000 + quantidade))
+        enviados = {}
+        tempos_post = []
+
+        def entregar(parte):
+            conexao = http.client.HTTPConnection('127.0.0.1', porta_bot)
+            for chat in parte:
+                enviados[chat] = time.perf_counter()
+                # Como o Telegram, entrega o update seguinte do chat depois da resposta ao anterior
+                for update in conversa(chat):
+                    antes = time.perf_counter()
+                    status = postar(conexao, update)
+                    tempos_post.append(time.perf_counter() - antes)
+                    assert status == 200, status
+        
+        inicio = time.perf_counter()
+        if modo in ('webhook', 'workers'):
+            threads = [threading.Thread(target=entregar, args=(chats[i::conexoes],)) for i in range(conexoes)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        else:
+            for chat in chats:
+                enviados[chat] = time.perf_counter()
+                for update in conversa(chat):
+                    telegram.enfileirar(update)
+        
+        respostas = telegram.aguardar_respostas(chats, TEMPO_LIMITE)
+        duracao = time.perf_counter() - inicio
+        
+        latencias = [(r - enviados[c]) * 1000 for c, r in zip(chats, respostas) if r is not None]
+        print(f"conversas: {len(latencias)}/{quantidade} em {duracao:.2f}s "
+              f"({2 * len(latencias) / duracao:.0f} updates/s)")
+        if latencias:
+            print(f"latência até o pedido da data: p50 {percentil(latencias, 0.5):.1f} ms, "
+                  f"p95 {percentil(latencias, 0.95):.1f} ms, média {statistics.mean(latencias):.1f} ms")
+        if tempos_post:
+            print(f"resposta do POST do webhook: p50 {percentil(tempos_post, 0.5) * 1000:.2f} ms, "
+                  f"p95 {percentil(tempos_post, 0.95) * 1000:.2f} ms")
+        
+        if modo == 'webhook':
+            conexao = http.client.HTTPConnection('127.0.0.1', porta_bot)
+            conexao.request('GET', '/metricas')
+            despacho = json.loads(conexao.getresponse().read())['despacho']
+            for nome, metricas in sorted(despacho['handlers'].items()):
+                print(f"  {nome:<32} {metricas['chamadas']:>5} chamadas | espera média "
+                      f"{metricas['espera_media_ms']:>8.1f} ms | execução média {metricas['execucao_media_ms']:>7.1f} ms")
+        
+        assert len(latencias) == quantidade, "nem todas as conversas chegaram ao pedido da data"
+    finally:
+        bot.send_signal(signal.SIGTERM)
+        try:
+            print(f"bot encerrado (código {bot.wait(timeout=30)})")
+        except subprocess.TimeoutExpired:
+            bot.kill()
+            print("bot não encerrou em 30s")
+        api.shutdown()
+
+if __name__ == '__main__':
+    main()
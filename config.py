@@ -7,10 +7,86 @@ load_dotenv()
 # Configurações do Telegram
 TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 
+# Endereço da Bot API (vazio = api.telegram.org); útil para um servidor Bot API local
+# ou para a Bot API falsa de benchmarks/webhook.py
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL") or None
+
+# Modo webhook: com WEBHOOK_URL (endereço público do app, ex.: https://nuxo.herokuapp.com),
+# o Telegram entrega os updates ao servidor HTTP do bot na porta $PORT, em WEBHOOK_PATH,
+# em vez do long polling. Sem WEBHOOK_URL, ou se o registro do webhook falhar, usa polling.
+# WEBHOOK_SECRET é conferido no cabeçalho de cada entrega (vazio = gerado a cada início)
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "").rstrip("/")
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/telegram")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+WEBHOOK_MAX_CONNECTIONS = int(os.getenv("WEBHOOK_MAX_CONNECTIONS", "40"))
+
+# Escala horizontal: com workers configurados, este processo é o ingresso do webhook e
+# repassa cada update ao worker escolhido por hash consistente do usuário, que mantém o
+# estado das conversas e os caches daquele usuário. WEBHOOK_WORKERS: URLs de workers em
+# outras máquinas (separadas por vírgula, com o mesmo WEBHOOK_SECRET); WEBHOOK_WORKERS_LOCAIS:
+# processos worker nesta máquina, nas portas WEBHOOK_WORKERS_PORTA, +1, +2...
+# WEBHOOK_WORKER indica que este processo é um worker
+WEBHOOK_WORKERS = [url.strip().rstrip("/") for url in os.getenv("WEBHOOK_WORKERS", "").split(",") if url.strip()]
+WEBHOOK_WORKERS_LOCAIS = int(os.getenv("WEBHOOK_WORKERS_LOCAIS", "0"))
+WEBHOOK_WORKERS_PORTA = int(os.getenv("WEBHOOK_WORKERS_PORTA", "8100"))
+WEBHOOK_WORKER = os.getenv("WEBHOOK_WORKER", "false").lower() in ("1", "true", "sim")
+
+# Threads que processam updates de usuários diferentes em paralelo (os de um mesmo usuário
+# seguem sempre em ordem); 0 = um update de cada vez
+HANDLER_WORKERS = int(os.getenv("HANDLER_WORKERS", "8"))
+
+# Backend de armazenamento: "supabase" ou "sqlite" (banco local, sem rede)
+DB_BACKEND = os.getenv("DB_BACKEND", "supabase").lower()
+SQLITE_PATH = os.getenv("SQLITE_PATH", "nuxo.db")
+
 # Configurações do Supabase
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY") 
 
+# Cache de identidade (telegram_id -> usuario_id)
+IDENTITY_CACHE_SIZE = int(os.getenv("IDENTITY_CACHE_SIZE", "10000"))
+IDENTITY_CACHE_TTL = int(os.getenv("IDENTITY_CACHE_TTL", "3600"))  # segundos
+IDENTITY_CACHE_NEGATIVE_TTL = int(os.getenv("IDENTITY_CACHE_NEGATIVE_TTL", "5"))  # segundos
+
+# Cache de resultados das consultas de visualização (por usuário e filtros)
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "512"))  # entradas
+QUERY_CACHE_TTL = int(os.getenv("QUERY_CACHE_TTL", "600"))  # segundos
+QUERY_CACHE_MAX_BYTES = int(os.getenv("QUERY_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# Gravação de gastos em segundo plano (write-behind): confirma o registro ao usuário
+# imediatamente e agrupa os inserts em lotes
+WRITE_BEHIND_ENABLED = os.getenv("WRITE_BEHIND_ENABLED", "false").lower() in ("1", "true", "sim")
+WRITE_BEHIND_BATCH_SIZE = int(os.getenv("WRITE_BEHIND_BATCH_SIZE", "50"))
+WRITE_BEHIND_FLUSH_INTERVAL = float(os.getenv("WRITE_BEHIND_FLUSH_INTERVAL", "1.0"))  # segundos
+WRITE_BEHIND_SPOOL_FILE = os.getenv("WRITE_BEHIND_SPOOL_FILE", "gastos_pendentes.jsonl")
+
+# Arquivos exportados ficam em memória até este tamanho; acima dele, em arquivo temporário
+EXPORT_SPOOL_MAX_BYTES = int(os.getenv("EXPORT_SPOOL_MAX_BYTES", str(8 * 1024 * 1024)))
+
+# Pool de exportação: threads para as exportações, processos para gerar as planilhas
+# (0 processos = gera na própria thread) e exportações simultâneas por usuário
+EXPORT_WORKERS = int(os.getenv("EXPORT_WORKERS", "2"))
+EXPORT_PROCESSES = int(os.getenv("EXPORT_PROCESSES", "1"))
+EXPORT_MAX_POR_USUARIO = int(os.getenv("EXPORT_MAX_POR_USUARIO", "1"))
+
+# Exportações já enviadas (file_id do Telegram), reaproveitadas enquanto os gastos não mudarem
+EXPORT_DEDUP_CACHE_SIZE = int(os.getenv("EXPORT_DEDUP_CACHE_SIZE", "1000"))  # entradas
+EXPORT_DEDUP_CACHE_TTL = int(os.getenv("EXPORT_DEDUP_CACHE_TTL", "86400"))  # segundos
+
+# Tamanho máximo de cada arquivo exportado; acima dele, a exportação é dividida em partes
+# (o Telegram aceita documentos de até 50 MB enviados por bots)
+EXPORT_MAX_UPLOAD_BYTES = int(os.getenv("EXPORT_MAX_UPLOAD_BYTES", str(45 * 1024 * 1024)))
+
+# Lista de gastos exibida no bot: máximo de gastos por página (a página também é limitada
+# ao tamanho de uma mensagem do Telegram) e cache das listas consultadas, usado para
+# trocar de página sem consultar o banco de novo
+LISTA_GASTOS_PAGE_SIZE = int(os.getenv("LISTA_GASTOS_PAGE_SIZE", "15"))
+LISTA_GASTOS_CACHE_SIZE = int(os.getenv("LISTA_GASTOS_CACHE_SIZE", "500"))  # entradas
+LISTA_GASTOS_CACHE_TTL = int(os.getenv("LISTA_GASTOS_CACHE_TTL", "900"))  # segundos
+
+# Tamanho da página ao percorrer gastos em lotes (o Supabase limita a 1000 linhas por requisição)
+GASTOS_PAGE_SIZE = int(os.getenv("GASTOS_PAGE_SIZE", "500"))
+
 # Categorias de gastos disponíveis
 CATEGORIAS = [
     "Alimentação", 
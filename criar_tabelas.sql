@@ -10,7 +10,7 @@ CREATE TABLE IF NOT EXISTS usuarios (
 CREATE TABLE IF NOT EXISTS gastos (
     id BIGSERIAL PRIMARY KEY,
     usuario_id BIGINT NOT NULL REFERENCES usuarios(id),
-    valor DECIMAL(10,2) NOT NULL,
+    valor_centavos BIGINT NOT NULL,  -- valor em centavos (inteiro, somas exatas)
     forma_pagamento TEXT NOT NULL,
     parcelas INTEGER,
     categoria TEXT NOT NULL,
@@ -23,19 +23,204 @@ CREATE TABLE IF NOT EXISTS gastos (
 CREATE INDEX IF NOT EXISTS idx_gastos_usuario_id ON gastos(usuario_id);
 CREATE INDEX IF NOT EXISTS idx_gastos_data ON gastos(data);
 CREATE INDEX IF NOT EXISTS idx_gastos_forma_pagamento ON gastos(forma_pagamento);
+-- Índice composto para consultas por usuário ordenadas por data (paginação por cursor)
+CREATE INDEX IF NOT EXISTS idx_gastos_usuario_data ON gastos(usuario_id, data DESC, id DESC);
+-- Índice para a exportação incremental (gastos registrados depois de um cursor)
+CREATE INDEX IF NOT EXISTS idx_gastos_usuario_criado ON gastos(usuario_id, criado_em, id);
 
 -- Função para criar índice de texto completo (opcional, para buscas avançadas)
 CREATE EXTENSION IF NOT EXISTS pg_trgm;
 CREATE INDEX IF NOT EXISTS idx_gastos_local_trgm ON gastos USING gin (local gin_trgm_ops);
 
+-- Cursor da exportação incremental: último gasto (criado_em, id) já exportado por usuário
+-- e o arquivo completo enviado ao Telegram, ao qual os gastos novos podem ser anexados
+CREATE TABLE IF NOT EXISTS cursores_exportacao (
+    usuario_id BIGINT PRIMARY KEY REFERENCES usuarios(id),
+    criado_em TIMESTAMPTZ NOT NULL,
+    gasto_id BIGINT NOT NULL,
+    file_id TEXT,
+    formato TEXT,
+    atualizado_em TIMESTAMPTZ DEFAULT NOW()
+);
+
+-- Tabela de resumo mensal (usuário x mês x categoria x forma de pagamento)
+-- Mantida incrementalmente pelo trigger abaixo; os totais por categoria e por forma de
+-- pagamento do resumo da visualização (resumo_gastos_por_categoria e
+-- resumo_gastos_por_forma_pagamento) leem daqui em vez de percorrer todo o histórico
+CREATE TABLE IF NOT EXISTS gastos_mensal (
+    usuario_id BIGINT NOT NULL REFERENCES usuarios(id),
+    mes DATE NOT NULL,  -- primeiro dia do mês
+    categoria TEXT NOT NULL,
+    forma_pagamento TEXT NOT NULL,
+    total_centavos BIGINT NOT NULL DEFAULT 0,
+    quantidade BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (usuario_id, mes, categoria, forma_pagamento)
+);
+
+-- Migração de bancos criados antes dos valores em centavos: converte gastos.valor
+-- (DECIMAL, em reais) em gastos.valor_centavos e recalcula gastos_mensal em centavos.
+-- O trigger antigo é removido antes e recriado mais abaixo.
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM information_schema.columns
+               WHERE table_schema = 'public' AND table_name = 'gastos' AND column_name = 'valor') THEN
+        DROP TRIGGER IF EXISTS trg_gastos_mensal ON gastos;
+        
+        ALTER TABLE gastos ADD COLUMN IF NOT EXISTS valor_centavos BIGINT;
+        UPDATE gastos SET valor_centavos = ROUND(valor * 100) WHERE valor_centavos IS NULL;
+        ALTER TABLE gastos ALTER COLUMN valor_centavos SET NOT NULL;
+        ALTER TABLE gastos DROP COLUMN valor;
+    END IF;
+    
+    IF EXISTS (SELECT 1 FROM information_schema.columns
+               WHERE table_schema = 'public' AND table_name = 'gastos_mensal' AND column_name = 'total') THEN
+        ALTER TABLE gastos_mensal DROP COLUMN total;
+        ALTER TABLE gastos_mensal ADD COLUMN total_centavos BIGINT NOT NULL DEFAULT 0;
+        
+        DELETE FROM gastos_mensal;
+        INSERT INTO gastos_mensal (usuario_id, mes, categoria, forma_pagamento, total_centavos, quantidade)
+        SELECT usuario_id, date_trunc('month', data)::date, categoria, forma_pagamento, SUM(valor_centavos), COUNT(*)
+        FROM gastos
+        GROUP BY 1, 2, 3, 4;
+    END IF;
+END;
+$$;
+
+-- Atualiza gastos_mensal a cada insert/update/delete em gastos
+CREATE OR REPLACE FUNCTION atualizar_gastos_mensal()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        UPDATE gastos_mensal
+        SET total_centavos = total_centavos - OLD.valor_centavos,
+            quantidade = quantidade - 1
+        WHERE usuario_id = OLD.usuario_id
+          AND mes = date_trunc('month', OLD.data)::date
+          AND categoria = OLD.categoria
+          AND forma_pagamento = OLD.forma_pagamento;
+        
+        DELETE FROM gastos_mensal
+        WHERE usuario_id = OLD.usuario_id
+          AND mes = date_trunc('month', OLD.data)::date
+          AND categoria = OLD.categoria
+          AND forma_pagamento = OLD.forma_pagamento
+          AND quantidade <= 0;
+    END IF;
+    
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO gastos_mensal (usuario_id, mes, categoria, forma_pagamento, total_centavos, quantidade)
+        VALUES (NEW.usuario_id, date_trunc('month', NEW.data)::date, NEW.categoria, NEW.forma_pagamento, NEW.valor_centavos, 1)
+        ON CONFLICT (usuario_id, mes, categoria, forma_pagamento)
+        DO UPDATE SET total_centavos = gastos_mensal.total_centavos + EXCLUDED.total_centavos,
+                      quantidade = gastos_mensal.quantidade + 1;
+    END IF;
+    
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_gastos_mensal ON gastos;
+CREATE TRIGGER trg_gastos_mensal
+    AFTER INSERT OR UPDATE OR DELETE ON gastos
+    FOR EACH ROW EXECUTE FUNCTION atualizar_gastos_mensal();
+
+-- Reconstrói gastos_mensal a partir de gastos (carga inicial ou correção)
+-- Se p_usuario_id for NULL, reconstrói para todos os usuários
+CREATE OR REPLACE FUNCTION reconstruir_gastos_mensal(p_usuario_id BIGINT DEFAULT NULL)
+RETURNS BIGINT
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    linhas BIGINT;
+BEGIN
+    -- Bloqueia escritas em gastos durante a reconstrução para não perder atualizações
+    LOCK TABLE gastos IN SHARE MODE;
+    
+    DELETE FROM gastos_mensal
+    WHERE p_usuario_id IS NULL OR usuario_id = p_usuario_id;
+    
+    INSERT INTO gastos_mensal (usuario_id, mes, categoria, forma_pagamento, total_centavos, quantidade)
+    SELECT usuario_id, date_trunc('month', data)::date, categoria, forma_pagamento, SUM(valor_centavos), COUNT(*)
+    FROM gastos
+    WHERE p_usuario_id IS NULL OR usuario_id = p_usuario_id
+    GROUP BY 1, 2, 3, 4;
+    
+    GET DIAGNOSTICS linhas = ROW_COUNT;
+    RETURN linhas;
+END;
+$$;
+
+-- Resumo de gastos por categoria calculado no banco
+-- Recebe os mesmos filtros de Database.obter_gastos e retorna apenas os totais agrupados,
+-- lidos da tabela gastos_mensal (os filtros de período sempre coincidem com meses inteiros)
+-- O tipo de retorno mudou (total em centavos); CREATE OR REPLACE não altera o tipo de retorno
+DROP FUNCTION IF EXISTS resumo_gastos_por_categoria(BIGINT, DATE, DATE, TEXT, TEXT);
+CREATE OR REPLACE FUNCTION resumo_gastos_por_categoria(
+    p_usuario_id BIGINT,
+    p_data_inicio DATE DEFAULT NULL,
+    p_data_fim DATE DEFAULT NULL,
+    p_forma_pagamento TEXT DEFAULT NULL,
+    p_categoria TEXT DEFAULT NULL
+)
+RETURNS TABLE (categoria TEXT, total_centavos BIGINT, quantidade BIGINT)
+LANGUAGE sql STABLE
+AS $$
+    SELECT m.categoria, SUM(m.total_centavos)::BIGINT AS total_centavos, SUM(m.quantidade)::BIGINT AS quantidade
+    FROM gastos_mensal m
+    WHERE m.usuario_id = p_usuario_id
+      AND (p_data_inicio IS NULL OR m.mes >= p_data_inicio)
+      AND (p_data_fim IS NULL OR m.mes < p_data_fim)
+      AND (p_forma_pagamento IS NULL OR m.forma_pagamento = p_forma_pagamento)
+      AND (p_categoria IS NULL OR m.categoria = p_categoria)
+    GROUP BY m.categoria
+    ORDER BY total_centavos DESC;
+$$;
+
+-- Função de resumo por forma de pagamento, com os mesmos filtros e a mesma origem
+CREATE OR REPLACE FUNCTION resumo_gastos_por_forma_pagamento(
+    p_usuario_id BIGINT,
+    p_data_inicio DATE DEFAULT NULL,
+    p_data_fim DATE DEFAULT NULL,
+    p_forma_pagamento TEXT DEFAULT NULL,
+    p_categoria TEXT DEFAULT NULL
+)
+RETURNS TABLE (forma_pagamento TEXT, total_centavos BIGINT, quantidade BIGINT)
+LANGUAGE sql STABLE
+AS $$
+    SELECT m.forma_pagamento, SUM(m.total_centavos)::BIGINT AS total_centavos, SUM(m.quantidade)::BIGINT AS quantidade
+    FROM gastos_mensal m
+    WHERE m.usuario_id = p_usuario_id
+      AND (p_data_inicio IS NULL OR m.mes >= p_data_inicio)
+      AND (p_data_fim IS NULL OR m.mes < p_data_fim)
+      AND (p_forma_pagamento IS NULL OR m.forma_pagamento = p_forma_pagamento)
+      AND (p_categoria IS NULL OR m.categoria = p_categoria)
+    GROUP BY m.forma_pagamento
+    ORDER BY total_centavos DESC;
+$$;
+
 -- Políticas de segurança RLS (Row Level Security)
 -- Habilitar RLS nas tabelas
 ALTER TABLE usuarios ENABLE ROW LEVEL SECURITY;
 ALTER TABLE gastos ENABLE ROW LEVEL SECURITY;
+ALTER TABLE gastos_mensal ENABLE ROW LEVEL SECURITY;
+ALTER TABLE cursores_exportacao ENABLE ROW LEVEL SECURITY;
 
 -- Criar políticas para usuários autenticados
+-- (recriadas a cada execução, para que o script possa ser rodado de novo, ex.: para migrar)
+DROP POLICY IF EXISTS usuarios_policy ON usuarios;
 CREATE POLICY usuarios_policy ON usuarios
     USING (auth.uid() IS NOT NULL);
 
+DROP POLICY IF EXISTS gastos_policy ON gastos;
 CREATE POLICY gastos_policy ON gastos
-    USING (auth.uid() IS NOT NULL); 
\ No newline at end of file
+    USING (auth.uid() IS NOT NULL);
+
+DROP POLICY IF EXISTS gastos_mensal_policy ON gastos_mensal;
+CREATE POLICY gastos_mensal_policy ON gastos_mensal
+    USING (auth.uid() IS NOT NULL);
+
+DROP POLICY IF EXISTS cursores_exportacao_policy ON cursores_exportacao;
+CREATE POLICY cursores_exportacao_policy ON cursores_exportacao
+    USING (auth.uid() IS NOT NULL);
@@ -0,0 +1,107 @@
+-- Esquema equivalente a criar_tabelas.sql para o backend SQLite (DB_BACKEND=sqlite)
+-- Executado automaticamente pelo bot na inicialização
+
+-- Tabela de usuários
+CREATE TABLE IF NOT EXISTS usuarios (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    telegram_id INTEGER UNIQUE NOT NULL,
+    nome TEXT NOT NULL,
+    data_cadastro TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now'))
+);
+
+-- Tabela de gastos
+CREATE TABLE IF NOT EXISTS gastos (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    usuario_id INTEGER NOT NULL REFERENCES usuarios(id),
+    valor_centavos INTEGER NOT NULL,  -- valor em centavos (inteiro, somas exatas)
+    forma_pagamento TEXT NOT NULL,
+    parcelas INTEGER,
+    categoria TEXT NOT NULL,
+    local TEXT NOT NULL,
+    data TEXT NOT NULL,  -- AAAA-MM-DD
+    criado_em TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now'))
+);
+
+-- Índices para as consultas por usuário ordenadas por data (e paginação por cursor)
+CREATE INDEX IF NOT EXISTS idx_gastos_usuario_data ON gastos(usuario_id, data DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_gastos_usuario_forma ON gastos(usuario_id, forma_pagamento, data DESC);
+CREATE INDEX IF NOT EXISTS idx_gastos_usuario_categoria ON gastos(usuario_id, categoria, data DESC);
+-- Índice para a exportação incremental (gastos registrados depois de um cursor)
+CREATE INDEX IF NOT EXISTS idx_gastos_usuario_criado ON gastos(usuario_id, criado_em, id);
+
+-- Cursor da exportação incremental: último gasto (criado_em, id) já exportado por usuário
+-- e o arquivo completo enviado ao Telegram, ao qual os gastos novos podem ser anexados
+CREATE TABLE IF NOT EXISTS cursores_exportacao (
+    usuario_id INTEGER PRIMARY KEY REFERENCES usuarios(id),
+    criado_em TEXT NOT NULL,
+    gasto_id INTEGER NOT NULL,
+    file_id TEXT,
+    formato TEXT,
+    atualizado_em TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now'))
+);
+
+-- Tabela de resumo mensal (usuário x mês x categoria x forma de pagamento)
+CREATE TABLE IF NOT EXISTS gastos_mensal (
+    usuario_id INTEGER NOT NULL REFERENCES usuarios(id),
+    mes TEXT NOT NULL,  -- primeiro dia do mês (AAAA-MM-01)
+    categoria TEXT NOT NULL,
+    forma_pagamento TEXT NOT NULL,
+    total_centavos INTEGER NOT NULL DEFAULT 0,
+    quantidade INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (usuario_id, mes, categoria, forma_pagamento)
+) WITHOUT ROWID;
+
+-- Mantém gastos_mensal atualizada a cada insert/update/delete em gastos
+CREATE TRIGGER IF NOT EXISTS trg_gastos_mensal_insert
+AFTER INSERT ON gastos
+BEGIN
+    INSERT INTO gastos_mensal (usuario_id, mes, categoria, forma_pagamento, total_centavos, quantidade)
+    VALUES (NEW.usuario_id, substr(NEW.data, 1, 7) || '-01', NEW.categoria, NEW.forma_pagamento, NEW.valor_centavos, 1)
+    ON CONFLICT (usuario_id, mes, categoria, forma_pagamento)
+    DO UPDATE SET total_centavos = total_centavos + excluded.total_centavos,
+                  quantidade = quantidade + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_gastos_mensal_delete
+AFTER DELETE ON gastos
+BEGIN
+    UPDATE gastos_mensal
+    SET total_centavos = total_centavos - OLD.valor_centavos,
+        quantidade = quantidade - 1
+    WHERE usuario_id = OLD.usuario_id
+      AND mes = substr(OLD.data, 1, 7) || '-01'
+      AND categoria = OLD.categoria
+      AND forma_pagamento = OLD.forma_pagamento;
+    
+    DELETE FROM gastos_mensal
+    WHERE usuario_id = OLD.usuario_id
+      AND mes = substr(OLD.data, 1, 7) || '-01'
+      AND categoria = OLD.categoria
+      AND forma_pagamento = OLD.forma_pagamento
+      AND quantidade <= 0;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_gastos_mensal_update
+AFTER UPDATE OF usuario_id, valor_centavos, forma_pagamento, categoria, data ON gastos
+BEGIN
+    UPDATE gastos_mensal
+    SET total_centavos = total_centavos - OLD.valor_centavos,
+        quantidade = quantidade - 1
+    WHERE usuario_id = OLD.usuario_id
+      AND mes = substr(OLD.data, 1, 7) || '-01'
+      AND categoria = OLD.categoria
+      AND forma_pagamento = OLD.forma_pagamento;
+    
+    DELETE FROM gastos_mensal
+    WHERE usuario_id = OLD.usuario_id
+      AND mes = substr(OLD.data, 1, 7) || '-01'
+      AND categoria = OLD.categoria
+      AND forma_pagamento = OLD.forma_pagamento
+      AND quantidade <= 0;
+    
+    INSERT INTO gastos_mensal (usuario_id, mes, categoria, forma_pagamento, total_centavos, quantidade)
+    VALUES (NEW.usuario_id, substr(NEW.data, 1, 7) || '-01', NEW.categoria, NEW.forma_pagamento, NEW.valor_centavos, 1)
+    ON CONFLICT (usuario_id, mes, categoria, forma_pagamento)
+    DO UPDATE SET total_centavos = total_centavos + excluded.total_centavos,
+                  quantidade = quantidade + 1;
+END;
@@ -2,15 +2,18 @@ import logging
 import os
 from telegram import Update
 from telegram.ext import (
-    Updater,
     CommandHandler,
     MessageHandler,
     CallbackQueryHandler,
     ConversationHandler,
+    TypeHandler,
     Filters
 )
+import hmac
+import json
+import secrets
 import threading
-from http.server import HTTPServer, BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
 
 # Configuração de logging
 logging.basicConfig(
@@ -20,7 +23,10 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 # Importar configurações e handlers
-from config import TELEGRAM_BOT_TOKEN
+from config import (
+    TELEGRAM_BOT_TOKEN, TELEGRAM_API_URL, WEBHOOK_URL, WEBHOOK_PATH, WEBHOOK_SECRET, WEBHOOK_MAX_CONNECTIONS,
+    WEBHOOK_WORKERS, WEBHOOK_WORKERS_LOCAIS, WEBHOOK_WORKERS_PORTA, WEBHOOK_WORKER
+)
 from app.handlers.start import start_command, help_command, menu_callback
 from app.handlers.registro_gastos import (
     registrar_command, registrar_callback, valor_handler, data_handler,
@@ -30,45 +36,174 @@ from app.handlers.registro_gastos import (
 )
 from app.handlers.visualizacao import (
     visualizar_command, visualizar_callback, ano_handler, mes_handler,
-    forma_pagamento_handler as visualizar_forma_handler, visualizar_novo_callback,
+    forma_pagamento_handler as visualizar_forma_handler, visualizar_novo_callback, pagina_gastos_callback,
     categoria_handler as visualizar_categoria_handler,
     ESCOLHER_ANO, ESCOLHER_MES, ESCOLHER_FORMA_PAGAMENTO, ESCOLHER_CATEGORIA
 )
 from app.handlers.exportacao import (
     exportar_command, exportar_callback, ano_handler as exportar_ano_handler,
     mes_handler as exportar_mes_handler, categoria_handler as exportar_categoria_handler,
-    categoria_callback as exportar_categoria_callback,
+    categoria_callback as exportar_categoria_callback, formato_callback as exportar_formato_callback,
     ESCOLHER_ANO as EXP_ESCOLHER_ANO, ESCOLHER_MES as EXP_ESCOLHER_MES,
-    ESCOLHER_CATEGORIA as EXP_ESCOLHER_CATEGORIA
+    ESCOLHER_CATEGORIA as EXP_ESCOLHER_CATEGORIA, ESCOLHER_FORMATO as EXP_ESCOLHER_FORMATO
 )
 from app.db.database import db
+from app.exports.fila_exportacao import fila_exportacao
+from app.distribuicao import Encaminhador, WorkersLocais
+from app.despacho import criar_updater, metricas_handlers
+
+# Tamanho máximo aceito para um update entregue pelo webhook
+TAMANHO_MAXIMO_UPDATE = 1024 * 1024
 
-# Servidor HTTP simples
+# Servidor HTTP: status, métricas e, no modo webhook, a entrega dos updates do Telegram
 class SimpleHTTPRequestHandler(BaseHTTPRequestHandler):
+    # Conexões persistentes: o Telegram reaproveita as conexões entre entregas; sem o
+    # algoritmo de Nagle, o corpo da resposta não espera o ACK do cabeçalho
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
     def do_GET(self):
-        self.send_response(200)
-        self.send_header('Content-type', 'text/html')
+        if self.path == '/metricas':
+            metricas = coletar_metricas()
+            if self.server.encaminhador:
+                metricas["encaminhamento"] = self.server.encaminhador.estatisticas()
+            self._responder(200, json.dumps(metricas).encode('utf-8'), 'application/json')
+            return
+        
+        if self.path == '/pronto':
+            # Prontidão: o banco de dados já está conectado; no ingresso, que não usa o
+            # banco, todos os workers estão prontos
+            encaminhador = self.server.encaminhador
+            if encaminhador.pronto() if encaminhador else db.pronto:
+                self._responder(200, b'pronto')
+            else:
+                self._responder(503, b'iniciando')
+            return
+        
+        self._responder(200, b'Nuxo Bot esta funcionando!')
+
+    def do_POST(self):
+        """
+        Recebe um update do webhook e valida o segredo; enfileira o update para o
+        dispatcher ou, no ingresso, o repassa ao worker do seu usuário
+        """
+        updater = self.server.updater
+        encaminhador = self.server.encaminhador
+        
+        if (updater is None and encaminhador is None) or self.path != WEBHOOK_PATH:
+            self._responder(404, b'')
+            return
+        
+        # O Telegram repete em cada entrega o segredo informado em set_webhook
+        segredo = self.headers.get('X-Telegram-Bot-Api-Secret-Token', '')
+        if not hmac.compare_digest(segredo.encode('utf-8'), self.server.segredo.encode('utf-8')):
+            logger.warning(f"Webhook recusado: segredo inválido (origem {self.client_address[0]})")
+            self._responder(403, b'')
+            return
+        
+        try:
+            tamanho = int(self.headers.get('Content-Length') or 0)
+        except ValueError:
+            tamanho = 0
+        
+        if not 0 < tamanho <= TAMANHO_MAXIMO_UPDATE:
+            self._responder(413 if tamanho else 400, b'')
+            return
+        
+        if encaminhador:
+            # Com o worker fora do ar, o erro faz o Telegram reenviar o update mais tarde
+            self._responder(200 if encaminhador.encaminhar(self.rfile.read(tamanho)) else 503, b'')
+            return
+        
+        try:
+            update = Update.de_json(json.loads(self.rfile.read(tamanho)), updater.bot)
+        except Exception as e:
+            logger.warning(f"Webhook recusado: update inválido: {e}")
+            self._responder(400, b'')
+            return
+        
+        # Só enfileira: os handlers rodam nas threads do dispatcher e o Telegram
+        # recebe a resposta sem esperar por eles
+        updater.update_queue.put(update)
+        self._responder(200, b'')
+
+    def _responder(self, status, corpo, tipo='text/html'):
+        self.send_response(status)
+        self.send_header('Content-type', tipo)
+        self.send_header('Content-Length', str(len(corpo)))
+        
+        if status >= 400:
+            # O corpo da requisição pode não ter sido lido; a conexão não é reaproveitada
+            self.send_header('Connection', 'close')
+        
         self.end_headers()
-        self.wfile.write(b'Nuxo Bot esta funcionando!')
+        self.wfile.write(corpo)
+
+    def log_message(self, formato, *args):
+        # Uma linha por requisição poluiria o log no modo webhook
+        logger.debug(f"{self.address_string()} - {formato % args}")
+
+def coletar_metricas():
+    """Reúne as métricas de caches e filas para o endpoint /metricas"""
+    metricas = {
+        "banco_pronto": db.pronto,
+        "exportacao": fila_exportacao.estatisticas(),
+        "despacho": metricas_handlers.estatisticas()
+    }
+    
+    if db.pronto:
+        metricas["cache_usuarios"] = db.estatisticas_cache_usuarios()
+        metricas["cache_consultas"] = db.estatisticas_cache_consultas()
+    
+    return metricas
 
-def run_server():
+def run_server(updater=None, segredo='', encaminhador=None):
+    """
+    Atende o servidor HTTP na porta $PORT. Com `updater`, aceita também os updates
+    do webhook (POST em WEBHOOK_PATH com o `segredo` no cabeçalho); com
+    `encaminhador`, repassa esses updates aos workers em vez de processá-los.
+    """
     port = int(os.environ.get('PORT', 5000))
-    server = HTTPServer(('0.0.0.0', port), SimpleHTTPRequestHandler)
+    server = ThreadingHTTPServer(('0.0.0.0', port), SimpleHTTPRequestHandler)
+    server.updater = updater
+    server.segredo = segredo
+    server.encaminhador = encaminhador
     logger.info(f'Servidor HTTP iniciado na porta {port}')
     server.serve_forever()
 
-def main():
-    """Inicia o bot"""
+def iniciar_webhook(updater, url, segredo):
+    """
+    Registra o webhook no Telegram e inicia o dispatcher; os updates chegam pelo
+    servidor HTTP (run_server), não pelo servidor de webhook do próprio Updater.
     
-    # Verificar se as variáveis de ambiente necessárias estão configuradas
-    if not TELEGRAM_BOT_TOKEN:
-        logger.error("Token do Telegram não configurado!")
-        return
+    Returns:
+        bool: True se o webhook foi registrado; False para cair no long polling
+    """
+    try:
+        updater.bot.set_webhook(
+            url=url,
+            secret_token=segredo,
+            max_connections=WEBHOOK_MAX_CONNECTIONS
+        )
+    except Exception as e:
+        logger.error(f"Erro ao registrar o webhook ({url}): {e}")
+        return False
     
-    # Inicializar o Updater
-    updater = Updater(TELEGRAM_BOT_TOKEN)
-    dispatcher = updater.dispatcher
+    iniciar_dispatcher(updater)
     
+    logger.info(f"Webhook registrado em {url}")
+    return True
+
+def iniciar_dispatcher(updater):
+    """Inicia o dispatcher para os updates colocados em updater.update_queue pelo servidor HTTP"""
+    # O mesmo que start_polling faz antes de buscar updates; com running=True,
+    # updater.idle() e updater.stop() encerram o dispatcher normalmente
+    updater.running = True
+    updater.job_queue.start()
+    threading.Thread(target=updater.dispatcher.start, name='dispatcher', daemon=True).start()
+
+def registrar_handlers(dispatcher):
+    """Registra no dispatcher os handlers de comandos, conversas e botões do bot"""
     # Handlers dos comandos básicos
     dispatcher.add_handler(CommandHandler("start", start_command))
     dispatcher.add_handler(CommandHandler("ajuda", help_command))
@@ -152,6 +287,9 @@ def main():
             EXP_ESCOLHER_CATEGORIA: [
                 CallbackQueryHandler(exportar_categoria_callback, pattern="^exp_cat_")
             ],
+            EXP_ESCOLHER_FORMATO: [
+                CallbackQueryHandler(exportar_formato_callback, pattern="^exp_fmt_")
+            ],
         },
         fallbacks=[
             CommandHandler("cancel", cancel_handler),
@@ -166,27 +304,80 @@ def main():
     # Handler para nova consulta de visualização
     dispatcher.add_handler(CallbackQueryHandler(visualizar_novo_callback, pattern="^visualizar_novo$"))
     
-    # Iniciar o bot em um thread separado
-    updater.start_polling()
+    # Handler para a navegação entre as páginas da lista de gastos
+    dispatcher.add_handler(CallbackQueryHandler(pagina_gastos_callback, pattern="^gastos_pag_"))
+
+def main():
+    """Inicia o bot"""
+    
+    # Verificar se as variáveis de ambiente necessárias estão configuradas
+    if not TELEGRAM_BOT_TOKEN:
+        logger.error("Token do Telegram não configurado!")
+        return
     
-    # Iniciar o servidor web
-    t = threading.Thread(target=run_server)
-    t.start()
+    # Inicializar o Updater (updates de usuários diferentes são processados em paralelo)
+    updater = criar_updater(TELEGRAM_BOT_TOKEN, base_url=TELEGRAM_API_URL)
+    segredo = WEBHOOK_SECRET or secrets.token_urlsafe(32)
+    workers_locais = None
+    encaminhador = None
+    
+    if WEBHOOK_WORKER:
+        # Worker: processa os updates que o ingresso repassa (sempre os mesmos usuários)
+        registrar_handlers(updater.dispatcher)
+        threading.Thread(target=run_server, args=(updater, segredo), daemon=True).start()
+        iniciar_dispatcher(updater)
+    else:
+        if WEBHOOK_WORKERS or WEBHOOK_WORKERS_LOCAIS:
+            # Ingresso: cada update vai para o worker do seu usuário; os recebidos por long
+            # polling passam pelo dispatcher, que os repassa um a um, na ordem
+            if WEBHOOK_WORKERS and not WEBHOOK_SECRET:
+                logger.warning("WEBHOOK_SECRET não configurado: os workers remotos vão recusar os updates")
+            
+            urls = list(WEBHOOK_WORKERS)
+            if WEBHOOK_WORKERS_LOCAIS:
+                workers_locais = WorkersLocais(WEBHOOK_WORKERS_LOCAIS, WEBHOOK_WORKERS_PORTA, segredo)
+                urls += workers_locais.iniciar()
+            
+            encaminhador = Encaminhador(urls, segredo, WEBHOOK_PATH)
+
+            def encaminhar(update, context):
+                encaminhador.encaminhar_update(update)
+            
+            updater.dispatcher.add_handler(TypeHandler(Update, encaminhar))
+            logger.info(f"Ingresso do webhook com {len(urls)} workers")
+        else:
+            registrar_handlers(updater.dispatcher)
+        
+        # Iniciar o servidor web (no modo webhook, também recebe os updates)
+        t = threading.Thread(
+            target=run_server, args=(updater if WEBHOOK_URL else None, segredo, encaminhador), daemon=True
+        )
+        t.start()
+        
+        # Receber os updates pelo webhook ou, sem ele, pelo long polling em um thread separado
+        # (start_polling remove um webhook registrado antes)
+        if not (WEBHOOK_URL and iniciar_webhook(updater, WEBHOOK_URL + WEBHOOK_PATH, segredo)):
+            updater.start_polling()
+    
+    if encaminhador is None:
+        # Conectar ao banco de dados em segundo plano (o primeiro update também conecta, se chegar antes)
+        logger.info("Conectando ao banco de dados em segundo plano...")
+        db.aquecer_em_segundo_plano()
     
     # Manter o bot em execução
     updater.idle()
     
+    if workers_locais:
+        workers_locais.encerrar()
+    
+    # Conclui as exportações em andamento e grava os gastos que ainda estiverem na fila
+    fila_exportacao.encerrar()
+    db.encerrar()
+    
     logger.info("Bot iniciado!")
 
 if __name__ == "__main__":
     try:
-        # Verificar conexão com o banco de dados
-        logger.info("Verificando conexão com o banco de dados...")
-        
-        # Criar diretório de exportação se não existir
-        if not os.path.exists('exports'):
-            os.makedirs('exports')
-            
         main()
     except Exception as e:
         logger.error(f"Erro ao iniciar o bot: {e}") 
\ No newline at end of file